@@ -1,20 +1,49 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
 from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, Header, HTTPException, Query, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from config import settings
-from database import get_db
+from database import get_db, get_db_session, run_db, run_in_new_session, DBSession
 from models import User
 
 # Password Context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max = default: needs_update() marca los hashes con otro coste para regenerarlos
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
-# OAuth2 Scheme
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
+# Pool acotado para bcrypt (libera el GIL, así que los hilos usan varios núcleos)
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1,
+    thread_name_prefix="bcrypt",
+)
+
+# OAuth2 Scheme (sin auto_error: el bot puede autenticarse con su secreto de servicio)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token", auto_error=False)
+
+# Autenticación del bot de Telegram como servicio
+bot_service_scheme = APIKeyHeader(name="X-Bot-Service-Token", auto_error=False)
+
+# Códigos de vinculación: sin caracteres ambiguos (0/O, 1/I)
+LINK_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+LINK_CODE_LENGTH = 8
+
+# Tokens de corta duración que solo sirven para abrir el stream SSE
+STREAM_TOKEN_SCOPE = "study_stream"
 
 
 def verify_password(plain_password, hashed_password):
@@ -25,6 +54,29 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password en el pool de bcrypt (no bloquea el event loop)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash en el pool de bcrypt"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verificar la contraseña y, si el hash usa otro coste que BCRYPT_ROUNDS,
+    devolver también el hash regenerado (None si no hace falta cambiarlo)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -36,21 +88,128 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def create_stream_token(username: str) -> str:
+    """JWT de corta duración limitado al stream de estudio (va en la URL)"""
+    return create_access_token(
+        {"sub": username, "scope": STREAM_TOKEN_SCOPE},
+        expires_delta=timedelta(seconds=settings.STUDY_STREAM_TOKEN_SECONDS),
+    )
+
+
+def get_username_from_token(token: str, scope: Optional[str] = None) -> str:
+    """
+    Usuario del JWT. El scope tiene que coincidir: los tokens normales no
+    llevan, así que un token de stream no vale para el resto del API.
+    """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        if username is None or payload.get("scope") != scope:
+            raise credentials_exception()
     except JWTError:
-        raise credentials_exception
-        
+        raise credentials_exception()
+    return username
+
+
+def get_user_or_401(db: Session, username: str) -> User:
     user = db.query(User).filter(User.username == username).first()
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
+
+
+def get_user_by_telegram_id_or_401(db: Session, telegram_id: str) -> User:
+    user = db.query(User).filter(User.telegram_id == telegram_id).first()
+    if user is None:
+        raise credentials_exception()
+    return user
+
+
+def generate_link_code() -> str:
+    return "".join(secrets.choice(LINK_CODE_ALPHABET) for _ in range(LINK_CODE_LENGTH))
+
+
+def hash_link_code(code: str) -> str:
+    """Los códigos se guardan hasheados; se normalizan espacios y mayúsculas"""
+    return hashlib.sha256(code.strip().upper().encode()).hexdigest()
+
+
+def is_bot_service_token(service_token: Optional[str]) -> bool:
+    return bool(
+        settings.BOT_SERVICE_TOKEN
+        and service_token
+        # En bytes: compare_digest lanza TypeError con str no ASCII (sería un 500)
+        and hmac.compare_digest(service_token.encode(), settings.BOT_SERVICE_TOKEN.encode())
+    )
+
+
+async def require_bot_service(service_token: Optional[str] = Depends(bot_service_scheme)):
+    """Dependencia para endpoints que solo puede llamar el bot"""
+    if not is_bot_service_token(service_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Servicio no autorizado")
+
+
+async def get_bot_telegram_id(
+    service_token: Optional[str] = Depends(bot_service_scheme),
+    telegram_id: Optional[str] = Header(None, alias="X-Telegram-User-Id"),
+) -> Optional[str]:
+    """telegram_id enviado por el bot, o None si la petición no viene del bot"""
+    if service_token is None:
+        return None
+    if not is_bot_service_token(service_token) or not telegram_id:
+        raise credentials_exception()
+    return telegram_id
+
+
+def resolve_current_user(
+    db: Session, token: Optional[str], telegram_id: Optional[str], stream_token: Optional[str] = None
+) -> User:
+    """Usuario por JWT o, si lo pide el bot, por telegram_id (una consulta indexada)"""
+    if token:
+        return get_user_or_401(db, get_username_from_token(token))
+    if stream_token:
+        return get_user_or_401(db, get_username_from_token(stream_token, scope=STREAM_TOKEN_SCOPE))
+    if telegram_id:
+        return get_user_by_telegram_id_or_401(db, telegram_id)
+    raise credentials_exception()
+
+
+async def get_current_user(
+    token: Optional[str] = Depends(oauth2_scheme),
+    telegram_id: Optional[str] = Depends(get_bot_telegram_id),
+    db: Session = Depends(get_db),
+):
+    return resolve_current_user(db, token, telegram_id)
+
+
+async def get_current_user_db(
+    token: Optional[str] = Depends(oauth2_scheme),
+    telegram_id: Optional[str] = Depends(get_bot_telegram_id),
+    db: DBSession = Depends(get_db_session),
+):
+    """get_current_user para routers que usan get_db_session (stack sync o async)"""
+    return await run_db(db, resolve_current_user, token, telegram_id)
+
+
+async def get_current_user_stream(
+    token: Optional[str] = Depends(oauth2_scheme),
+    stream_token: Optional[str] = Query(None),
+    telegram_id: Optional[str] = Depends(get_bot_telegram_id),
+):
+    """
+    get_current_user para conexiones largas (SSE). EventSource no permite
+    cabeceras, así que se acepta ?stream_token= con un token de
+    create_stream_token: caduca en segundos y no vale para otros endpoints,
+    por lo que no importa que acabe en logs de proxies. El JWT normal solo
+    se acepta en la cabecera. La sesión de BD se cierra nada más resolver
+    el usuario.
+    """
+    return await run_in_new_session(resolve_current_user, token, telegram_id, stream_token)
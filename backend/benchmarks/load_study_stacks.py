@@ -0,0 +1,188 @@
+"""
+Prueba de carga: stack síncrono vs async (DB_ASYNC) en los endpoints de estudio
+
+Arranca el backend dos veces con uvicorn (DB_ASYNC=false y DB_ASYNC=true),
+crea usuarios con un mazo de tarjetas y lanza usuarios concurrentes que
+repiten el bucle GET /study/next + POST /study/review durante N segundos.
+
+Uso (desde backend/):
+    python benchmarks/load_study_stacks.py --users 50 --duration 20
+    python benchmarks/load_study_stacks.py --database-url postgresql://... --output resultados.json
+
+Sin --database-url se usa una base SQLite temporal (útil solo como humo:
+las cifras representativas se obtienen contra PostgreSQL).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_server(database_url: str, db_async: bool, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=database_url,
+        DB_ASYNC="true" if db_async else "false",
+        DEBUG="false",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("El servidor no arrancó a tiempo")
+
+
+async def seed_user(client: httpx.AsyncClient, base_url: str, index: int, cards: int, run_id: str) -> dict:
+    """Crear usuario con un mazo de tarjetas y devolver sus cabeceras de auth"""
+    username = f"load_{run_id}_{index}"
+    await client.post(f"{base_url}/auth/register", json={
+        "username": username,
+        "email": f"{username}@load.test",
+        "password": "load-test-password",
+    })
+    response = await client.post(f"{base_url}/auth/token", data={
+        "username": username,
+        "password": "load-test-password",
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    deck = (await client.post(f"{base_url}/decks/import-pdf/confirm", json={
+        "deck_name": "Carga",
+        "flashcards": [{"front": f"Pregunta {i}", "back": f"Respuesta {i}"} for i in range(cards)],
+    }, headers=headers)).json()
+    return {"headers": headers, "deck_id": deck["id"]}
+
+
+async def study_loop(client: httpx.AsyncClient, base_url: str, user: dict, stop_at: float, latencies: list, errors: list) -> None:
+    """Bucle next + review hasta que venza el tiempo o no queden tarjetas"""
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.get(f"{base_url}/study/next", headers=user["headers"])
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            continue
+        card = response.json()
+        if card is None:
+            return
+
+        review = await client.post(f"{base_url}/study/review", json={
+            "flashcard_id": card["id"],
+            "quality": "good",
+            "time_spent_seconds": 1,
+        }, headers=user["headers"])
+        if review.status_code != 200:
+            errors.append(review.status_code)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_stack(args, db_async: bool) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}/api"
+    server = start_server(args.database_url, db_async, port, args.workers)
+    try:
+        await wait_ready(f"http://127.0.0.1:{port}")
+
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+            run_id = f"{'a' if db_async else 's'}{int(time.time())}"
+            users = [await seed_user(client, base_url, i, args.cards, run_id) for i in range(args.users)]
+
+            latencies, errors = [], []
+            started = time.monotonic()
+            stop_at = started + args.duration
+            await asyncio.gather(*[
+                study_loop(client, base_url, user, stop_at, latencies, errors) for user in users
+            ])
+            elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "stack": "async" if db_async else "sync",
+        "users": args.users,
+        "duration_s": round(elapsed, 2),
+        "reviews": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not args.database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{tmp_dir.name}/load.db"
+
+    results = []
+    for db_async in (False, True):
+        print(f"🚀 Stack {'async' if db_async else 'sync'}...")
+        result = await run_stack(args, db_async)
+        results.append(result)
+        print(f"   {result['throughput_rps']} reviews/s | p50 {result['p50_ms']} ms | "
+              f"p95 {result['p95_ms']} ms | p99 {result['p99_ms']} ms | errores {result['errors']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"💾 Resultados guardados en {args.output}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
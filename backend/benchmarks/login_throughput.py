@@ -0,0 +1,143 @@
+"""
+Benchmark de login: logins por segundo y por núcleo con bcrypt en el pool
+
+Mide primero el coste de una verificación bcrypt en este proceso (techo
+teórico por núcleo) y después arranca el backend con uvicorn y lanza
+peticiones concurrentes a POST /auth/token durante N segundos.
+
+Uso (desde backend/):
+    python benchmarks/login_throughput.py --rounds 12 --concurrency 32 --duration 15
+    python benchmarks/login_throughput.py --rounds 10 --hash-workers 2 --output login.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from passlib.context import CryptContext
+
+from load_study_stacks import BACKEND_DIR, free_port, percentile, wait_ready
+
+PASSWORD = "login-bench-password"
+
+
+def single_verify_seconds(rounds: int, samples: int = 5) -> float:
+    """Tiempo medio de una verificación bcrypt con ese coste (un hilo)"""
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    hashed = context.hash(PASSWORD)
+    started = time.perf_counter()
+    for _ in range(samples):
+        context.verify(PASSWORD, hashed)
+    return (time.perf_counter() - started) / samples
+
+
+def start_server(args, port: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=args.database_url,
+        BCRYPT_ROUNDS=str(args.rounds),
+        PASSWORD_HASH_WORKERS=str(args.hash_workers),
+        DEBUG="false",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def login_loop(client: httpx.AsyncClient, username: str, stop_at: float, latencies: list, errors: list) -> None:
+    while time.monotonic() < stop_at:
+        started = time.perf_counter()
+        response = await client.post("/auth/token", data={"username": username, "password": PASSWORD})
+        if response.status_code != 200:
+            errors.append(response.status_code)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args) -> dict:
+    port = free_port()
+    server = start_server(args, port)
+    try:
+        await wait_ready(f"http://127.0.0.1:{port}")
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}/api", timeout=120, limits=limits) as client:
+            username = f"login_bench_{int(time.time())}"
+            await client.post("/auth/register", json={
+                "username": username,
+                "email": f"{username}@bench.test",
+                "password": PASSWORD,
+            })
+
+            latencies, errors = [], []
+            started = time.monotonic()
+            stop_at = started + args.duration
+            await asyncio.gather(*[
+                login_loop(client, username, stop_at, latencies, errors) for _ in range(args.concurrency)
+            ])
+            elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    cores = args.hash_workers or os.cpu_count() or 1
+    throughput = len(latencies) / elapsed if elapsed else 0
+    verify_s = single_verify_seconds(args.rounds)
+    return {
+        "rounds": args.rounds,
+        "hash_workers": cores,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "logins": len(latencies),
+        "errors": len(errors),
+        "logins_per_s": round(throughput, 1),
+        "logins_per_s_per_core": round(throughput / cores, 2),
+        "ceiling_per_core": round(1 / verify_s, 2),
+        "bcrypt_verify_ms": round(verify_s * 1000, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="")
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--hash-workers", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if not args.database_url:
+        tmp_dir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{tmp_dir.name}/login.db"
+
+    print(f"🔐 Login con bcrypt rounds={args.rounds}...")
+    result = await run(args)
+    print(f"   {result['logins_per_s']} logins/s | {result['logins_per_s_per_core']} por núcleo "
+          f"(techo {result['ceiling_per_core']}) | p50 {result['p50_ms']} ms | "
+          f"p99 {result['p99_ms']} ms | errores {result['errors']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+        print(f"💾 Resultados guardados en {args.output}")
+
+    if tmp_dir:
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
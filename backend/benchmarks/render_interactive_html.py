@@ -0,0 +1,139 @@
+"""
+Benchmark del export HTML interactivo (build_interactive_html)
+
+Genera un temario sintético (~1 MB) con N anotaciones sin solapes, mide el
+export completo y compara la inserción de anotaciones de una pasada con el
+algoritmo anterior (copiar el documento y llamar a markdown.markdown por
+cada anotación). Comprueba además que ambos producen el mismo contenido.
+
+Uso (desde backend/):
+    python benchmarks/render_interactive_html.py
+    python benchmarks/render_interactive_html.py --size-mb 1 --annotations 2000 --repeat 5 --output render.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import markdown
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from routers.study_docs import (  # noqa: E402
+    _annotation_details_html,
+    build_interactive_html,
+    render_annotated_content,
+)
+
+PARAGRAPH = (
+    "Artículo {n}. Los poderes públicos promoverán las condiciones para que la libertad "
+    "y la igualdad del individuo y de los grupos en que se integra sean reales y efectivas; "
+    "remover los obstáculos que impidan o dificulten su plenitud.\n\n"
+)
+
+
+def make_document(size_bytes: int) -> SimpleNamespace:
+    parts = []
+    total = 0
+    n = 1
+    while total < size_bytes:
+        paragraph = PARAGRAPH.format(n=n)
+        parts.append(paragraph)
+        total += len(paragraph.encode("utf-8"))
+        n += 1
+    return SimpleNamespace(
+        title="Temario sintético",
+        description="Benchmark de exportación",
+        content="".join(parts),
+    )
+
+
+def make_annotations(content: str, count: int, seed: int = 42) -> list:
+    """Anotaciones de 20-60 caracteres repartidas sin solaparse"""
+    rng = random.Random(seed)
+    slot = len(content) // count
+    annotations = []
+    for i in range(count):
+        start = i * slot + rng.randint(0, max(0, slot - 61))
+        end = start + rng.randint(20, 60)
+        annotations.append(SimpleNamespace(
+            id=i + 1,
+            start_pos=start,
+            end_pos=end,
+            selected_text=content[start:end],
+            annotation_title=f"Nota {i + 1}" if i % 3 else None,
+            linked_content=f"**Concepto {i % 50}**\n\n- Detalle {i}\n- Ver artículo {i % 169 + 1}",
+            article_number=f"Art. {i % 169 + 1}" if i % 2 else None,
+        ))
+    rng.shuffle(annotations)
+    return annotations
+
+
+def legacy_annotated_content(content: str, annotations: list) -> str:
+    """Algoritmo anterior: una copia del documento y un markdown.markdown por anotación"""
+    for ann in sorted(annotations, key=lambda a: a.start_pos, reverse=True):
+        html_content = markdown.markdown(ann.linked_content, extensions=['tables', 'fenced_code'])
+        content = content[:ann.start_pos] + _annotation_details_html(ann, html_content) + content[ann.end_pos:]
+    return content
+
+
+def timed(fn, repeat: int) -> tuple:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--annotations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="No medir el algoritmo anterior")
+    parser.add_argument("--output", default="")
+    args = parser.parse_args()
+
+    document = make_document(int(args.size_mb * 1024 * 1024))
+    annotations = make_annotations(document.content, args.annotations)
+    print(f"📄 Documento de {len(document.content.encode('utf-8')) / 1024 / 1024:.2f} MB "
+          f"con {len(annotations)} anotaciones")
+
+    html, timings = timed(lambda: build_interactive_html(document, annotations), args.repeat)
+    (content, _), render_timings = timed(
+        lambda: render_annotated_content(document.content, annotations), args.repeat
+    )
+    results = {
+        "size_bytes": len(document.content.encode("utf-8")),
+        "annotations": len(annotations),
+        "output_bytes": len(html.encode("utf-8")),
+        "export_ms": round(statistics.median(timings) * 1000, 1),
+        "single_pass_ms": round(statistics.median(render_timings) * 1000, 1),
+    }
+    print(f"⚡ Export completo: {results['export_ms']} ms | inserción de anotaciones: "
+          f"{results['single_pass_ms']} ms (mediana de {args.repeat})")
+
+    if not args.skip_legacy:
+        legacy_content, legacy_timings = timed(
+            lambda: legacy_annotated_content(document.content, annotations), args.repeat
+        )
+        results["legacy_ms"] = round(statistics.median(legacy_timings) * 1000, 1)
+        results["speedup"] = round(results["legacy_ms"] / max(results["single_pass_ms"], 0.001), 1)
+        results["same_output"] = legacy_content == content
+        print(f"🐢 Algoritmo anterior: {results['legacy_ms']} ms (x{results['speedup']})")
+        print(f"{'✅' if results['same_output'] else '❌'} Mismo contenido: {results['same_output']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"💾 Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark del planificador SM-2 (sm2.py) y generador del corpus dorado
+
+Dos comandos:
+
+    bench   Reviews por segundo de calculate_sm2 (camino escalar) y de cada
+            implementación por lotes registrada en BATCH_IMPLEMENTATIONS.
+    golden  Regenerar tests/data/sm2_golden.json (solo si el cambio de
+            resultados es intencionado: es la referencia con la que se
+            prueba que una reescritura da exactamente lo mismo).
+
+Para probar una reescritura (p. ej. vectorizada), añadirla a
+BATCH_IMPLEMENTATIONS: recibe una lista de (calidad, repeticiones, easiness,
+intervalo) y devuelve la lista de dicts que daría calculate_sm2. Las
+propiedades de SM-2 y el corpus dorado se comprueban contra todas las
+implementaciones en tests/test_sm2.py (pytest).
+
+Uso (desde backend/):
+    python benchmarks/sm2_scheduler.py bench --reviews 1000000 --output sm2.json
+    python benchmarks/sm2_scheduler.py golden
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sm2 import calculate_sm2  # noqa: E402
+
+GOLDEN_PATH = Path(__file__).resolve().parent.parent / "tests" / "data" / "sm2_golden.json"
+EF_FLOOR = 1.3
+INITIAL_STATE = (0, 2.5, 0)  # repeticiones, easiness, intervalo de una tarjeta nueva
+
+
+def scalar_loop(reviews: list) -> list:
+    """Referencia: calculate_sm2 review a review"""
+    return [calculate_sm2(q, repetitions, easiness, interval) for q, repetitions, easiness, interval in reviews]
+
+
+# nombre -> función(lista de (calidad, repeticiones, easiness, intervalo)) -> lista de dicts
+BATCH_IMPLEMENTATIONS = {
+    "scalar_loop": scalar_loop,
+}
+
+
+def random_reviews(count: int, seed: int) -> list:
+    """Entradas aleatorias pero alcanzables (easiness >= 1.3 con 2 decimales)"""
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(count):
+        repetitions = rng.randint(0, 12)
+        interval = rng.randint(0, 1) if repetitions == 0 else 1 if repetitions == 1 else rng.randint(6, 400)
+        reviews.append((rng.randint(0, 5), repetitions, round(rng.uniform(EF_FLOOR, 3.0), 2), interval))
+    return reviews
+
+
+# ============================================================================
+# Corpus dorado
+# ============================================================================
+
+def golden_sequences(seed: int = 2024) -> list:
+    """Secuencias de calidades: casos límite fijos + aleatorias con semilla"""
+    rng = random.Random(seed)
+    sequences = [
+        [0] * 10, [5] * 20, [3] * 20, [4] * 20, [2] * 10,
+        [5, 0] * 10, [3, 3, 3, 0, 3, 3, 3, 3, 0, 5, 5, 5],
+        [1, 2, 3, 4, 5] * 4, [5, 4, 3, 2, 1, 0] * 3,
+    ]
+    for _ in range(150):
+        # Sesgo hacia aprobados, como en el uso real
+        sequences.append(rng.choices(range(6), weights=[10, 4, 8, 30, 30, 18], k=rng.randint(1, 30)))
+    return sequences
+
+
+def replay(sequence: list, implementation) -> list:
+    """Estados tras cada review (una review por llamada: cada una depende de la anterior)"""
+    repetitions, easiness, interval = INITIAL_STATE
+    states = []
+    for quality in sequence:
+        result = implementation([(quality, repetitions, easiness, interval)])[0]
+        repetitions, easiness, interval = result["repetitions"], result["easiness"], result["interval"]
+        states.append([repetitions, easiness, interval])
+    return states
+
+
+def write_golden() -> None:
+    corpus = [{"qualities": sequence, "states": replay(sequence, scalar_loop)} for sequence in golden_sequences()]
+    GOLDEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    GOLDEN_PATH.write_text(json.dumps({"initial_state": INITIAL_STATE, "sequences": corpus}, separators=(",", ":")))
+    reviews = sum(len(entry["qualities"]) for entry in corpus)
+    print(f"💾 Corpus dorado: {len(corpus)} secuencias, {reviews} reviews -> {GOLDEN_PATH}")
+
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def bench(reviews: list, repeat: int) -> dict:
+    results = {}
+
+    def timed(fn) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
+
+    def scalar():
+        for q, repetitions, easiness, interval in reviews:
+            calculate_sm2(q, repetitions, easiness, interval)
+
+    elapsed = timed(scalar)
+    results["calculate_sm2"] = {"seconds": round(elapsed, 4), "reviews_per_second": round(len(reviews) / elapsed)}
+
+    for name, implementation in BATCH_IMPLEMENTATIONS.items():
+        elapsed = timed(lambda: implementation(reviews))
+        results[f"batch:{name}"] = {"seconds": round(elapsed, 4), "reviews_per_second": round(len(reviews) / elapsed)}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench_parser = sub.add_parser("bench", help="Reviews por segundo")
+    bench_parser.add_argument("--reviews", type=int, default=500_000)
+    bench_parser.add_argument("--repeat", type=int, default=3)
+    bench_parser.add_argument("--seed", type=int, default=42)
+    bench_parser.add_argument("--output", default="")
+    sub.add_parser("golden", help="Regenerar el corpus dorado")
+    args = parser.parse_args()
+
+    if args.command == "golden":
+        write_golden()
+        return
+
+    reviews = random_reviews(args.reviews, args.seed)
+    results = bench(reviews, args.repeat)
+    for name, result in results.items():
+        print(f"⚡ {name:<22} {result['reviews_per_second']:>12,} reviews/s ({result['seconds']} s)")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"reviews": args.reviews, "seed": args.seed, "results": results}, indent=2))
+        print(f"💾 Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,67 @@
 Configuración de base de datos
 """
 
+from typing import Any, Callable, Union
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from config import settings
 
+# Sesión de cualquiera de los dos stacks (sync o async)
+DBSession = Union[Session, AsyncSession]
+
+
+def _engine_kwargs(url: str, is_async: bool) -> dict:
+    """Parámetros de pool y timeouts configurables desde Settings"""
+    kwargs = {
+        "pool_pre_ping": True,
+        "echo": settings.DEBUG,
+    }
+
+    if url.startswith("sqlite"):
+        # SQLite (tests/benchmarks locales): sin parámetros de pool de servidor
+        return kwargs
+
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+
+    return kwargs
+
+
 # Engine
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
-    echo=settings.DEBUG
+    **_engine_kwargs(settings.DATABASE_URL, is_async=False)
 )
 
 # Session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine async (opcional, requiere asyncpg)
+async_engine = None
+AsyncSessionLocal = None
+if settings.DB_ASYNC:
+    async_engine = create_async_engine(
+        settings.async_database_url,
+        **_engine_kwargs(settings.async_database_url, is_async=True)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 # Base para modelos
 Base = declarative_base()
 
@@ -29,3 +74,44 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_db_session():
+    """
+    Dependency para routers async: AsyncSession si DB_ASYNC está activo,
+    Session síncrona en caso contrario. Usar junto con run_db().
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_db(db: DBSession, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecutar lógica ORM síncrona fn(session, *args) sin bloquear el event loop.
+
+    Con AsyncSession se ejecuta vía run_sync (I/O async con asyncpg, sin
+    hilos); con Session síncrona se ejecuta en el threadpool de Starlette.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda sync_db: fn(sync_db, *args, **kwargs))
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def run_in_new_session(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    run_db con una sesión propia que se cierra al terminar. Para conexiones
+    largas (SSE), que no deben retener una conexión del pool mientras esperan.
+    """
+    sessions = get_db_session()
+    db = await sessions.__anext__()
+    try:
+        return await run_db(db, fn, *args, **kwargs)
+    finally:
+        await sessions.aclose()
@@ -3,14 +3,21 @@ OpositApp - Backend API
 Sistema de flashcards con repetición espaciada para oposiciones
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import hmac
 import uvicorn
 
 from config import settings
-from database import engine, Base
-from routers import flashcards, decks, study, auth, legislation, profile, notes, study_docs, syllabi
+from database import engine, async_engine, Base
+from auth_utils import password_executor
+from services.study_events import study_events
+from services.pdf_export_jobs import pdf_export_jobs
+from services.health import health_checker
+from services.request_metrics import RequestMetricsMiddleware, instrument_engine, metrics_registry
+from routers import flashcards, decks, study, analytics, auth, legislation, profile, notes, study_docs, syllabi
 
 
 @asynccontextmanager
@@ -21,11 +28,17 @@ async def lifespan(app: FastAPI):
     print(f"📊 Conectando a base de datos...")
     Base.metadata.create_all(bind=engine)
     print("✅ Base de datos lista")
+    await study_events.start()
 
     yield
 
     # Shutdown
     print("👋 Cerrando OpositApp Backend...")
+    await study_events.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+    password_executor.shutdown(wait=False)
+    pdf_export_jobs.shutdown()
 
 
 app = FastAPI(
@@ -35,6 +48,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Métricas por petición (consultas SQL, tiempos, tamaño) + Server-Timing
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine)
+app.add_middleware(RequestMetricsMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -50,6 +69,7 @@ app.include_router(profile.router, prefix="/api/profile", tags=["profile"])
 app.include_router(decks.router, prefix="/api/decks", tags=["decks"])
 app.include_router(flashcards.router, prefix="/api/flashcards", tags=["flashcards"])
 app.include_router(study.router, prefix="/api/study", tags=["study"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
 app.include_router(legislation.router, prefix="/api/legislation", tags=["legislation"])
 app.include_router(notes.router, prefix="/api/notes", tags=["notes"])
 app.include_router(study_docs.router, prefix="/api/study-docs", tags=["study-docs"])
@@ -67,14 +87,31 @@ async def root():
     }
 
 
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness: el proceso responde (sin comprobar dependencias)"""
+    return {"status": "alive"}
+
+
+@app.get("/api/health/ready")
 @app.get("/api/health")
-async def health():
-    """Health check detallado"""
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "redis": "connected"
-    }
+async def readiness():
+    """Readiness: base de datos (y Redis si se usa) responden; 503 si no"""
+    result = await health_checker.readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics(authorization: str = Header(default="")):
+    """Métricas por ruta en formato de texto de Prometheus"""
+    # Comparación en tiempo constante (bytes: compare_digest no admite str no ASCII)
+    expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+    if settings.METRICS_TOKEN and not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+    return PlainTextResponse(
+        metrics_registry.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
 if __name__ == "__main__":
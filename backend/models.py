@@ -2,8 +2,8 @@
 Modelos de base de datos
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Float, Boolean, Enum, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
@@ -41,6 +41,9 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     telegram_id = Column(String, unique=True, nullable=True, index=True)
+    # Código de un solo uso para vincular Telegram (hash SHA-256) y su caducidad
+    telegram_link_code = Column(String(64), unique=True, nullable=True, index=True)
+    telegram_link_expires_at = Column(DateTime(timezone=True), nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -74,6 +77,7 @@ class Deck(Base):
     # Relaciones
     user = relationship("User", back_populates="decks")
     flashcards = relationship("Flashcard", back_populates="deck", cascade="all, delete-orphan")
+    daily_stats = relationship("StudyDailyStat", cascade="all, delete-orphan")
     
     # Self-referential relationship for clones (optional but good for tracking)
     clones = relationship("Deck", back_populates="original_deck", remote_side=[id])
@@ -119,6 +123,10 @@ class Flashcard(Base):
 class StudySession(Base):
     """Sesión de estudio"""
     __tablename__ = "study_sessions"
+    __table_args__ = (
+        # Búsqueda de la sesión del día por rango de started_at
+        Index("ix_study_sessions_user_started_at", "user_id", "started_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -126,9 +134,11 @@ class StudySession(Base):
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     ended_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Contadores mantenidos en cada review con UPDATE ... SET x = x + 1
     cards_studied = Column(Integer, default=0)
     cards_correct = Column(Integer, default=0)
     cards_incorrect = Column(Integer, default=0)
+    time_spent_seconds = Column(Integer, default=0)
 
     # Relaciones
     user = relationship("User", back_populates="study_sessions")
@@ -164,6 +174,32 @@ class StudyLog(Base):
     flashcard = relationship("Flashcard", back_populates="study_logs")
 
 
+class StudyDailyStat(Base):
+    """
+    Resumen diario de reviews por usuario, mazo y tramo de intervalo.
+
+    Se actualiza con un upsert en cada review (ver services/study_rollups.py)
+    para que las analíticas no recorran study_logs.
+    """
+    __tablename__ = "study_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("user_id", "deck_id", "day", "interval_bucket", name="uq_study_daily_stats_key"),
+        Index("ix_study_daily_stats_user_day", "user_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    deck_id = Column(Integer, ForeignKey("decks.id"), nullable=False)
+    day = Column(Date, nullable=False)  # Día UTC de la review
+
+    # Límite inferior (días) del tramo de interval_before: 0, 1, 2, 4, 8, 15, 31, 91
+    interval_bucket = Column(Integer, nullable=False, default=0)
+
+    reviews = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)  # quality != again
+    time_spent_seconds = Column(Integer, nullable=False, default=0)
+
+
 class LegislationUpdate(Base):
     """Registro de actualizaciones legislativas detectadas"""
     __tablename__ = "legislation_updates"
@@ -197,7 +233,7 @@ class Note(Base):
 
     # Contenido
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=True)  # Markdown o texto plano
+    content = deferred(Column(Text, nullable=True))  # Markdown o texto plano (carga diferida)
     note_type = Column(Enum(NoteType), default=NoteType.CONTENT, nullable=False)
 
     # Etiquetas y metadatos
@@ -272,7 +308,7 @@ class StudyDocument(Base):
 
     # Contenido
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)  # El texto base (temario)
+    content = deferred(Column(Text, nullable=False))  # El texto base (temario, carga diferida)
     description = Column(Text, nullable=True)
 
     # Sharing
@@ -291,12 +327,13 @@ class StudyAnnotation(Base):
     __tablename__ = "study_annotations"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("study_documents.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("study_documents.id"), nullable=False, index=True)
 
     # Posición en el texto
     start_pos = Column(Integer, nullable=False)  # Posición inicial del texto seleccionado
     end_pos = Column(Integer, nullable=False)    # Posición final del texto seleccionado
     selected_text = Column(String, nullable=False)  # El texto seleccionado (para verificación)
+    is_orphan = Column(Boolean, default=False)  # Su texto desapareció al editar el documento
 
     # Contenido vinculado
     annotation_title = Column(String, nullable=True)  # Título opcional para TOC
@@ -384,12 +421,12 @@ class StructuredTopic(Base):
     # Contenido
     title = Column(String, nullable=False)
     code = Column(String, nullable=True)  # "1.2.3" o "Tema 1"
-    content = Column(Text, nullable=True)  # Contenido procesado (markdown)
+    content = deferred(Column(Text, nullable=True), group="body")  # Contenido procesado (markdown)
 
     # Fuente y trazabilidad
     source_type = Column(Enum(SourceType), default=SourceType.PENDING, nullable=False)
     source_reference = Column(String, nullable=True)  # Ruta al archivo o URL
-    source_excerpt = Column(Text, nullable=True)  # Texto original extraído
+    source_excerpt = deferred(Column(Text, nullable=True), group="body")  # Texto original extraído
 
     # Estado
     content_status = Column(Enum(ContentStatus), default=ContentStatus.EMPTY, nullable=False)
@@ -436,7 +473,9 @@ class NormativeSource(Base):
     url = Column(String, nullable=True)  # URL oficial
 
     # Contenido indexado
-    full_text = Column(Text, nullable=True)  # Texto extraído del PDF
+    full_text = deferred(Column(Text, nullable=True))  # Legacy: texto en BD (ahora en services/text_store)
+    text_hash = Column(String(64), nullable=True, index=True)  # SHA-256 del texto en el almacén
+    text_size = Column(Integer, nullable=True)  # Tamaño del texto en bytes (UTF-8)
     is_indexed = Column(Boolean, default=False, index=True)
     indexed_at = Column(DateTime(timezone=True), nullable=True)
 
@@ -0,0 +1,194 @@
+"""
+Router de analíticas de estudio
+
+Todas las consultas leen los resúmenes diarios (study_daily_stats), nunca
+study_logs: el coste depende del rango de días pedido, no del historial.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+
+from database import get_db_session, run_db, DBSession
+from models import Deck, StudyDailyStat, User
+from auth_utils import get_current_user_db
+from services.study_rollups import INTERVAL_BUCKETS, bucket_label
+
+router = APIRouter()
+
+
+class HeatmapDay(BaseModel):
+    """Actividad de un día"""
+    date: date
+    reviews: int
+    correct: int
+
+
+class HeatmapResponse(BaseModel):
+    """Mapa de actividad (solo días con reviews)"""
+    start: date
+    end: date
+    total_reviews: int
+    days: List[HeatmapDay]
+
+
+class RetentionBucket(BaseModel):
+    """Retención de las tarjetas repasadas con un intervalo previo en el tramo"""
+    interval_min_days: int
+    label: str
+    reviews: int
+    correct: int
+    retention: float  # % de reviews no fallidas
+
+
+class DeckTime(BaseModel):
+    """Tiempo de estudio de un mazo"""
+    deck_id: int
+    deck_name: str
+    reviews: int
+    time_spent_seconds: int
+    avg_seconds_per_card: float
+
+
+class StudyTimeResponse(BaseModel):
+    """Tiempo medio por tarjeta en el periodo"""
+    start: date
+    end: date
+    reviews: int
+    time_spent_seconds: int
+    avg_seconds_per_card: float
+    decks: List[DeckTime]
+
+
+def _period(days: int):
+    end = datetime.now(timezone.utc).date()
+    return end - timedelta(days=days - 1), end
+
+
+def _rollups(db: Session, user_id: int, deck_id: int | None, start: date, end: date, *columns):
+    query = db.query(*columns).filter(
+        StudyDailyStat.user_id == user_id,
+        StudyDailyStat.day >= start,
+        StudyDailyStat.day <= end
+    )
+    if deck_id:
+        query = query.filter(StudyDailyStat.deck_id == deck_id)
+    return query
+
+
+def _avg(total: int, count: int) -> float:
+    return round(total / count, 1) if count else 0.0
+
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(
+    days: int = Query(365, ge=1, le=730),
+    deck_id: int | None = None,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Reviews por día de los últimos `days` días (mapa de actividad)"""
+    return await run_db(db, _get_heatmap, current_user.id, deck_id, days)
+
+
+def _get_heatmap(db: Session, user_id: int, deck_id: int | None, days: int):
+    start, end = _period(days)
+    rows = _rollups(
+        db, user_id, deck_id, start, end,
+        StudyDailyStat.day,
+        func.sum(StudyDailyStat.reviews),
+        func.sum(StudyDailyStat.correct)
+    ).group_by(StudyDailyStat.day).order_by(StudyDailyStat.day).all()
+
+    heatmap_days = [HeatmapDay(date=day, reviews=reviews, correct=correct) for day, reviews, correct in rows]
+    return HeatmapResponse(
+        start=start,
+        end=end,
+        total_reviews=sum(day.reviews for day in heatmap_days),
+        days=heatmap_days
+    )
+
+
+@router.get("/retention", response_model=List[RetentionBucket])
+async def get_retention(
+    days: int = Query(90, ge=1, le=730),
+    deck_id: int | None = None,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Retención por tramo de intervalo previo a la review (curva de olvido)"""
+    return await run_db(db, _get_retention, current_user.id, deck_id, days)
+
+
+def _get_retention(db: Session, user_id: int, deck_id: int | None, days: int):
+    start, end = _period(days)
+    rows = _rollups(
+        db, user_id, deck_id, start, end,
+        StudyDailyStat.interval_bucket,
+        func.sum(StudyDailyStat.reviews),
+        func.sum(StudyDailyStat.correct)
+    ).group_by(StudyDailyStat.interval_bucket).all()
+    totals = {bucket: (reviews, correct) for bucket, reviews, correct in rows}
+
+    # Todos los tramos, también los vacíos, para pintar la curva completa
+    result = []
+    for bucket in INTERVAL_BUCKETS:
+        reviews, correct = totals.get(bucket, (0, 0))
+        result.append(RetentionBucket(
+            interval_min_days=bucket,
+            label=bucket_label(bucket),
+            reviews=reviews,
+            correct=correct,
+            retention=round(correct / reviews * 100, 1) if reviews else 0.0
+        ))
+    return result
+
+
+@router.get("/time", response_model=StudyTimeResponse)
+async def get_study_time(
+    days: int = Query(30, ge=1, le=730),
+    deck_id: int | None = None,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Tiempo medio por tarjeta en los últimos `days` días, total y por mazo"""
+    return await run_db(db, _get_study_time, current_user.id, deck_id, days)
+
+
+def _get_study_time(db: Session, user_id: int, deck_id: int | None, days: int):
+    start, end = _period(days)
+    rows = _rollups(
+        db, user_id, deck_id, start, end,
+        StudyDailyStat.deck_id,
+        Deck.name,
+        func.sum(StudyDailyStat.reviews),
+        func.sum(StudyDailyStat.time_spent_seconds)
+    ).join(Deck, Deck.id == StudyDailyStat.deck_id).group_by(
+        StudyDailyStat.deck_id, Deck.name
+    ).order_by(func.sum(StudyDailyStat.reviews).desc()).all()
+
+    decks = [
+        DeckTime(
+            deck_id=row_deck_id,
+            deck_name=name,
+            reviews=reviews,
+            time_spent_seconds=time_spent,
+            avg_seconds_per_card=_avg(time_spent, reviews)
+        )
+        for row_deck_id, name, reviews, time_spent in rows
+    ]
+    reviews = sum(deck.reviews for deck in decks)
+    time_spent = sum(deck.time_spent_seconds for deck in decks)
+
+    return StudyTimeResponse(
+        start=start,
+        end=end,
+        reviews=reviews,
+        time_spent_seconds=time_spent,
+        avg_seconds_per_card=_avg(time_spent, reviews),
+        decks=decks
+    )
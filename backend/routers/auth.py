@@ -6,11 +6,20 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
-from database import get_db
+from database import get_db, get_db_session, run_db, DBSession
 from models import User
-from auth_utils import verify_password, get_password_hash, create_access_token, get_current_user
+from auth_utils import (
+    get_password_hash_async,
+    verify_and_update_password,
+    create_access_token,
+    get_current_user,
+    generate_link_code,
+    hash_link_code,
+    require_bot_service,
+)
 from config import settings
 
 router = APIRouter()
@@ -31,23 +40,43 @@ class UserResponse(BaseModel):
     id: int
     username: str
     email: str
+    telegram_id: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+class TelegramLinkCode(BaseModel):
+    code: str
+    expires_at: datetime
+    command: str
+
+
+class TelegramLinkRequest(BaseModel):
+    code: str
+    telegram_id: str
+
+
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: DBSession = Depends(get_db_session)):
     """Registrar nuevo usuario"""
+    await run_db(db, _check_new_user, user)
+    # bcrypt en el pool acotado, fuera del event loop
+    hashed_password = await get_password_hash_async(user.password)
+    return await run_db(db, _create_user, user, hashed_password)
+
+
+def _check_new_user(db: Session, user: UserCreate):
     # Check if username exists
     if db.query(User).filter(User.username == user.username).first():
         raise HTTPException(status_code=400, detail="Username already registered")
-    
+
     # Check if email exists
     if db.query(User).filter(User.email == user.email).first():
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(user.password)
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str):
     db_user = User(
         username=user.username,
         email=user.email,
@@ -60,24 +89,104 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: DBSession = Depends(get_db_session)
+):
     """Login para obtener token JWT"""
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    hashed_password = await run_db(db, _get_password_hash_for, form_data.username)
+    valid, new_hash = (False, None)
+    if hashed_password:
+        valid, new_hash = await verify_and_update_password(form_data.password, hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    # Hash con otro coste que BCRYPT_ROUNDS: guardar el regenerado
+    if new_hash:
+        await run_db(db, _update_password_hash, form_data.username, new_hash)
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": form_data.username}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+def _get_password_hash_for(db: Session, username: str):
+    row = db.query(User.hashed_password).filter(User.username == username).first()
+    return row[0] if row else None
+
+
+def _update_password_hash(db: Session, username: str, hashed_password: str):
+    db.query(User).filter(User.username == username).update(
+        {User.hashed_password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+
 @router.get("/me", response_model=UserResponse)
 def read_users_me(current_user: User = Depends(get_current_user)):
     """Obtener usuario actual"""
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+# ============================================================================
+# Vinculación con Telegram
+# ============================================================================
+
+@router.post("/telegram/link-code", response_model=TelegramLinkCode)
+def create_telegram_link_code(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Generar un código de un solo uso para vincular la cuenta con el bot
+    (el usuario lo envía al bot con /link CODIGO)
+    """
+    code = generate_link_code()
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=settings.TELEGRAM_LINK_CODE_TTL_MINUTES)
+
+    current_user.telegram_link_code = hash_link_code(code)
+    current_user.telegram_link_expires_at = expires_at
+    db.commit()
+
+    return {"code": code, "expires_at": expires_at, "command": f"/link {code}"}
+
+
+@router.post("/telegram/link", response_model=UserResponse, dependencies=[Depends(require_bot_service)])
+def link_telegram_account(data: TelegramLinkRequest, db: Session = Depends(get_db)):
+    """Canjear un código de vinculación (solo el bot, con su secreto de servicio)"""
+    user = db.query(User).filter(
+        User.telegram_link_code == hash_link_code(data.code),
+        User.telegram_link_expires_at > datetime.now(timezone.utc)
+    ).first()
+    if not user:
+        raise HTTPException(status_code=400, detail="Código no válido o caducado")
+
+    # Una cuenta de Telegram solo puede estar vinculada a un usuario
+    db.query(User).filter(
+        User.telegram_id == data.telegram_id,
+        User.id != user.id
+    ).update({User.telegram_id: None}, synchronize_session=False)
+
+    user.telegram_id = data.telegram_id
+    user.telegram_link_code = None
+    user.telegram_link_expires_at = None
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@router.delete("/telegram/link")
+def unlink_telegram_account(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Desvincular la cuenta de Telegram (desde la web o con /logout en el bot)"""
+    current_user.telegram_id = None
+    db.commit()
+    return {"message": "Telegram desvinculado"}
@@ -8,9 +8,9 @@ from typing import List
 from pydantic import BaseModel
 from datetime import datetime
 
-from database import get_db
+from database import get_db_session, run_db, DBSession
 from models import Deck, User, Flashcard
-from auth_utils import get_current_user
+from auth_utils import get_current_user_db
 from services.pdf_service import extract_text_from_pdf, generate_flashcards_from_text
 
 router = APIRouter()
@@ -38,12 +38,16 @@ class DeckResponse(BaseModel):
 
 
 @router.post("/", response_model=DeckResponse)
-def create_deck(
-    deck: DeckCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def create_deck(
+    deck: DeckCreate,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Crear nuevo deck"""
+    return await run_db(db, _create_deck, deck, current_user)
+
+
+def _create_deck(db: Session, deck: DeckCreate, current_user: User):
     db_deck = Deck(
         user_id=current_user.id,
         name=deck.name,
@@ -57,23 +61,31 @@ def create_deck(
 
 
 @router.get("/", response_model=List[DeckResponse])
-def get_my_decks(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_my_decks(
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener mis decks"""
+    return await run_db(db, _get_my_decks, current_user)
+
+
+def _get_my_decks(db: Session, current_user: User):
     decks = db.query(Deck).filter(Deck.user_id == current_user.id).all()
     return decks
 
 
 @router.get("/public", response_model=List[DeckResponse])
-def get_public_decks(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_public_decks(
+    skip: int = 0,
+    limit: int = 100,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener mercado de decks públicos (excluyendo los míos)"""
+    return await run_db(db, _get_public_decks, skip, limit, current_user)
+
+
+def _get_public_decks(db: Session, skip: int, limit: int, current_user: User):
     decks = db.query(Deck).filter(
         Deck.is_public == True,
         Deck.user_id != current_user.id
@@ -82,12 +94,16 @@ def get_public_decks(
 
 
 @router.get("/{deck_id}", response_model=DeckResponse)
-def get_deck(
-    deck_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_deck(
+    deck_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener deck por ID (si es mío o es público)"""
+    return await run_db(db, _get_deck, deck_id, current_user)
+
+
+def _get_deck(db: Session, deck_id: int, current_user: User):
     deck = db.query(Deck).filter(Deck.id == deck_id).first()
     if not deck:
         raise HTTPException(status_code=404, detail="Deck no encontrado")
@@ -100,12 +116,16 @@ def get_deck(
 
 
 @router.put("/{deck_id}/toggle-public", response_model=DeckResponse)
-def toggle_public(
-    deck_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def toggle_public(
+    deck_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Hacer público/privado un mazo"""
+    return await run_db(db, _toggle_public, deck_id, current_user)
+
+
+def _toggle_public(db: Session, deck_id: int, current_user: User):
     deck = db.query(Deck).filter(Deck.id == deck_id, Deck.user_id == current_user.id).first()
     if not deck:
         raise HTTPException(status_code=404, detail="Deck no encontrado o no eres el dueño")
@@ -117,12 +137,16 @@ def toggle_public(
 
 
 @router.post("/{deck_id}/clone", response_model=DeckResponse)
-def clone_deck(
+async def clone_deck(
     deck_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Clonar un mazo público a mi librería"""
+    return await run_db(db, _clone_deck, deck_id, current_user)
+
+
+def _clone_deck(db: Session, deck_id: int, current_user: User):
     original_deck = db.query(Deck).filter(Deck.id == deck_id).first()
     if not original_deck:
         raise HTTPException(status_code=404, detail="Deck original no encontrado")
@@ -166,12 +190,16 @@ def clone_deck(
 
 
 @router.delete("/{deck_id}")
-def delete_deck(
-    deck_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def delete_deck(
+    deck_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Eliminar deck"""
+    return await run_db(db, _delete_deck, deck_id, current_user)
+
+
+def _delete_deck(db: Session, deck_id: int, current_user: User):
     deck = db.query(Deck).filter(Deck.id == deck_id, Deck.user_id == current_user.id).first()
     if not deck:
         raise HTTPException(status_code=404, detail="Deck no encontrado o no eres el dueño")
@@ -185,8 +213,8 @@ async def import_pdf_preview(
     file: UploadFile = File(...),
     deck_name: str = Form(...),
     description: str = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """
     Importar PDF y generar preview de flashcards con IA
@@ -241,14 +269,18 @@ class PDFImportConfirm(BaseModel):
 
 
 @router.post("/import-pdf/confirm", response_model=DeckResponse)
-def confirm_pdf_import(
+async def confirm_pdf_import(
     data: PDFImportConfirm,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """
     Guardar flashcards generadas por IA después de confirmación del usuario
     """
+    return await run_db(db, _confirm_pdf_import, data, current_user)
+
+
+def _confirm_pdf_import(db: Session, data: PDFImportConfirm, current_user: User):
     if not data.flashcards:
         raise HTTPException(status_code=400, detail="No hay flashcards para guardar")
 
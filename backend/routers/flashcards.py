@@ -8,9 +8,9 @@ from typing import List
 from pydantic import BaseModel, Field
 from datetime import datetime
 
-from database import get_db
+from database import get_db_session, run_db, DBSession
 from models import Flashcard, Deck, User
-from auth_utils import get_current_user
+from auth_utils import get_current_user_db
 from services.ai_card_generator import generate_cards_from_text
 
 router = APIRouter()
@@ -57,12 +57,16 @@ class FlashcardUpdate(BaseModel):
 
 
 @router.post("/", response_model=FlashcardResponse)
-def create_flashcard(
-    flashcard: FlashcardCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def create_flashcard(
+    flashcard: FlashcardCreate,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Crear nueva flashcard"""
+    return await run_db(db, _create_flashcard, flashcard, current_user)
+
+
+def _create_flashcard(db: Session, flashcard: FlashcardCreate, current_user: User):
     # Verificar que el deck existe y pertenece al usuario
     deck = db.query(Deck).filter(Deck.id == flashcard.deck_id).first()
     if not deck:
@@ -80,14 +84,18 @@ def create_flashcard(
 
 
 @router.get("/", response_model=List[FlashcardResponse])
-def get_flashcards(
-    skip: int = 0, 
-    limit: int = 100, 
+async def get_flashcards(
+    skip: int = 0,
+    limit: int = 100,
     deck_id: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener flashcards. Si deck_id, comprueba acceso al deck. Si no, devuelve las del usuario."""
+    return await run_db(db, _get_flashcards, skip, limit, deck_id, current_user)
+
+
+def _get_flashcards(db: Session, skip: int, limit: int, deck_id: int | None, current_user: User):
     if deck_id:
         # Check deck access
         deck = db.query(Deck).filter(Deck.id == deck_id).first()
@@ -105,12 +113,16 @@ def get_flashcards(
 
 
 @router.get("/{flashcard_id}", response_model=FlashcardResponse)
-def get_flashcard(
-    flashcard_id: int, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_flashcard(
+    flashcard_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener flashcard por ID"""
+    return await run_db(db, _get_flashcard, flashcard_id, current_user)
+
+
+def _get_flashcard(db: Session, flashcard_id: int, current_user: User):
     flashcard = db.query(Flashcard).filter(Flashcard.id == flashcard_id).first()
     if not flashcard:
         raise HTTPException(status_code=404, detail="Flashcard no encontrada")
@@ -125,13 +137,17 @@ def get_flashcard(
 
 
 @router.put("/{flashcard_id}", response_model=FlashcardResponse)
-def update_flashcard(
-    flashcard_id: int, 
-    flashcard_update: FlashcardUpdate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def update_flashcard(
+    flashcard_id: int,
+    flashcard_update: FlashcardUpdate,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Actualizar flashcard"""
+    return await run_db(db, _update_flashcard, flashcard_id, flashcard_update, current_user)
+
+
+def _update_flashcard(db: Session, flashcard_id: int, flashcard_update: FlashcardUpdate, current_user: User):
     # Join with Deck to check ownership in one query
     result = db.query(Flashcard, Deck).join(Deck).filter(Flashcard.id == flashcard_id).first()
     
@@ -154,12 +170,16 @@ def update_flashcard(
 
 
 @router.delete("/{flashcard_id}")
-def delete_flashcard(
+async def delete_flashcard(
     flashcard_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Eliminar flashcard"""
+    return await run_db(db, _delete_flashcard, flashcard_id, current_user)
+
+
+def _delete_flashcard(db: Session, flashcard_id: int, current_user: User):
     result = db.query(Flashcard, Deck).join(Deck).filter(Flashcard.id == flashcard_id).first()
 
     if not result:
@@ -194,7 +214,7 @@ class GeneratedFlashcard(BaseModel):
 @router.post("/generate-from-text", response_model=List[GeneratedFlashcard])
 async def generate_flashcards_from_text(
     data: TextGenerationRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_db)
 ):
     """
     Generar flashcards desde texto usando IA.
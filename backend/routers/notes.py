@@ -3,7 +3,7 @@ Router para gestión de notas y apuntes
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
@@ -168,7 +168,7 @@ def get_my_notes(
     search: Optional[str] = None
 ):
     """Obtener mis notas con filtros opcionales"""
-    query = db.query(Note).filter(Note.user_id == current_user.id)
+    query = db.query(Note).options(undefer(Note.content)).filter(Note.user_id == current_user.id)
 
     if tags:
         # Filtrar por tags (búsqueda simple)
@@ -194,7 +194,7 @@ def get_note(
     current_user: User = Depends(get_current_user)
 ):
     """Obtener nota por ID"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = db.query(Note).options(undefer(Note.content)).filter(Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
 
@@ -256,7 +256,7 @@ def duplicate_note(
 ):
     """Duplicar una nota existente"""
     # Obtener nota original
-    original_note = db.query(Note).filter(Note.id == note_id).first()
+    original_note = db.query(Note).options(undefer(Note.content)).filter(Note.id == note_id).first()
     if not original_note:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
 
@@ -433,7 +433,7 @@ def clone_collection(
     # Clonar notas y crear nuevas jerarquías
     for hierarchy in hierarchies:
         # Obtener la nota original
-        original_note = db.query(Note).filter(Note.id == hierarchy.note_id).first()
+        original_note = db.query(Note).options(undefer(Note.content)).filter(Note.id == hierarchy.note_id).first()
 
         # Crear copia de la nota
         new_note = Note(
@@ -672,6 +672,8 @@ def export_collection_markdown(
     # Obtener todas las jerarquías con sus notas
     hierarchies = db.query(NoteHierarchy, Note).join(
         Note, NoteHierarchy.note_id == Note.id
+    ).options(
+        undefer(Note.content)
     ).filter(
         NoteHierarchy.collection_id == collection_id
     ).order_by(NoteHierarchy.order_index).all()
@@ -748,7 +750,7 @@ async def generate_flashcards_from_note(
 ):
     """Generar flashcards desde una nota usando IA"""
     # Verificar que la nota existe y pertenece al usuario
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = db.query(Note).options(undefer(Note.content)).filter(Note.id == note_id).first()
     if not note:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
     
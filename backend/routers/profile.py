@@ -6,9 +6,9 @@ Permite actualizar email y contraseña con re-autenticación
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from database import get_db
+from database import get_db_session, run_db, DBSession
 from models import User
-from auth_utils import get_current_user, get_password_hash, verify_password
+from auth_utils import get_current_user_db, get_password_hash_async, verify_password_async
 
 router = APIRouter()
 
@@ -25,26 +25,30 @@ class PasswordUpdate(BaseModel):
 
 
 @router.put("/email")
-def update_email(
+async def update_email(
     data: EmailUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """
     Actualizar email del usuario
     Requiere contraseña actual para verificación
     """
-    # Verificar contraseña actual
-    if not verify_password(data.current_password, current_user.hashed_password):
+    # Verificar contraseña actual (bcrypt en el pool, fuera del event loop)
+    if not await verify_password_async(data.current_password, current_user.hashed_password):
         raise HTTPException(status_code=400, detail="Contraseña incorrecta")
 
+    return await run_db(db, _update_email, current_user, data.new_email)
+
+
+def _update_email(db: Session, current_user: User, new_email: str):
     # Verificar que el nuevo email no esté en uso
-    existing_user = db.query(User).filter(User.email == data.new_email).first()
+    existing_user = db.query(User).filter(User.email == new_email).first()
     if existing_user and existing_user.id != current_user.id:
         raise HTTPException(status_code=400, detail="Este email ya está en uso")
 
     # Actualizar email
-    current_user.email = data.new_email
+    current_user.email = new_email
     db.commit()
     db.refresh(current_user)
 
@@ -56,33 +60,40 @@ def update_email(
 
 
 @router.put("/password")
-def update_password(
+async def update_password(
     data: PasswordUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """
     Actualizar contraseña del usuario
     Requiere contraseña actual y confirmación de nueva contraseña
     """
-    # Verificar contraseña actual
-    if not verify_password(data.current_password, current_user.hashed_password):
-        raise HTTPException(status_code=400, detail="Contraseña actual incorrecta")
-
+    # Primero las comprobaciones baratas, sin bcrypt
     # Verificar que las contraseñas nuevas coincidan
     if data.new_password != data.confirm_new_password:
         raise HTTPException(status_code=400, detail="Las contraseñas nuevas no coinciden")
 
-    # Verificar que la nueva contraseña sea diferente
-    if verify_password(data.new_password, current_user.hashed_password):
-        raise HTTPException(status_code=400, detail="La nueva contraseña debe ser diferente a la actual")
-
     # Validar longitud mínima de contraseña
     if len(data.new_password) < 6:
         raise HTTPException(status_code=400, detail="La contraseña debe tener al menos 6 caracteres")
 
+    # Verificar contraseña actual
+    if not await verify_password_async(data.current_password, current_user.hashed_password):
+        raise HTTPException(status_code=400, detail="Contraseña actual incorrecta")
+
+    # Verificar que la nueva contraseña sea diferente (la actual ya está
+    # verificada, así que basta comparar en claro en vez de otro bcrypt)
+    if data.new_password == data.current_password:
+        raise HTTPException(status_code=400, detail="La nueva contraseña debe ser diferente a la actual")
+
     # Actualizar contraseña
-    current_user.hashed_password = get_password_hash(data.new_password)
-    db.commit()
+    hashed_password = await get_password_hash_async(data.new_password)
+    await run_db(db, _set_password_hash, current_user, hashed_password)
 
     return {"message": "Contraseña actualizada correctamente"}
+
+
+def _set_password_hash(db: Session, current_user: User, hashed_password: str):
+    current_user.hashed_password = hashed_password
+    db.commit()
@@ -2,17 +2,25 @@
 Router para sistema de estudio con SM-2
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case
 from pydantic import BaseModel
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, time, timedelta, timezone
 from enum import Enum
+from typing import List
+import asyncio
+import json
 
-from database import get_db
+from config import settings
+from database import get_db_session, run_db, run_in_new_session, DBSession
 from models import Flashcard, StudySession, StudyLog, User, Deck
 from sm2 import calculate_sm2
-from auth_utils import get_current_user
+from auth_utils import create_stream_token, get_current_user_db, get_current_user_stream
+from services.study_events import study_events
+from services.study_rollups import record_review
+from services.study_forecast import get_forecast
 
 router = APIRouter()
 
@@ -44,11 +52,41 @@ class StudyResponse(BaseModel):
     interval_days: int
     repetitions: int
     easiness_factor: float
+    session_id: int | None = None
 
     class Config:
         from_attributes = True
 
 
+class StudySessionSummary(BaseModel):
+    """Resumen de una sesión de estudio (solo con la fila de la sesión)"""
+    id: int
+    started_at: datetime
+    ended_at: datetime | None
+    cards_studied: int
+    cards_correct: int
+    cards_incorrect: int
+    time_spent_seconds: int
+    accuracy: float
+    duration_seconds: int
+
+
+class ForecastDay(BaseModel):
+    """Carga prevista para un día"""
+    date: date
+    due: int  # Tarjetas programadas (hoy incluye las atrasadas)
+    projected: float | None  # Reviews esperadas contando repeticiones (solo con simulate)
+
+
+class ForecastResponse(BaseModel):
+    """Previsión de reviews para los próximos días"""
+    start: date
+    days: int
+    simulated: bool
+    total_due: int
+    forecast: List[ForecastDay]
+
+
 class FlashcardStudy(BaseModel):
     """Flashcard para estudiar"""
     id: int
@@ -64,12 +102,16 @@ class FlashcardStudy(BaseModel):
 
 
 @router.get("/next", response_model=FlashcardStudy | None)
-def get_next_flashcard(
+async def get_next_flashcard(
     deck_id: int | None = None, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener siguiente flashcard para estudiar (solo de mis mazos)"""
+    return await run_db(db, _get_next_flashcard, current_user, deck_id)
+
+
+def _get_next_flashcard(db: Session, current_user: User, deck_id: int | None):
     query = db.query(Flashcard).join(Deck).filter(
         Deck.user_id == current_user.id,
         Flashcard.next_review <= utc_now()
@@ -87,14 +129,50 @@ def get_next_flashcard(
     return flashcard
 
 
+@router.get("/due", response_model=List[FlashcardStudy])
+async def get_due_flashcards(
+    deck_id: int | None = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Obtener las próximas flashcards pendientes (precarga en clientes como el bot)"""
+    return await run_db(db, _get_due_flashcards, current_user, deck_id, limit)
+
+
+def _get_due_flashcards(db: Session, current_user: User, deck_id: int | None, limit: int):
+    query = db.query(Flashcard).join(Deck).filter(
+        Deck.user_id == current_user.id,
+        Flashcard.next_review <= utc_now()
+    )
+
+    if deck_id:
+        query = query.filter(Flashcard.deck_id == deck_id)
+
+    return query.order_by(Flashcard.next_review.asc()).limit(limit).all()
+
+
 @router.post("/review", response_model=StudyResponse)
-def review_flashcard(
+async def review_flashcard(
     review: StudyRequest, 
     session_id: int | None = None, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Revisar flashcard con algoritmo SM-2"""
+    # Leer el id antes del commit: con AsyncSession el usuario queda expirado
+    user_id = current_user.id
+    result = await run_db(db, _review_flashcard, current_user, review, session_id)
+
+    # Notificar a los streams SSE del usuario (ya con la review confirmada)
+    if study_events.wants(user_id):
+        snapshot = await run_db(db, _study_snapshot, user_id, result.session_id)
+        await study_events.publish(user_id, snapshot)
+
+    return result
+
+
+def _review_flashcard(db: Session, current_user: User, review: StudyRequest, session_id: int | None):
     # Verificar que la flashcard pertenece al usuario (vía deck)
     flashcard_data = db.query(Flashcard, Deck).join(Deck).filter(
         Flashcard.id == review.flashcard_id,
@@ -137,11 +215,7 @@ def review_flashcard(
     # Crear o obtener sesión de estudio
     if not session_id:
         # Buscar sesión activa hoy para este usuario o crear una
-        today = utc_now().date()
-        study_session = db.query(StudySession).filter(
-            StudySession.user_id == current_user.id,
-            func.date(StudySession.started_at) == today
-        ).first()
+        study_session = _today_session(db, current_user.id)
 
         if not study_session:
             study_session = StudySession(
@@ -153,7 +227,26 @@ def review_flashcard(
         
         session_id = study_session.id
 
+    # Contadores de la sesión con un único UPDATE ... SET x = x + 1 (atómico
+    # frente a reviews concurrentes). Si no afecta a ninguna fila, la sesión
+    # indicada no existe, no es del usuario o ya está cerrada.
+    correct = 0 if review.quality == StudyQuality.AGAIN else 1
+    updated = db.query(StudySession).filter(
+        StudySession.id == session_id,
+        StudySession.user_id == current_user.id,
+        StudySession.ended_at.is_(None)
+    ).update({
+        StudySession.cards_studied: func.coalesce(StudySession.cards_studied, 0) + 1,
+        StudySession.cards_correct: func.coalesce(StudySession.cards_correct, 0) + correct,
+        StudySession.cards_incorrect: func.coalesce(StudySession.cards_incorrect, 0) + (1 - correct),
+        StudySession.time_spent_seconds: func.coalesce(StudySession.time_spent_seconds, 0) + review.time_spent_seconds,
+    }, synchronize_session=False)
+
+    if not updated:
+        raise HTTPException(status_code=404, detail="Sesión de estudio no encontrada o cerrada")
+
     # Crear log de estudio
+    reviewed_at = utc_now()
     study_log = StudyLog(
         session_id=session_id,
         flashcard_id=flashcard.id,
@@ -166,10 +259,21 @@ def review_flashcard(
         easiness_after=result['easiness'],
         interval_after=result['interval'],
         next_review_after=flashcard.next_review,
-        reviewed_at=utc_now()
+        reviewed_at=reviewed_at
     )
     db.add(study_log)
 
+    # Resumen diario para analíticas (misma transacción que el log)
+    record_review(
+        db,
+        user_id=current_user.id,
+        deck_id=flashcard.deck_id,
+        reviewed_at=reviewed_at,
+        interval_before=interval_before,
+        correct=bool(correct),
+        time_spent_seconds=review.time_spent_seconds
+    )
+
     db.commit()
     db.refresh(flashcard)
 
@@ -178,30 +282,234 @@ def review_flashcard(
         next_review=flashcard.next_review,
         interval_days=flashcard.interval_days,
         repetitions=flashcard.repetitions,
-        easiness_factor=flashcard.easiness_factor
+        easiness_factor=flashcard.easiness_factor,
+        session_id=session_id
+    )
+
+
+def _today_session(db: Session, user_id: int):
+    """Sesión de estudio abierta de hoy del usuario (None si aún no hay)"""
+    # Rango sobre started_at (usa el índice user_id + started_at; func.date() no)
+    day_start = datetime.combine(utc_now().date(), time.min, tzinfo=timezone.utc)
+    return db.query(StudySession).filter(
+        StudySession.user_id == user_id,
+        StudySession.started_at >= day_start,
+        StudySession.started_at < day_start + timedelta(days=1),
+        StudySession.ended_at.is_(None)
+    ).order_by(StudySession.started_at.desc()).first()
+
+
+def _get_own_session(db: Session, user_id: int, session_id: int) -> StudySession:
+    study_session = db.query(StudySession).filter(
+        StudySession.id == session_id,
+        StudySession.user_id == user_id
+    ).first()
+
+    if not study_session:
+        raise HTTPException(status_code=404, detail="Sesión de estudio no encontrada")
+
+    return study_session
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite devuelve fechas sin zona horaria aunque se guarden en UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _session_summary(study_session: StudySession) -> StudySessionSummary:
+    studied = study_session.cards_studied or 0
+    correct = study_session.cards_correct or 0
+    started_at = _as_utc(study_session.started_at)
+    ended_at = _as_utc(study_session.ended_at) if study_session.ended_at else None
+
+    return StudySessionSummary(
+        id=study_session.id,
+        started_at=started_at,
+        ended_at=ended_at,
+        cards_studied=studied,
+        cards_correct=correct,
+        cards_incorrect=study_session.cards_incorrect or 0,
+        time_spent_seconds=study_session.time_spent_seconds or 0,
+        accuracy=round(correct / studied * 100, 1) if studied else 0.0,
+        duration_seconds=max(0, int(((ended_at or utc_now()) - started_at).total_seconds()))
     )
 
 
+@router.get("/sessions/{session_id}", response_model=StudySessionSummary)
+async def get_study_session(
+    session_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Resumen de una sesión de estudio (contadores guardados en la sesión)"""
+    return await run_db(db, _get_study_session, current_user.id, session_id)
+
+
+def _get_study_session(db: Session, user_id: int, session_id: int):
+    return _session_summary(_get_own_session(db, user_id, session_id))
+
+
+@router.post("/sessions/{session_id}/close", response_model=StudySessionSummary)
+async def close_study_session(
+    session_id: int,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """Cerrar una sesión de estudio y devolver su resumen (idempotente)"""
+    user_id = current_user.id
+    return await run_db(db, _close_study_session, user_id, session_id)
+
+
+def _close_study_session(db: Session, user_id: int, session_id: int):
+    study_session = _get_own_session(db, user_id, session_id)
+
+    if study_session.ended_at is None:
+        study_session.ended_at = utc_now()
+        db.commit()
+        db.refresh(study_session)
+
+    return _session_summary(study_session)
+
+
+@router.get("/forecast", response_model=ForecastResponse)
+async def get_study_forecast(
+    days: int = Query(14, ge=1, le=90),
+    deck_id: int | None = None,
+    simulate: bool = False,
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
+):
+    """
+    Reviews previstas por día para los próximos `days` días.
+
+    Con simulate=true añade la proyección SM-2 (las tarjetas repasadas vuelven
+    a aparecer) según la distribución de respuestas del usuario.
+    """
+    return await run_db(db, get_forecast, current_user.id, deck_id, days, simulate)
+
+
 @router.get("/stats")
-def get_study_stats(
+async def get_study_stats(
     deck_id: int | None = None, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: DBSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user_db)
 ):
     """Obtener estadísticas de estudio del usuario actual"""
-    query = db.query(Flashcard).join(Deck).filter(Deck.user_id == current_user.id)
+    return await run_db(db, _get_study_stats, current_user.id, deck_id)
+
+
+def _get_study_stats(db: Session, user_id: int, deck_id: int | None):
+    query = db.query(Flashcard).join(Deck).filter(Deck.user_id == user_id)
 
     if deck_id:
         query = query.filter(Flashcard.deck_id == deck_id)
 
-    total_cards = query.count()
-    cards_to_review = query.filter(Flashcard.next_review <= utc_now()).count()
-    cards_learning = query.filter(Flashcard.repetitions < 3).count()
-    cards_mastered = query.filter(Flashcard.repetitions >= 3).count()
+    # Los cuatro contadores en una sola consulta
+    total_cards, cards_to_review, cards_learning, cards_mastered = query.with_entities(
+        func.count(Flashcard.id),
+        func.count(case((Flashcard.next_review <= utc_now(), 1))),
+        func.count(case((Flashcard.repetitions < 3, 1))),
+        func.count(case((Flashcard.repetitions >= 3, 1))),
+    ).one()
 
     return {
         "total_cards": total_cards,
         "cards_to_review": cards_to_review,
         "cards_learning": cards_learning,
         "cards_mastered": cards_mastered
-    }
\ No newline at end of file
+    }
+
+
+def _session_totals(db: Session, session_id: int):
+    """Totales de una sesión de estudio (contadores de la propia fila)"""
+    study_session = db.get(StudySession, session_id)
+    if study_session is None:
+        return None
+
+    return {
+        "id": session_id,
+        "cards_studied": study_session.cards_studied or 0,
+        "cards_correct": study_session.cards_correct or 0,
+        "cards_incorrect": study_session.cards_incorrect or 0,
+        "time_spent_seconds": study_session.time_spent_seconds or 0
+    }
+
+
+def _study_snapshot(db: Session, user_id: int, session_id: int | None):
+    """Estado que se envía por el stream: contadores + totales de la sesión"""
+    if session_id is None:
+        study_session = _today_session(db, user_id)
+        session_id = study_session.id if study_session else None
+
+    snapshot = _get_study_stats(db, user_id, None)
+    snapshot["session"] = _session_totals(db, session_id) if session_id else None
+    return snapshot
+
+
+class StreamTokenResponse(BaseModel):
+    stream_token: str
+    expires_in: int  # Segundos para abrir la conexión
+
+
+@router.post("/stream/token", response_model=StreamTokenResponse)
+async def create_study_stream_token(current_user: User = Depends(get_current_user_db)):
+    """
+    Token de corta duración para /stream?stream_token= (EventSource no puede
+    enviar la cabecera Authorization). Solo hace falta al conectar: el
+    cliente pide uno nuevo antes de cada reconexión.
+    """
+    return StreamTokenResponse(
+        stream_token=create_stream_token(current_user.username),
+        expires_in=settings.STUDY_STREAM_TOKEN_SECONDS
+    )
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/stream")
+async def stream_study_events(
+    request: Request,
+    current_user: User = Depends(get_current_user_stream)
+):
+    """
+    Stream SSE (text/event-stream) con el estado de estudio del usuario.
+
+    Envía un evento "stats" al conectar y otro cada vez que se confirma una
+    review (desde cualquier cliente), en lugar de consultar /stats en bucle.
+    El JWT va en la cabecera Authorization; los navegadores (EventSource)
+    usan ?stream_token= con un token de POST /stream/token.
+    """
+    user_id = current_user.id
+    # Suscribirse antes del estado inicial para no perder reviews intermedias
+    queue = study_events.subscribe(user_id)
+    try:
+        initial = await run_in_new_session(_study_snapshot, user_id, None)
+    except BaseException:
+        study_events.unsubscribe(user_id, queue)
+        raise
+
+    async def events():
+        try:
+            yield sse_event("stats", initial)
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(
+                        queue.get(), timeout=settings.STUDY_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event("stats", snapshot)
+        finally:
+            study_events.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
\ No newline at end of file
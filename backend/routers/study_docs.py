@@ -2,20 +2,30 @@
 Router para documentos de estudio interactivos
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, undefer
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import logging
 import markdown
 import re
 
 from database import get_db
 from models import StudyDocument, StudyAnnotation, User
 from auth_utils import get_current_user
+from services.render_cache import etag_matches, render_cache, render_key
+from services.pdf_export_jobs import ExportJob, ExportQueueFull, PDFExportUnavailable, parse_job_id, pdf_export_jobs
+from services.annotation_anchors import find_overlaps, reanchor_annotations
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Operaciones máximas por petición en /annotations/bulk
+MAX_BULK_ANNOTATIONS = 2000
 
 
 # ============================================================================
@@ -41,6 +51,18 @@ class AnnotationUpdate(BaseModel):
     article_number: Optional[str] = None
 
 
+class AnnotationBulkUpdate(AnnotationUpdate):
+    """Schema para actualizar una anotación dentro de una operación en bloque"""
+    id: int
+
+
+class AnnotationBulkRequest(BaseModel):
+    """Schema para crear, actualizar y eliminar anotaciones de un documento a la vez"""
+    create: List[AnnotationCreate] = []
+    update: List[AnnotationBulkUpdate] = []
+    delete: List[int] = []
+
+
 class AnnotationResponse(BaseModel):
     """Schema respuesta anotación"""
     id: int
@@ -48,6 +70,7 @@ class AnnotationResponse(BaseModel):
     start_pos: int
     end_pos: int
     selected_text: str
+    is_orphan: Optional[bool] = False
     annotation_title: Optional[str]
     linked_content: str
     legal_reference: Optional[str]
@@ -59,6 +82,13 @@ class AnnotationResponse(BaseModel):
         from_attributes = True
 
 
+class AnnotationBulkResponse(BaseModel):
+    """Schema respuesta de la operación en bloque"""
+    created: List[AnnotationResponse]
+    updated: List[AnnotationResponse]
+    deleted: List[int]
+
+
 class DocumentCreate(BaseModel):
     """Schema para crear documento"""
     title: str
@@ -106,6 +136,20 @@ class DocumentListResponse(BaseModel):
         from_attributes = True
 
 
+class ExportJobResponse(BaseModel):
+    """Estado de un trabajo de exportación PDF"""
+    id: str
+    document_id: int
+    status: str  # pending | done | failed
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
 # ============================================================================
 # ENDPOINTS - DOCUMENTS
 # ============================================================================
@@ -136,12 +180,17 @@ def get_my_documents(
     current_user: User = Depends(get_current_user)
 ):
     """Obtener mis documentos de estudio"""
-    documents = db.query(StudyDocument).filter(
+    # Número de anotaciones como subconsulta: una sola consulta para toda la lista
+    annotation_count = select(func.count(StudyAnnotation.id)).where(
+        StudyAnnotation.document_id == StudyDocument.id
+    ).correlate(StudyDocument).scalar_subquery()
+
+    rows = db.query(StudyDocument, annotation_count).filter(
         StudyDocument.user_id == current_user.id
     ).all()
 
     result = []
-    for doc in documents:
+    for doc, count in rows:
         result.append(DocumentListResponse(
             id=doc.id,
             user_id=doc.user_id,
@@ -150,7 +199,7 @@ def get_my_documents(
             is_public=doc.is_public,
             created_at=doc.created_at,
             updated_at=doc.updated_at,
-            annotation_count=len(doc.annotations)
+            annotation_count=count
         ))
     return result
 
@@ -162,7 +211,9 @@ def get_document(
     current_user: User = Depends(get_current_user)
 ):
     """Obtener documento por ID"""
-    document = db.query(StudyDocument).filter(StudyDocument.id == document_id).first()
+    document = db.query(StudyDocument).options(
+        undefer(StudyDocument.content)
+    ).filter(StudyDocument.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
 
@@ -188,9 +239,18 @@ def update_document(
         raise HTTPException(status_code=403, detail="No tienes acceso a este documento")
 
     update_data = document_update.dict(exclude_unset=True)
+    old_content = db_document.content if "content" in update_data else None
     for field, value in update_data.items():
         setattr(db_document, field, value)
 
+    # Las posiciones de las anotaciones siguen al texto editado
+    if old_content is not None and update_data["content"] not in (None, old_content):
+        result = reanchor_annotations(db, document_id, old_content, update_data["content"])
+        logger.debug(
+            "Documento %s re-anclado: %s desplazadas, %s recolocadas, %s huérfanas",
+            document_id, result.shifted, result.relocated, result.orphaned
+        )
+
     db.commit()
     db.refresh(db_document)
     return db_document
@@ -212,6 +272,7 @@ def delete_document(
 
     db.delete(db_document)
     db.commit()
+    render_cache.invalidate(document_id)
     return None
 
 
@@ -219,6 +280,18 @@ def delete_document(
 # ENDPOINTS - ANNOTATIONS
 # ============================================================================
 
+def _validate_span(content: str, annotation: AnnotationCreate) -> Optional[str]:
+    """Error de posiciones/texto de una anotación nueva (None si es válida)"""
+    if annotation.start_pos < 0 or annotation.end_pos > len(content):
+        return "Posiciones inválidas"
+    if annotation.start_pos >= annotation.end_pos:
+        return "start_pos debe ser menor que end_pos"
+    actual_text = content[annotation.start_pos:annotation.end_pos]
+    if actual_text != annotation.selected_text:
+        return f"El texto seleccionado no coincide. Esperado: '{actual_text}'"
+    return None
+
+
 @router.post("/documents/{document_id}/annotations", response_model=AnnotationResponse, status_code=status.HTTP_201_CREATED)
 def create_annotation(
     document_id: int,
@@ -228,25 +301,18 @@ def create_annotation(
 ):
     """Crear nueva anotación en un documento"""
     # Verificar acceso al documento
-    document = db.query(StudyDocument).filter(StudyDocument.id == document_id).first()
+    document = db.query(StudyDocument).options(
+        undefer(StudyDocument.content)
+    ).filter(StudyDocument.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     if document.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="No tienes acceso a este documento")
 
-    # Verificar que las posiciones son válidas
-    if annotation.start_pos < 0 or annotation.end_pos > len(document.content):
-        raise HTTPException(status_code=400, detail="Posiciones inválidas")
-    if annotation.start_pos >= annotation.end_pos:
-        raise HTTPException(status_code=400, detail="start_pos debe ser menor que end_pos")
-
-    # Verificar que el texto seleccionado coincide
-    actual_text = document.content[annotation.start_pos:annotation.end_pos]
-    if actual_text != annotation.selected_text:
-        raise HTTPException(
-            status_code=400,
-            detail=f"El texto seleccionado no coincide. Esperado: '{actual_text}'"
-        )
+    # Verificar posiciones y que el texto seleccionado coincide
+    error = _validate_span(document.content, annotation)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     db_annotation = StudyAnnotation(
         document_id=document_id,
@@ -264,6 +330,96 @@ def create_annotation(
     return db_annotation
 
 
+@router.post("/documents/{document_id}/annotations/bulk", response_model=AnnotationBulkResponse)
+def bulk_annotations(
+    document_id: int,
+    request: AnnotationBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Crear, actualizar y eliminar anotaciones de un documento en una sola transacción.
+
+    Se valida todo antes de escribir: si una operación falla no se aplica
+    ninguna. Las nuevas anotaciones no pueden solaparse entre sí ni con las
+    existentes (salvo las que se eliminan en la misma petición).
+    """
+    total = len(request.create) + len(request.update) + len(request.delete)
+    if total > MAX_BULK_ANNOTATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Demasiadas operaciones ({total}), máximo {MAX_BULK_ANNOTATIONS}"
+        )
+
+    # Bloquear el documento: dos peticiones en bloque no validan solapes a la vez
+    document = db.query(StudyDocument).options(
+        undefer(StudyDocument.content)
+    ).filter(StudyDocument.id == document_id).with_for_update().first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    if document.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="No tienes acceso a este documento")
+
+    for index, annotation in enumerate(request.create):
+        error = _validate_span(document.content, annotation)
+        if error:
+            raise HTTPException(status_code=400, detail=f"create[{index}]: {error}")
+
+    existing = {
+        annotation.id: annotation
+        for annotation in db.query(StudyAnnotation).filter(StudyAnnotation.document_id == document_id)
+    }
+    delete_ids = set(request.delete)
+    update_ids = [annotation.id for annotation in request.update]
+    for annotation_id in list(delete_ids) + update_ids:
+        if annotation_id not in existing:
+            raise HTTPException(status_code=404, detail=f"Anotación {annotation_id} no encontrada en el documento")
+    if delete_ids.intersection(update_ids):
+        raise HTTPException(status_code=400, detail="Una anotación no puede actualizarse y eliminarse a la vez")
+    if len(set(update_ids)) != len(update_ids):
+        raise HTTPException(status_code=400, detail="Anotación repetida en update")
+
+    # Solapes: barrido ordenado sobre las que quedan + las nuevas
+    spans = [
+        (annotation.start_pos, annotation.end_pos, f"anotación {annotation.id}", False)
+        for annotation in existing.values()
+        if annotation.id not in delete_ids and not annotation.is_orphan
+    ]
+    spans.extend(
+        (annotation.start_pos, annotation.end_pos, f"create[{index}]", True)
+        for index, annotation in enumerate(request.create)
+    )
+    overlaps = find_overlaps(spans)
+    if overlaps:
+        first, second = overlaps[0]
+        raise HTTPException(status_code=409, detail=f"Anotaciones solapadas: {first} y {second}")
+
+    for annotation_id in delete_ids:
+        db.delete(existing[annotation_id])
+
+    updated = []
+    for annotation in request.update:
+        db_annotation = existing[annotation.id]
+        for field, value in annotation.dict(exclude_unset=True, exclude={"id"}).items():
+            setattr(db_annotation, field, value)
+        updated.append(db_annotation)
+
+    created = [
+        StudyAnnotation(document_id=document_id, **annotation.dict())
+        for annotation in request.create
+    ]
+    db.add_all(created)
+    db.flush()
+    returned_ids = [annotation.id for annotation in created + updated]
+    db.commit()
+
+    # Recargar lo devuelto en una sola consulta (el commit expira los objetos)
+    if returned_ids:
+        db.query(StudyAnnotation).filter(StudyAnnotation.id.in_(returned_ids)).all()
+
+    return {"created": created, "updated": updated, "deleted": sorted(delete_ids)}
+
+
 @router.put("/annotations/{annotation_id}", response_model=AnnotationResponse)
 def update_annotation(
     annotation_id: int,
@@ -315,21 +471,9 @@ def delete_annotation(
 # ENDPOINTS - EXPORT
 # ============================================================================
 
-def build_interactive_html(document: StudyDocument, annotations: list) -> str:
-    """Construir HTML interactivo con details/summary"""
-    # Ordenar anotaciones por posición (de mayor a menor para insertar sin desplazar)
-    sorted_annotations = sorted(annotations, key=lambda a: a.start_pos, reverse=True)
-
-    content = document.content
-
-    # Insertar las anotaciones como details/summary
-    for ann in sorted_annotations:
-        # Convertir contenido markdown a HTML
-        html_content = markdown.markdown(ann.linked_content, extensions=['tables', 'fenced_code'])
-
-        # Crear el elemento details
-        title = ann.annotation_title or ann.selected_text
-        details_html = f'''<details class="annotation" id="ann-{ann.id}">
+def _annotation_details_html(ann, html_content: str) -> str:
+    title = ann.annotation_title or ann.selected_text
+    return f'''<details class="annotation" id="ann-{ann.id}">
 <summary class="annotation-trigger">{ann.selected_text}</summary>
 <div class="annotation-content">
 <h4>{title}</h4>
@@ -338,12 +482,51 @@ def build_interactive_html(document: StudyDocument, annotations: list) -> str:
 </div>
 </details>'''
 
-        # Reemplazar el texto original con el details
-        content = content[:ann.start_pos] + details_html + content[ann.end_pos:]
 
-    # Construir tabla de contenidos
+def render_annotated_content(content: str, annotations: list) -> tuple:
+    """
+    Sustituir cada rango anotado por su details/summary en una sola pasada.
+
+    Recorre las anotaciones ordenadas una vez y va añadiendo trozos a una
+    lista (O(n + k) en lugar de copiar el documento por cada anotación).
+    Las anotaciones huérfanas, las que se solapan con una anterior o quedan
+    fuera del texto no se insertan. Devuelve (html, anotaciones insertadas en orden).
+    """
+    # Un único conversor markdown reutilizado; mismo contenido => mismo HTML
+    md = markdown.Markdown(extensions=['tables', 'fenced_code'])
+    rendered_markdown = {}
+
+    pieces = []
+    rendered = []
+    cursor = 0
+    for ann in sorted(annotations, key=lambda a: (a.start_pos, a.end_pos)):
+        if getattr(ann, "is_orphan", False):
+            continue
+        if ann.start_pos < cursor or ann.start_pos >= ann.end_pos or ann.end_pos > len(content):
+            print(f"⚠️ Anotación {ann.id} solapada o fuera del documento, no se inserta")
+            continue
+
+        html_content = rendered_markdown.get(ann.linked_content)
+        if html_content is None:
+            html_content = md.reset().convert(ann.linked_content)
+            rendered_markdown[ann.linked_content] = html_content
+
+        pieces.append(content[cursor:ann.start_pos])
+        pieces.append(_annotation_details_html(ann, html_content))
+        cursor = ann.end_pos
+        rendered.append(ann)
+
+    pieces.append(content[cursor:])
+    return ''.join(pieces), rendered
+
+
+def build_interactive_html(document: StudyDocument, annotations: list) -> str:
+    """Construir HTML interactivo con details/summary"""
+    content, rendered = render_annotated_content(document.content, annotations)
+
+    # Construir tabla de contenidos (mismo orden que en el documento)
     toc_items = []
-    for ann in sorted(annotations, key=lambda a: a.start_pos):
+    for ann in rendered:
         title = ann.annotation_title or ann.selected_text
         toc_items.append(f'<li><a href="#ann-{ann.id}">{title}</a></li>')
 
@@ -530,13 +713,10 @@ def build_interactive_html(document: StudyDocument, annotations: list) -> str:
     return html
 
 
-@router.get("/documents/{document_id}/export/html")
-def export_document_html(
-    document_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Exportar documento como HTML interactivo"""
+# Subir al cambiar la plantilla HTML o el CSS del PDF: invalida la caché de exports
+EXPORT_TEMPLATE_VERSION = 2
+
+def _get_exportable_document(db: Session, document_id: int, current_user: User) -> StudyDocument:
     document = db.query(StudyDocument).filter(StudyDocument.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
@@ -544,71 +724,176 @@ def export_document_html(
     if document.user_id != current_user.id and not document.is_public:
         raise HTTPException(status_code=403, detail="No tienes acceso a este documento")
 
-    html_content = build_interactive_html(document, document.annotations)
+    return document
+
+
+def _export_key(db: Session, document: StudyDocument, fmt: str) -> str:
+    """Clave de la versión renderizada: documento + versiones de anotaciones + plantilla"""
+    annotation_versions = db.query(
+        StudyAnnotation.id, StudyAnnotation.created_at, StudyAnnotation.updated_at
+    ).filter(StudyAnnotation.document_id == document.id).order_by(StudyAnnotation.id).all()
 
-    return Response(
-        content=html_content,
-        media_type="text/html",
-        headers={
-            "Content-Disposition": f'attachment; filename="{document.title}.html"'
-        }
+    return render_key(
+        document.id,
+        document.created_at,
+        document.updated_at,
+        [tuple(version) for version in annotation_versions],
+        EXPORT_TEMPLATE_VERSION,
+        fmt
     )
 
 
+def _export_headers(key: str) -> dict:
+    return {"ETag": f'"{key}"', "Cache-Control": "private, no-cache"}
+
+
+def _cached_export(request: Request, db: Session, document: StudyDocument, fmt: str, media_type: str, render):
+    """
+    Servir el export desde la caché en disco (renderizando solo si falta).
+
+    El ETag es la clave de la versión: si el cliente ya la tiene se responde
+    304 sin leer el contenido del documento. Con render=None no se renderiza:
+    devuelve (None, clave) si la versión no está en caché.
+    """
+    key = _export_key(db, document, fmt)
+    headers = _export_headers(key)
+
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers), key
+
+    path = render_cache.get(document.id, key, fmt)
+    if path is None:
+        if render is None:
+            return None, key
+        path = render_cache.put(document.id, key, fmt, render())
+
+    return FileResponse(path, media_type=media_type, filename=f"{document.title}.{fmt}", headers=headers), key
+
+
+def _job_response(job: ExportJob) -> ExportJobResponse:
+    response = ExportJobResponse.model_validate(job)
+    if job.status == "done":
+        response.download_url = f"/api/study-docs/export/pdf/jobs/{job.id}/download"
+    return response
+
+
+def _submit_pdf_job(document: StudyDocument, key: str) -> ExportJob:
+    try:
+        return pdf_export_jobs.submit(
+            document.id, key, lambda: build_interactive_html(document, document.annotations)
+        )
+    except ExportQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Hay demasiadas exportaciones PDF en curso, inténtalo en unos minutos"
+        )
+    except PDFExportUnavailable:
+        raise HTTPException(
+            status_code=501,
+            detail="Exportación PDF no disponible. Instalar: pip install weasyprint"
+        )
+
+
+def _get_job_for_user(db: Session, job_id: str, current_user: User) -> tuple:
+    parsed = parse_job_id(job_id)
+    if parsed is None:
+        raise HTTPException(status_code=404, detail="Trabajo de exportación no encontrado")
+
+    document_id, key = parsed
+    document = _get_exportable_document(db, document_id, current_user)
+    job = pdf_export_jobs.get(document_id, key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de exportación no encontrado")
+
+    return document, job
+
+
+@router.get("/documents/{document_id}/export/html")
+def export_document_html(
+    document_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Exportar documento como HTML interactivo"""
+    document = _get_exportable_document(db, document_id, current_user)
+
+    def render() -> bytes:
+        return build_interactive_html(document, document.annotations).encode("utf-8")
+
+    response, _ = _cached_export(request, db, document, "html", "text/html", render)
+    return response
+
+
 @router.get("/documents/{document_id}/export/pdf")
 def export_document_pdf(
     document_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Exportar documento como PDF con TOC"""
-    document = db.query(StudyDocument).filter(StudyDocument.id == document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    """
+    Exportar documento como PDF con TOC.
+
+    Si esta versión ya está renderizada se descarga directamente; si no, se
+    encola un trabajo y se responde 202 con su estado (ver /export/pdf/jobs).
+    """
+    document = _get_exportable_document(db, document_id, current_user)
+
+    response, key = _cached_export(request, db, document, "pdf", "application/pdf", render=None)
+    if response is not None:
+        return response
+
+    job = _submit_pdf_job(document, key)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(_job_response(job)),
+        headers={"Location": f"/api/study-docs/export/pdf/jobs/{job.id}"}
+    )
 
-    if document.user_id != current_user.id and not document.is_public:
-        raise HTTPException(status_code=403, detail="No tienes acceso a este documento")
 
-    try:
-        from weasyprint import HTML, CSS
+@router.post("/documents/{document_id}/export/pdf/jobs", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_pdf_export_job(
+    document_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Encolar la exportación PDF (o devolver el trabajo existente para esta versión)"""
+    document = _get_exportable_document(db, document_id, current_user)
+    return _job_response(_submit_pdf_job(document, _export_key(db, document, "pdf")))
 
-        html_content = build_interactive_html(document, document.annotations)
 
-        # CSS adicional para PDF
-        pdf_css = CSS(string='''
-            @page {
-                size: A4;
-                margin: 2cm;
-                @bottom-center {
-                    content: counter(page) " / " counter(pages);
-                }
-            }
+@router.get("/export/pdf/jobs/{job_id}", response_model=ExportJobResponse)
+def get_pdf_export_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Consultar el estado de un trabajo de exportación PDF"""
+    _, job = _get_job_for_user(db, job_id, current_user)
+    return _job_response(job)
 
-            details {
-                display: block !important;
-            }
 
-            .annotation-content {
-                display: block !important;
-                page-break-inside: avoid;
-            }
-
-            h1, h2, h3, h4 {
-                page-break-after: avoid;
-            }
-        ''')
-
-        pdf_bytes = HTML(string=html_content).write_pdf(stylesheets=[pdf_css])
-
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f'attachment; filename="{document.title}.pdf"'
-            }
-        )
-    except ImportError:
-        raise HTTPException(
-            status_code=501,
-            detail="Exportación PDF no disponible. Instalar: pip install weasyprint"
-        )
+@router.get("/export/pdf/jobs/{job_id}/download")
+def download_pdf_export(
+    job_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Descargar el PDF de un trabajo terminado (servido desde disco)"""
+    document, job = _get_job_for_user(db, job_id, current_user)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail="La exportación PDF falló, vuelve a solicitarla")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="La exportación PDF aún no ha terminado")
+
+    headers = _export_headers(job.key)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    path = render_cache.get(document.id, job.key, "pdf")
+    if path is None:
+        raise HTTPException(status_code=404, detail="El PDF ya no está disponible, vuelve a solicitarlo")
+
+    return FileResponse(path, media_type="application/pdf", filename=f"{document.title}.pdf", headers=headers)
@@ -3,7 +3,8 @@ Router para temarios estructurados (Syllabi)
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased, undefer_group
+from sqlalchemy import func, case, literal
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
@@ -176,13 +177,52 @@ def build_topic_tree(topics: List[StructuredTopic], parent_id: Optional[int] = N
     return sorted(result, key=lambda x: x["order_index"])
 
 
+PROCESSED_STATUSES = (ContentStatus.COMPLETE, ContentStatus.VERIFIED)
+
+
 def count_topics_by_status(topics: List[StructuredTopic]) -> tuple:
     """Contar temas totales y procesados"""
     total = len(topics)
-    processed = sum(1 for t in topics if t.content_status in [ContentStatus.COMPLETE, ContentStatus.VERIFIED])
+    processed = sum(1 for t in topics if t.content_status in PROCESSED_STATUSES)
     return total, processed
 
 
+def syllabi_with_counts_query(db: Session):
+    """
+    Query de temarios con contadores calculados en una sola consulta agregada.
+    Devuelve tuplas (Syllabus, total_topics, processed_topics).
+    """
+    counts = db.query(
+        StructuredTopic.syllabus_id.label("syllabus_id"),
+        func.count(StructuredTopic.id).label("total"),
+        func.sum(
+            case((StructuredTopic.content_status.in_(PROCESSED_STATUSES), 1), else_=0)
+        ).label("processed")
+    ).group_by(StructuredTopic.syllabus_id).subquery()
+
+    return db.query(
+        Syllabus,
+        func.coalesce(counts.c.total, 0),
+        func.coalesce(counts.c.processed, 0)
+    ).outerjoin(counts, counts.c.syllabus_id == Syllabus.id)
+
+
+def syllabus_to_dict(syllabus: Syllabus, total: int, processed: int) -> dict:
+    """Serializar temario con contadores calculados"""
+    return {
+        "id": syllabus.id,
+        "user_id": syllabus.user_id,
+        "name": syllabus.name,
+        "description": syllabus.description,
+        "source_file": syllabus.source_file,
+        "total_topics": total,
+        "processed_topics": processed,
+        "is_public": syllabus.is_public,
+        "created_at": syllabus.created_at,
+        "updated_at": syllabus.updated_at
+    }
+
+
 # ============================================================================
 # ENDPOINTS - SYLLABI
 # ============================================================================
@@ -211,18 +251,12 @@ def get_my_syllabi(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtener mis temarios"""
-    syllabi = db.query(Syllabus).filter(Syllabus.user_id == current_user.id).all()
-
-    # Actualizar contadores
-    for syllabus in syllabi:
-        topics = db.query(StructuredTopic).filter(StructuredTopic.syllabus_id == syllabus.id).all()
-        total, processed = count_topics_by_status(topics)
-        syllabus.total_topics = total
-        syllabus.processed_topics = processed
+    """Obtener mis temarios (contadores calculados en una sola consulta)"""
+    rows = syllabi_with_counts_query(db).filter(
+        Syllabus.user_id == current_user.id
+    ).order_by(Syllabus.id).all()
 
-    db.commit()
-    return syllabi
+    return [syllabus_to_dict(syllabus, total, processed) for syllabus, total, processed in rows]
 
 
 @router.get("/syllabi/{syllabus_id}", response_model=SyllabusDetailResponse)
@@ -239,21 +273,14 @@ def get_syllabus(
     if syllabus.user_id != current_user.id and not syllabus.is_public:
         raise HTTPException(status_code=403, detail="No tienes acceso a este temario")
 
-    # Obtener todos los temas y construir árbol
-    topics = db.query(StructuredTopic).filter(StructuredTopic.syllabus_id == syllabus_id).all()
+    # Obtener todos los temas (con contenido) y construir árbol
+    topics = db.query(StructuredTopic).options(
+        undefer_group("body")
+    ).filter(StructuredTopic.syllabus_id == syllabus_id).all()
     total, processed = count_topics_by_status(topics)
 
     return {
-        "id": syllabus.id,
-        "user_id": syllabus.user_id,
-        "name": syllabus.name,
-        "description": syllabus.description,
-        "source_file": syllabus.source_file,
-        "total_topics": total,
-        "processed_topics": processed,
-        "is_public": syllabus.is_public,
-        "created_at": syllabus.created_at,
-        "updated_at": syllabus.updated_at,
+        **syllabus_to_dict(syllabus, total, processed),
         "topics": build_topic_tree(topics)
     }
 
@@ -278,8 +305,11 @@ def update_syllabus(
         setattr(db_syllabus, field, value)
 
     db.commit()
-    db.refresh(db_syllabus)
-    return db_syllabus
+
+    syllabus, total, processed = syllabi_with_counts_query(db).filter(
+        Syllabus.id == syllabus_id
+    ).one()
+    return syllabus_to_dict(syllabus, total, processed)
 
 
 @router.delete("/syllabi/{syllabus_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -459,8 +489,12 @@ def delete_normative_source(
     if not db_source:
         raise HTTPException(status_code=404, detail="Fuente no encontrada")
 
+    text_hash = db_source.text_hash
     db.delete(db_source)
     db.commit()
+
+    if text_hash:
+        PDFIndexerService(db).release_text(text_hash)
     return None
 
 
@@ -468,6 +502,87 @@ def delete_normative_source(
 # ENDPOINTS - STATS
 # ============================================================================
 
+def progress_percentage(processed: int, total: int) -> float:
+    """Porcentaje de progreso redondeado a un decimal"""
+    return round((processed / total * 100) if total > 0 else 0, 1)
+
+
+def get_section_progress(db: Session, syllabus_id: int) -> List[dict]:
+    """
+    Progreso por sección raíz (ej: "Materias Comunes" / "Materias Específicas").
+
+    Un CTE recursivo asigna a cada tema el id de su raíz y se agrupa por
+    (raíz, estado) sin cargar el contenido de ningún tema.
+    """
+    subtree = db.query(
+        StructuredTopic.id.label("id"),
+        StructuredTopic.id.label("root_id"),
+        literal(0).label("depth")
+    ).filter(
+        StructuredTopic.syllabus_id == syllabus_id,
+        StructuredTopic.parent_id.is_(None)
+    ).cte("subtree", recursive=True)
+
+    child = aliased(StructuredTopic)
+    subtree = subtree.union_all(
+        db.query(
+            child.id,
+            subtree.c.root_id,
+            subtree.c.depth + 1
+        ).filter(child.parent_id == subtree.c.id)
+    )
+
+    grouped = db.query(
+        subtree.c.root_id,
+        StructuredTopic.content_status,
+        func.count(StructuredTopic.id)
+    ).join(
+        StructuredTopic, StructuredTopic.id == subtree.c.id
+    ).filter(
+        subtree.c.depth > 0
+    ).group_by(
+        subtree.c.root_id,
+        StructuredTopic.content_status
+    ).all()
+
+    roots = db.query(
+        StructuredTopic.id,
+        StructuredTopic.title,
+        StructuredTopic.code,
+        StructuredTopic.order_index
+    ).filter(
+        StructuredTopic.syllabus_id == syllabus_id,
+        StructuredTopic.parent_id.is_(None)
+    ).order_by(StructuredTopic.order_index).all()
+
+    sections = {
+        root.id: {
+            "topic_id": root.id,
+            "title": root.title,
+            "code": root.code,
+            "total_topics": 0,
+            "processed_topics": 0,
+            "progress_percentage": 0,
+            "by_status": {cs.value: 0 for cs in ContentStatus}
+        }
+        for root in roots
+    }
+
+    for root_id, content_status, count in grouped:
+        section = sections[root_id]
+        section["by_status"][content_status.value] += count
+        section["total_topics"] += count
+        if content_status in PROCESSED_STATUSES:
+            section["processed_topics"] += count
+
+    for section in sections.values():
+        section["progress_percentage"] = progress_percentage(
+            section["processed_topics"], section["total_topics"]
+        )
+
+    return list(sections.values())
+
+
 @router.get("/syllabi/{syllabus_id}/stats")
 def get_syllabus_stats(
     syllabus_id: int,
@@ -482,8 +597,6 @@ def get_syllabus_stats(
     if syllabus.user_id != current_user.id and not syllabus.is_public:
         raise HTTPException(status_code=403, detail="No tienes acceso a este temario")
 
-    topics = db.query(StructuredTopic).filter(StructuredTopic.syllabus_id == syllabus_id).all()
-
     by_status = {
         "empty": 0,
         "partial": 0,
@@ -497,19 +610,32 @@ def get_syllabus_stats(
         "pending": 0
     }
 
-    for topic in topics:
-        by_status[topic.content_status.value] += 1
-        by_source[topic.source_type.value] += 1
-
-    total = len(topics)
+    # Un solo GROUP BY en lugar de cargar todos los temas (con su contenido)
+    grouped = db.query(
+        StructuredTopic.content_status,
+        StructuredTopic.source_type,
+        func.count(StructuredTopic.id)
+    ).filter(
+        StructuredTopic.syllabus_id == syllabus_id
+    ).group_by(
+        StructuredTopic.content_status,
+        StructuredTopic.source_type
+    ).all()
+
+    for content_status, source_type, count in grouped:
+        by_status[content_status.value] += count
+        by_source[source_type.value] += count
+
+    total = sum(by_status.values())
     processed = by_status["complete"] + by_status["verified"]
 
     return {
         "total_topics": total,
         "processed_topics": processed,
-        "progress_percentage": round((processed / total * 100) if total > 0 else 0, 1),
+        "progress_percentage": progress_percentage(processed, total),
         "by_status": by_status,
-        "by_source": by_source
+        "by_source": by_source,
+        "sections": get_section_progress(db, syllabus_id)
     }
 
 
@@ -0,0 +1,211 @@
+"""
+Re-anclaje de anotaciones cuando cambia el contenido de un documento
+
+Las anotaciones guardan posiciones absolutas (start_pos/end_pos). Al editar
+el texto se calcula el guion de edición (regiones cambiadas) y:
+
+- Las anotaciones que no tocan ninguna región cambiada solo se desplazan:
+  un único UPDATE con CASE por tramo entre regiones, sin cargarlas.
+- Las que se solapan con una región cambiada se buscan de nuevo por su
+  selected_text cerca de la región; si no aparece quedan huérfanas
+  (is_orphan) para que el usuario las revise.
+
+El guion se obtiene recortando el prefijo y el sufijo comunes (comparación
+por bloques) y aplicando difflib por líneas solo a la parte central, así que
+el trabajo en Python depende del tamaño de la edición y de las anotaciones
+afectadas, no de documento × anotaciones.
+
+También incluye la comprobación de solapes (find_overlaps) que usan las
+operaciones en bloque sobre anotaciones.
+"""
+
+import difflib
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from sqlalchemy import and_, case, or_, update
+from sqlalchemy.orm import Session
+
+from models import StudyAnnotation
+
+# Región cambiada: old[i1:i2] se sustituye por new[j1:j2]
+Region = Tuple[int, int, int, int]
+
+BLOCK = 4096
+# Parte central a partir de la cual no se afina con difflib (una sola región)
+MAX_LINE_DIFF_CHARS = 200_000
+# Más regiones que esto se funden en una (acota el tamaño de las consultas)
+MAX_REGIONS = 200
+
+
+@dataclass
+class ReanchorResult:
+    """Resumen del re-anclaje"""
+    shifted: int = 0
+    relocated: int = 0
+    orphaned: int = 0
+
+
+def _common_prefix(a: str, b: str, limit: int) -> int:
+    i = 0
+    while i < limit:
+        step = min(BLOCK, limit - i)
+        if a[i:i + step] != b[i:i + step]:
+            while a[i] == b[i]:
+                i += 1
+            return i
+        i += step
+    return limit
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    n = 0
+    la, lb = len(a), len(b)
+    while n < limit:
+        step = min(BLOCK, limit - n)
+        if a[la - n - step:la - n] != b[lb - n - step:lb - n]:
+            while a[la - n - 1] == b[lb - n - 1]:
+                n += 1
+            return n
+        n += step
+    return limit
+
+
+def diff_regions(old: str, new: str) -> List[Region]:
+    """Regiones cambiadas entre old y new, ordenadas, en posiciones de carácter"""
+    if old == new:
+        return []
+
+    prefix = _common_prefix(old, new, min(len(old), len(new)))
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+
+    if len(old_mid) + len(new_mid) > MAX_LINE_DIFF_CHARS:
+        return [(prefix, prefix + len(old_mid), prefix, prefix + len(new_mid))]
+
+    old_lines = old_mid.splitlines(keepends=True)
+    new_lines = new_mid.splitlines(keepends=True)
+    old_offsets = [prefix]
+    for line in old_lines:
+        old_offsets.append(old_offsets[-1] + len(line))
+    new_offsets = [prefix]
+    for line in new_lines:
+        new_offsets.append(new_offsets[-1] + len(line))
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    regions = [
+        (old_offsets[i1], old_offsets[i2], new_offsets[j1], new_offsets[j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+    if len(regions) > MAX_REGIONS:
+        return [(regions[0][0], regions[-1][1], regions[0][2], regions[-1][3])]
+    return regions
+
+
+def _relocate(new_content: str, text: str, expected: int, lo: int, hi: int) -> int:
+    """Aparición de text en new_content[lo:hi] más cercana a expected (-1 si no está)"""
+    best = -1
+    position = new_content.find(text, lo, hi)
+    while position != -1:
+        if best == -1 or abs(position - expected) < abs(best - expected):
+            best = position
+        if position > expected:
+            break
+        position = new_content.find(text, position + 1, hi)
+    return best
+
+
+def find_overlaps(spans: List[Tuple[int, int, object, bool]]) -> List[Tuple[object, object]]:
+    """
+    Pares de rangos solapados en los que interviene al menos uno nuevo.
+
+    spans: (inicio, fin, clave, es_nuevo). Un único barrido ordenado por
+    inicio, recordando el rango existente y el nuevo que llegan más lejos
+    (los solapes antiguos entre anotaciones ya guardadas no se reportan).
+    """
+    overlaps = []
+    reach = {True: None, False: None}  # es_nuevo -> (fin, clave) con mayor fin
+    for start, end, key, is_new in sorted(spans, key=lambda span: (span[0], span[1])):
+        candidates = (True, False) if is_new else (True,)
+        for kind in candidates:
+            if reach[kind] is not None and start < reach[kind][0]:
+                overlaps.append((reach[kind][1], key))
+                break
+        if reach[is_new] is None or end > reach[is_new][0]:
+            reach[is_new] = (end, key)
+    return overlaps
+
+
+def reanchor_annotations(db: Session, document_id: int, old_content: str, new_content: str) -> ReanchorResult:
+    """Ajustar las anotaciones del documento al nuevo contenido (sin commit)"""
+    result = ReanchorResult()
+    regions = diff_regions(old_content, new_content)
+    if not regions:
+        return result
+
+    # 1. Anotaciones que tocan una región cambiada (en una inserción, las que
+    #    la contienen estrictamente). Se cargan antes de desplazar el resto,
+    #    porque sus posiciones se comparan con las del texto anterior. Las
+    #    huérfanas se quedan como están hasta que el usuario las revise
+    touches = [
+        and_(StudyAnnotation.start_pos < i2, StudyAnnotation.end_pos > i1)
+        for i1, i2, _, _ in regions
+    ]
+    affected = db.query(StudyAnnotation).filter(
+        StudyAnnotation.document_id == document_id,
+        StudyAnnotation.is_orphan.isnot(True),
+        or_(*touches)
+    ).order_by(StudyAnnotation.start_pos).all()
+
+    # 2. Anotaciones en los tramos sin cambios: desplazamiento acumulado del tramo
+    whens = []
+    in_gap = []
+    gap_start, delta = 0, 0
+    for i1, i2, j1, j2 in regions + [(len(old_content), len(old_content), 0, 0)]:
+        if delta:
+            in_range = and_(StudyAnnotation.start_pos >= gap_start, StudyAnnotation.end_pos <= i1)
+            in_gap.append(in_range)
+            whens.append((in_range, delta))
+        gap_start = i2
+        delta += (j2 - j1) - (i2 - i1)
+
+    if whens:
+        shift = case(*whens, else_=0)
+        statement = update(StudyAnnotation).where(
+            StudyAnnotation.document_id == document_id,
+            or_(*in_gap)
+        ).values(
+            start_pos=StudyAnnotation.start_pos + shift,
+            end_pos=StudyAnnotation.end_pos + shift
+        ).execution_options(synchronize_session=False)
+        result.shifted = db.execute(statement).rowcount
+
+    # 3. Buscar el texto de las afectadas cerca de su región
+    deltas = []  # (i1, i2, j1, j2, desplazamiento acumulado antes de la región)
+    delta = 0
+    for i1, i2, j1, j2 in regions:
+        deltas.append((i1, i2, j1, j2, delta))
+        delta += (j2 - j1) - (i2 - i1)
+
+    for annotation in affected:
+        # Regiones que toca la anotación (normalmente una)
+        touched = [r for r in deltas if annotation.start_pos < r[1] and annotation.end_pos > r[0]]
+        first, last = touched[0], touched[-1]
+        expected = annotation.start_pos + first[4] if annotation.start_pos < first[0] else first[2]
+        length = len(annotation.selected_text)
+        lo = max(0, min(expected, first[2]) - length)
+        hi = min(len(new_content), last[3] + length + (annotation.end_pos - last[1] if annotation.end_pos > last[1] else 0))
+
+        position = _relocate(new_content, annotation.selected_text, expected, lo, hi)
+        if position == -1:
+            annotation.is_orphan = True
+            result.orphaned += 1
+        else:
+            annotation.start_pos = position
+            annotation.end_pos = position + length
+            annotation.is_orphan = False
+            result.relocated += 1
+
+    return result
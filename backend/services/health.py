@@ -0,0 +1,125 @@
+"""
+Comprobaciones de salud para el balanceador (liveness / readiness)
+
+- Liveness: el proceso responde; no toca dependencias.
+- Readiness: SELECT 1 a través del pool (el mismo camino que las peticiones)
+  con un timeout corto, y PING a Redis si el stream de estudio lo usa.
+  Si el pool está agotado se responde "no listo" sin esperar conexión.
+
+El resultado se cachea HEALTH_CACHE_SECONDS y las sondas concurrentes
+comparten la misma comprobación, así que sondear a menudo no cuesta nada.
+Si un ping anterior sigue colgado no se lanza otro (no se acumulan hilos
+esperando al pool).
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+from database import async_engine, engine
+from services.study_events import study_events
+
+
+def pool_stats(target) -> dict:
+    """Conexiones del pool: tamaño, en uso, libres y overflow"""
+    pool = getattr(target, "sync_engine", target).pool
+    stats = {"class": type(pool).__name__}
+    for name in ("size", "checkedout", "checkedin", "overflow"):
+        method = getattr(pool, name, None)
+        if method is not None:
+            stats[name] = method()
+    max_overflow = getattr(pool, "_max_overflow", None)
+    if max_overflow is not None and "size" in stats:
+        # max_overflow < 0 = sin límite
+        stats["max"] = stats["size"] + max_overflow if max_overflow >= 0 else None
+        stats["exhausted"] = stats["max"] is not None and stats.get("checkedout", 0) >= stats["max"]
+    return stats
+
+
+def _ping_sync() -> None:
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+async def _ping_async() -> None:
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+class HealthChecker:
+    """Readiness cacheada con una sola comprobación en vuelo"""
+
+    def __init__(self, timeout: float, cache_seconds: float):
+        self.timeout = timeout
+        self.cache_seconds = cache_seconds
+        self._result: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._pending_pings = {}  # nombre -> tarea de un ping que superó el timeout
+
+    async def _check(self, name: str, ping) -> dict:
+        pending = self._pending_pings.get(name)
+        if pending is not None and not pending.done():
+            return {"status": "timeout", "detail": "El ping anterior sigue sin responder"}
+
+        started = time.perf_counter()
+        task = asyncio.ensure_future(ping())
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._pending_pings[name] = task
+            # Recoger el resultado cuando termine (evita "exception was never retrieved")
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            return {"status": "timeout", "detail": f"Sin respuesta en {self.timeout}s"}
+        except Exception as e:
+            return {"status": "error", "detail": str(e) or type(e).__name__}
+        self._pending_pings.pop(name, None)
+        return {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def _check_database(self) -> dict:
+        pools = {"sync": pool_stats(engine)}
+        if async_engine is not None:
+            pools["async"] = pool_stats(async_engine)
+
+        # El camino de las peticiones: async si está activo, si no el pool síncrono
+        if async_engine is not None:
+            name, stats, ping = "database_async", pools["async"], _ping_async
+        else:
+            name, stats, ping = "database", pools["sync"], lambda: run_in_threadpool(_ping_sync)
+
+        if stats.get("exhausted"):
+            result = {"status": "exhausted", "detail": "Pool de conexiones agotado"}
+        else:
+            result = await self._check(name, ping)
+        result["pools"] = pools
+        return result
+
+    async def _compute(self) -> dict:
+        checks = {"database": await self._check_database()}
+        if study_events.uses_redis:
+            checks["redis"] = await self._check("redis", study_events.ping)
+        else:
+            checks["redis"] = {"status": "disabled"}
+
+        ready = all(check["status"] in ("ok", "disabled") for check in checks.values())
+        return {"status": "ready" if ready else "unavailable", "ready": ready, "checks": checks}
+
+    async def readiness(self) -> dict:
+        if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+        async with self._lock:
+            # Otra sonda pudo refrescar el resultado mientras esperábamos
+            if self._result is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await self._compute()
+                self._checked_at = time.monotonic()
+            return self._result
+
+
+health_checker = HealthChecker(
+    timeout=settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+    cache_seconds=settings.HEALTH_CACHE_SECONDS,
+)
@@ -0,0 +1,217 @@
+"""
+Trabajos de exportación PDF de documentos de estudio
+
+WeasyPrint tarda segundos con documentos largos, así que el PDF no se genera
+en el hilo de la petición: se encola un trabajo que renderiza en un pool de
+procesos (como mucho PDF_EXPORT_WORKERS a la vez) y deja el fichero en la
+caché de exports (services/render_cache.py). El cliente consulta el estado
+y descarga el fichero con FileResponse cuando está listo.
+
+Si WeasyPrint no se puede importar (no instalado o sin las librerías del
+sistema, p. ej. pango) no se encola nada: submit lanza PDFExportUnavailable
+y la API responde 501. Los errores de renderizado se registran en el log;
+al cliente solo le llega un mensaje genérico.
+
+El id del trabajo es "<documento>.<clave de versión>": pedir dos veces el
+mismo PDF reutiliza el trabajo en curso, y cualquier worker de la API puede
+servir la descarga en cuanto el fichero está en la caché. El estado de un
+trabajo aún en curso solo lo conoce el worker que lo aceptó.
+"""
+
+import multiprocessing
+import threading
+from functools import lru_cache
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from config import settings
+from services.render_cache import render_cache
+
+# CSS adicional para PDF
+PDF_CSS = '''
+    @page {
+        size: A4;
+        margin: 2cm;
+        @bottom-center {
+            content: counter(page) " / " counter(pages);
+        }
+    }
+
+    details {
+        display: block !important;
+    }
+
+    .annotation-content {
+        display: block !important;
+        page-break-inside: avoid;
+    }
+
+    h1, h2, h3, h4 {
+        page-break-after: avoid;
+    }
+'''
+
+
+RENDER_ERROR = "Error al generar el PDF"
+
+
+class ExportQueueFull(Exception):
+    """Demasiados trabajos pendientes"""
+
+
+class PDFExportUnavailable(Exception):
+    """WeasyPrint no está instalado o le faltan librerías del sistema"""
+
+
+@lru_cache(maxsize=1)
+def pdf_export_available() -> bool:
+    """¿Se puede importar WeasyPrint? (se comprueba una vez por proceso)"""
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as e:
+        # OSError: weasyprint instalado pero sin las librerías del sistema (pango)
+        print(f"⚠️ Exportación PDF no disponible: {e}")
+        return False
+    return True
+
+
+def render_pdf_to_cache(document_id: int, key: str, html: str) -> None:
+    """Renderizar el PDF y guardarlo en la caché (se ejecuta en el proceso hijo)"""
+    from weasyprint import HTML, CSS
+
+    pdf_bytes = HTML(string=html).write_pdf(stylesheets=[CSS(string=PDF_CSS)])
+    render_cache.put(document_id, key, "pdf", pdf_bytes)
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class ExportJob:
+    """Estado de un trabajo de exportación"""
+    id: str
+    document_id: int
+    key: str
+    status: str = "pending"  # pending | done | failed
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=utc_now)
+    finished_at: Optional[datetime] = None
+
+
+def job_id_for(document_id: int, key: str) -> str:
+    return f"{document_id}.{key}"
+
+
+def parse_job_id(job_id: str) -> Optional[tuple]:
+    document_id, _, key = job_id.partition(".")
+    if not document_id.isdigit() or not key.isalnum():
+        return None
+    return int(document_id), key
+
+
+class PDFExportJobs:
+    """Registro de trabajos + pool de procesos con límite de concurrencia"""
+
+    def __init__(self, max_workers: int, max_pending: int, job_ttl: timedelta):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: no heredar hilos ni conexiones de la API en el hijo
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _purge(self) -> None:
+        limit = utc_now() - self.job_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < limit]:
+            del self._jobs[job_id]
+
+    def get(self, document_id: int, key: str) -> Optional[ExportJob]:
+        """Estado del trabajo; si el PDF ya está en la caché, siempre "done" """
+        job_id = job_id_for(document_id, key)
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None and job.status != "done":
+            return job
+        if render_cache.get(document_id, key, "pdf") is not None:
+            return job or ExportJob(id=job_id, document_id=document_id, key=key, status="done")
+        return None
+
+    def submit(self, document_id: int, key: str, build_html) -> ExportJob:
+        """
+        Encolar el PDF de esa versión del documento (o devolver el trabajo
+        existente). build_html solo se llama si hay que renderizar.
+        """
+        cached = self.get(document_id, key)
+        if (cached is None or cached.status == "failed") and not pdf_export_available():
+            raise PDFExportUnavailable()
+        if cached is not None and cached.status != "failed":
+            return cached
+
+        with self._lock:
+            self._purge()
+            job_id = job_id_for(document_id, key)
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == "pending":
+                return job
+
+            pending = sum(1 for existing in self._jobs.values() if existing.status == "pending")
+            if pending >= self.max_pending:
+                raise ExportQueueFull()
+
+            job = ExportJob(id=job_id, document_id=document_id, key=key)
+            self._jobs[job_id] = job
+
+        try:
+            future = self._submit(render_pdf_to_cache, document_id, key, build_html())
+        except BaseException:
+            self._finish(job, error=RENDER_ERROR)
+            raise
+        future.add_done_callback(lambda done: self._on_done(job, done))
+        return job
+
+    def _submit(self, fn, *args) -> Future:
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # Un hijo murió (p. ej. sin memoria): el pool queda inutilizable, se recrea
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def _on_done(self, job: ExportJob, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            # El detalle solo va al log: el cliente ve un mensaje genérico
+            print(f"❌ Error exportando PDF del documento {job.document_id}: {error!r}")
+        self._finish(job, error=RENDER_ERROR if error is not None else None)
+
+    def _finish(self, job: ExportJob, error: Optional[str]) -> None:
+        with self._lock:
+            job.status = "failed" if error else "done"
+            job.error = error
+            job.finished_at = utc_now()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_export_jobs = PDFExportJobs(
+    max_workers=settings.PDF_EXPORT_WORKERS,
+    max_pending=settings.PDF_EXPORT_MAX_PENDING,
+    job_ttl=timedelta(minutes=settings.PDF_EXPORT_JOB_TTL_MINUTES),
+)
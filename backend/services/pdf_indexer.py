@@ -14,15 +14,17 @@ try:
 except ImportError:
     PYMUPDF_AVAILABLE = False
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from models import NormativeSource, NormativeSourceType
+from services.text_store import TextStore, get_text_store, compile_term, count_matches, find_first
 
 
 class PDFIndexerService:
     """Servicio para extraer e indexar texto de PDFs"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, store: Optional[TextStore] = None):
         self.db = db
+        self.store = store or get_text_store()
 
     def extract_text_from_pdf(self, file_path: str) -> Tuple[str, int]:
         """
@@ -103,22 +105,66 @@ class PDFIndexerService:
         source.source_type = self.detect_source_type(file_path, name)
         source.code = self.extract_boe_code(file_path) or source.code
 
-        # Extraer texto
+        previous_hash = source.text_hash
+
+        # Extraer texto y guardarlo en el almacén (en la BD solo hash y tamaño)
         try:
             full_text, page_count = self.extract_text_from_pdf(file_path)
-            source.full_text = full_text
+            stored = self.store.put(full_text)
+            source.text_hash = stored.text_hash
+            source.text_size = stored.size
+            source.full_text = None
             source.page_count = page_count
             source.file_size = os.path.getsize(file_path)
             source.is_indexed = True
             source.indexed_at = datetime.utcnow()
         except Exception as e:
             source.is_indexed = False
+            source.text_hash = None
+            source.text_size = None
             source.full_text = f"Error al extraer texto: {str(e)}"
 
         self.db.commit()
         self.db.refresh(source)
+
+        if previous_hash and previous_hash != source.text_hash:
+            self.release_text(previous_hash)
+
         return source
 
+    def release_text(self, text_hash: str) -> None:
+        """Borrar un texto del almacén si ninguna fuente lo referencia ya"""
+        still_used = self.db.query(NormativeSource.id).filter(
+            NormativeSource.text_hash == text_hash
+        ).first()
+        if not still_used:
+            self.store.delete(text_hash)
+
+    def migrate_full_text_to_store(self) -> int:
+        """
+        Mover al almacén los textos legacy guardados en NormativeSource.full_text.
+        Retorna el número de fuentes migradas.
+        """
+        ids = [row.id for row in self.db.query(NormativeSource.id).filter(
+            NormativeSource.is_indexed == True,
+            NormativeSource.text_hash.is_(None),
+            NormativeSource.full_text.isnot(None)
+        ).all()]
+
+        for source_id in ids:
+            # Una fuente cada vez para no cargar todas las leyes a la vez
+            source = self.db.query(NormativeSource).options(
+                undefer(NormativeSource.full_text)
+            ).filter(NormativeSource.id == source_id).first()
+            stored = self.store.put(source.full_text)
+            source.text_hash = stored.text_hash
+            source.text_size = stored.size
+            source.full_text = None
+            self.db.commit()
+            self.db.expunge(source)
+
+        return len(ids)
+
     def index_directory(
         self,
         directory: str,
@@ -155,10 +201,14 @@ class PDFIndexerService:
         Busca texto en las fuentes indexadas.
         Retorna fragmentos relevantes.
         """
-        # Obtener fuentes indexadas
+        query_terms = query.lower().split()
+        if not query_terms:
+            return []
+
+        # Solo metadatos: el texto se lee del almacén mapeado en memoria
         sources_query = self.db.query(NormativeSource).filter(
             NormativeSource.is_indexed == True,
-            NormativeSource.full_text.isnot(None)
+            NormativeSource.text_hash.isnot(None)
         )
 
         if source_type:
@@ -168,21 +218,26 @@ class PDFIndexerService:
         results = []
 
         # Preparar términos de búsqueda (case insensitive)
-        query_terms = query.lower().split()
+        term_patterns = [compile_term(term) for term in query_terms]
+        phrase_pattern = compile_term(" ".join(query_terms))
 
         for source in sources:
-            if not source.full_text:
-                continue
-
-            text_lower = source.full_text.lower()
-
-            # Verificar si contiene todos los términos
-            if not all(term in text_lower for term in query_terms):
+            try:
+                with self.store.open_mapped(source.text_hash) as mapped:
+                    # Verificar si contiene todos los términos
+                    if not all(pattern.search(mapped) for pattern in term_patterns):
+                        continue
+
+                    # Encontrar contexto alrededor de la primera coincidencia
+                    match = find_first(mapped, [phrase_pattern, term_patterns[0]])
+                    if not match:
+                        continue
+                    excerpt = self._extract_context(mapped, match.start(), match.end(), context_chars=500)
+                    relevance = self._calculate_relevance(mapped, term_patterns)
+            except FileNotFoundError:
+                print(f"⚠️ Texto no encontrado en el almacén para fuente {source.id}")
                 continue
 
-            # Encontrar contexto alrededor de la primera coincidencia
-            excerpt = self._extract_context(source.full_text, query, context_chars=500)
-
             if excerpt:
                 results.append({
                     "source_id": source.id,
@@ -191,33 +246,19 @@ class PDFIndexerService:
                     "source_type": source.source_type.value,
                     "file_path": source.file_path,
                     "excerpt": excerpt,
-                    "relevance_score": self._calculate_relevance(source.full_text, query_terms)
+                    "relevance_score": relevance
                 })
 
         # Ordenar por relevancia
         results.sort(key=lambda x: x["relevance_score"], reverse=True)
         return results[:limit]
 
-    def _extract_context(self, text: str, query: str, context_chars: int = 500) -> Optional[str]:
-        """Extrae contexto alrededor de la primera coincidencia"""
-        query_lower = query.lower()
-        text_lower = text.lower()
-
-        # Buscar primera coincidencia
-        pos = text_lower.find(query_lower)
-        if pos == -1:
-            # Buscar primera palabra del query
-            first_word = query_lower.split()[0]
-            pos = text_lower.find(first_word)
-
-        if pos == -1:
-            return None
-
-        # Extraer contexto
-        start = max(0, pos - context_chars // 2)
-        end = min(len(text), pos + len(query) + context_chars // 2)
+    def _extract_context(self, mapped, match_start: int, match_end: int, context_chars: int = 500) -> Optional[str]:
+        """Extrae contexto alrededor de una coincidencia leyendo solo ese rango"""
+        start = max(0, match_start - context_chars // 2)
+        end = min(len(mapped), match_end + context_chars // 2)
 
-        excerpt = text[start:end]
+        excerpt = mapped[start:end].decode("utf-8", errors="ignore")
 
         # Limpiar inicio y fin (no cortar palabras)
         if start > 0:
@@ -225,23 +266,20 @@ class PDFIndexerService:
             if first_space > 0:
                 excerpt = "..." + excerpt[first_space + 1:]
 
-        if end < len(text):
+        if end < len(mapped):
             last_space = excerpt.rfind(' ')
             if last_space > 0:
                 excerpt = excerpt[:last_space] + "..."
 
-        return excerpt.strip()
+        return excerpt.strip() or None
 
-    def _calculate_relevance(self, text: str, query_terms: List[str]) -> float:
+    def _calculate_relevance(self, mapped, term_patterns: list) -> float:
         """Calcula un score de relevancia básico"""
-        text_lower = text.lower()
         score = 0.0
 
-        for term in query_terms:
-            # Contar ocurrencias
-            count = text_lower.count(term)
+        for pattern in term_patterns:
             # Más ocurrencias = más relevante, pero con diminishing returns
-            score += min(count, 10) * 0.1
+            score += count_matches(mapped, pattern, limit=10) * 0.1
 
         return score
 
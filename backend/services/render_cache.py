@@ -0,0 +1,125 @@
+"""
+Caché en disco de exportaciones renderizadas (HTML y PDF de documentos)
+
+Cada versión renderizada se guarda como <root>/<documento>/<clave>.<formato>,
+donde la clave es un hash de todo lo que influye en el resultado. Si cambia
+el documento o una anotación, cambia la clave: la versión anterior se borra
+al guardar la nueva y nunca se sirve contenido obsoleto.
+
+El tamaño total está acotado: al superar el máximo se eliminan los ficheros
+usados hace más tiempo (la fecha de modificación se actualiza en cada uso).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from config import settings
+
+
+def render_key(*parts: Iterable) -> str:
+    """Hash estable de las partes que determinan un renderizado"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """¿La cabecera If-None-Match incluye este ETag? (admite W/ y *)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class RenderCache:
+    """Ficheros renderizados por (documento, clave, formato) con expulsión LRU"""
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, document_id: int, key: str, fmt: str) -> Path:
+        return self.root / str(document_id) / f"{key}.{fmt}"
+
+    def get(self, document_id: int, key: str, fmt: str) -> Optional[Path]:
+        path = self._path(document_id, key, fmt)
+        try:
+            os.utime(path)  # Marca de uso reciente para la expulsión LRU
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, document_id: int, key: str, fmt: str, data: bytes) -> Path:
+        path = self._path(document_id, key, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # Versiones anteriores del mismo documento y formato ya no se servirán
+        for old in path.parent.glob(f"*.{fmt}"):
+            if old != path:
+                old.unlink(missing_ok=True)
+
+        self._evict(keep=path)
+        return path
+
+    def invalidate(self, document_id: int) -> None:
+        """Borrar todas las versiones de un documento (p. ej. al eliminarlo)"""
+        folder = self.root / str(document_id)
+        if not folder.exists():
+            return
+        for path in folder.iterdir():
+            path.unlink(missing_ok=True)
+        try:
+            folder.rmdir()
+        except OSError:
+            pass
+
+    def _evict(self, keep: Path) -> None:
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.root.glob("*/*"):
+                if path.suffix == ".tmp":
+                    continue  # Escritura en curso
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                if path != keep:
+                    entries.append((stat.st_mtime, stat.st_size, path))
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                path.unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+render_cache = RenderCache(settings.RENDER_CACHE_PATH, settings.RENDER_CACHE_MAX_MB * 1024 * 1024)
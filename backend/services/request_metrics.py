@@ -0,0 +1,194 @@
+"""
+Métricas por petición: consultas SQL, tiempo en base de datos, tiempo total y
+tamaño de la respuesta
+
+- instrument_engine engancha before/after_cursor_execute al engine (y al
+  engine síncrono interno del async) y suma cada sentencia a las estadísticas
+  de la petición en curso, que viajan en un ContextVar (los hilos del
+  threadpool y los greenlets de AsyncSession heredan el contexto).
+- RequestMetricsMiddleware (ASGI puro, no bufferiza respuestas ni streams)
+  añade la cabecera Server-Timing y registra los valores en histogramas por
+  método y ruta (la plantilla, p. ej. /api/decks/{deck_id}).
+- render_prometheus devuelve los histogramas en formato de texto de
+  Prometheus para /api/metrics.
+
+Las métricas son del proceso: con varios workers cada uno expone las suyas.
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+
+@dataclass
+class RequestStats:
+    """Contadores de la petición en curso"""
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # El inicio va en el contexto de ejecución: si la sentencia falla no queda nada colgado
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        stats.db_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine) -> None:
+    """Contar las sentencias de este engine en las estadísticas de la petición"""
+    target = getattr(engine, "sync_engine", engine)
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+# ============================================================================
+# Histogramas
+# ============================================================================
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+SIZE_BUCKETS = [256, 1024, 10240, 102400, 1048576, 10485760]
+
+METRICS = {
+    # nombre: (ayuda, límites de los buckets)
+    "http_request_duration_seconds": ("Tiempo total de la petición", DURATION_BUCKETS),
+    "http_request_db_seconds": ("Tiempo en base de datos por petición", DURATION_BUCKETS),
+    "http_request_db_queries": ("Sentencias SQL por petición", QUERY_BUCKETS),
+    "http_response_size_bytes": ("Tamaño del cuerpo de la respuesta", SIZE_BUCKETS),
+}
+
+
+class Histogram:
+    """Histograma acumulado al estilo Prometheus (buckets fijos + suma + total)"""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # El último es +Inf
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+
+class MetricsRegistry:
+    """Histogramas por (métrica, método, ruta) y contador de respuestas por estado"""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+
+    def record(self, method: str, route: str, status: int, duration: float, stats: RequestStats, size: int) -> None:
+        # Solo se llama desde el event loop: no hace falta lock
+        for name, value in (
+            ("http_request_duration_seconds", duration),
+            ("http_request_db_seconds", stats.db_seconds),
+            ("http_request_db_queries", stats.queries),
+            ("http_response_size_bytes", size),
+        ):
+            key = (name, method, route)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+        response_key = (method, route, status)
+        self._responses[response_key] = self._responses.get(response_key, 0) + 1
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP http_responses_total Respuestas por método, ruta y estado",
+            "# TYPE http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self._responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        for name, (help_text, bounds) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, method, route), histogram in sorted(self._histograms.items()):
+                if metric != name:
+                    continue
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+                for bound, count in zip(bounds + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics_registry = MetricsRegistry()
+
+
+# ============================================================================
+# Middleware
+# ============================================================================
+
+class RequestMetricsMiddleware:
+    """Mide cada petición HTTP y añade la cabecera Server-Timing"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_metrics(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                server_timing = (
+                    f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} consultas SQL", '
+                    f"app;dur={elapsed_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode("latin-1"))
+                ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _current_stats.reset(token)
+            # FastAPI deja la ruta resuelta en el scope: se agrupa por plantilla
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            self.registry.record(
+                scope["method"], route_path, status,
+                time.perf_counter() - started, stats, size
+            )
@@ -0,0 +1,114 @@
+"""
+Pub/sub de eventos de estudio para el stream SSE (/api/study/stream)
+
+Cada conexión SSE se suscribe con una cola propia por usuario. Al confirmar
+una review se publica el estado actualizado (pendientes, totales de la
+sesión...) y se entrega a todas las conexiones de ese usuario.
+
+Con STUDY_EVENTS_REDIS activo, los eventos se publican en un canal de Redis
+y cada worker los reenvía a sus conexiones locales, de modo que la review
+procesada en un worker llega al navegador conectado a otro.
+"""
+
+import asyncio
+import json
+from typing import Dict, Optional, Set
+
+from config import settings
+
+CHANNEL = "opositapp:study-events"
+
+
+class StudyEventBroker:
+    """Pub/sub en proceso con difusión opcional entre workers vía Redis"""
+
+    def __init__(self, redis_url: str = "", queue_size: int = 8):
+        self.redis_url = redis_url
+        self.queue_size = queue_size
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Conectar a Redis y escuchar el canal (solo si está configurado)"""
+        if not self.redis_url or self._listener is not None:
+            return
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    @property
+    def uses_redis(self) -> bool:
+        return bool(self.redis_url)
+
+    async def ping(self) -> None:
+        """Comprobar la conexión a Redis (lanza excepción si no responde)"""
+        if self._redis is None:
+            raise RuntimeError("Redis no conectado")
+        await self._redis.ping()
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def wants(self, user_id: int) -> bool:
+        """¿Hay que calcular el evento? Con Redis puede haber suscriptores en otros workers"""
+        return self._redis is not None or bool(self._subscribers.get(user_id))
+
+    async def publish(self, user_id: int, event: dict):
+        if self._redis is not None:
+            try:
+                await self._redis.publish(CHANNEL, json.dumps({"user_id": user_id, "event": event}))
+                return
+            except Exception as e:
+                print(f"⚠️ No se pudo publicar en Redis, entrega solo local: {e}")
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id: int, event: dict):
+        for queue in self._subscribers.get(user_id, ()):
+            if queue.full():
+                # Cliente lento: cada evento es un estado completo, basta el más reciente
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _listen(self):
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self._deliver(data["user_id"], data["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Conexión con Redis perdida en eventos de estudio, reintentando: {e}")
+            finally:
+                # Devolver la conexión antes de reintentar o salir: si no, cada corte deja una abierta
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
+
+
+study_events = StudyEventBroker(settings.REDIS_URL if settings.STUDY_EVENTS_REDIS else "")
@@ -0,0 +1,216 @@
+"""
+Previsión de carga de estudio (reviews por día en los próximos N días)
+
+- Pendientes programados: un único histograma por día de flashcards.next_review
+  (date_trunc en PostgreSQL), sin traer las tarjetas a Python.
+- Proyección opcional: simula calculate_sm2 sobre los estados SM-2 agrupados
+  (mismo día, repeticiones, easiness e intervalo = una sola entrada con peso)
+  con la distribución de respuestas histórica del usuario. Es el valor
+  esperado exacto, sin muestreo aleatorio: cada estado se reparte entre las
+  cuatro respuestas según su probabilidad y se vuelve a programar.
+- Caché por usuario que deja de valer en cuanto el usuario hace otra review
+  o cambia sus tarjetas (crear, borrar, importar, clonar o borrar un mazo):
+  la versión se lee de la BD, así que vale entre workers.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Deck, Flashcard, StudyLog, StudyQuality, StudySession
+from sm2 import calculate_sm2, quality_to_sm2_value
+
+# Distribución por defecto si el usuario tiene poco historial
+DEFAULT_GRADES = {"again": 0.15, "hard": 0.15, "good": 0.55, "easy": 0.15}
+MIN_HISTORY_REVIEWS = 20
+HISTORY_DAYS = 90
+
+CACHE_MAX_USERS = 1024
+
+# user_id -> (versión, {clave de petición: resultado})
+_cache: "OrderedDict[int, Tuple[tuple, Dict[tuple, dict]]]" = OrderedDict()
+_cache_lock = threading.Lock()  # Stack sync: las peticiones corren en hilos
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _as_date(value) -> date:
+    # date_trunc devuelve datetime (PostgreSQL); date() devuelve texto (SQLite)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _review_day_column(db: Session):
+    """Día UTC de next_review como expresión SQL agrupable"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("day", func.timezone("UTC", Flashcard.next_review))
+    return func.date(Flashcard.next_review)
+
+
+def _due_query(db: Session, user_id: int, deck_id: Optional[int], end: date, *columns):
+    query = db.query(*columns).join(Deck).filter(
+        Deck.user_id == user_id,
+        Flashcard.next_review < _day_start(end)
+    )
+    if deck_id:
+        query = query.filter(Flashcard.deck_id == deck_id)
+    return query
+
+
+def _day_index(day: date, today: date) -> int:
+    # Las atrasadas cuentan como pendientes hoy
+    return max(0, (day - today).days)
+
+
+def scheduled_histogram(db: Session, user_id: int, deck_id: Optional[int], today: date, days: int) -> List[int]:
+    """Tarjetas programadas por día (índice 0 = hoy, incluye atrasadas)"""
+    day_column = _review_day_column(db)
+    rows = _due_query(
+        db, user_id, deck_id, today + timedelta(days=days),
+        day_column, func.count(Flashcard.id)
+    ).group_by(day_column).all()
+
+    histogram = [0] * days
+    for day, count in rows:
+        histogram[_day_index(_as_date(day), today)] += count
+    return histogram
+
+
+def grade_distribution(db: Session, user_id: int) -> Dict[str, float]:
+    """Frecuencia de cada respuesta en las sesiones de los últimos HISTORY_DAYS días"""
+    since = datetime.now(timezone.utc) - timedelta(days=HISTORY_DAYS)
+    rows = db.query(StudyLog.quality, func.count(StudyLog.id)).join(StudySession).filter(
+        StudySession.user_id == user_id,
+        StudySession.started_at >= since
+    ).group_by(StudyLog.quality).all()
+
+    counts = {StudyQuality(quality).value: count for quality, count in rows}
+    total = sum(counts.values())
+    if total < MIN_HISTORY_REVIEWS:
+        return dict(DEFAULT_GRADES)
+    return {grade: counts.get(grade, 0) / total for grade in DEFAULT_GRADES}
+
+
+def project_reviews(
+    states: Dict[Tuple[int, int, float, int], float],
+    grades: Dict[str, float],
+    days: int
+) -> List[float]:
+    """
+    Reviews esperadas por día (programadas + las que generan esas reviews).
+
+    states: (día, repeticiones, easiness, intervalo) -> número de tarjetas.
+    """
+    outcomes = [(quality_to_sm2_value(grade), p) for grade, p in grades.items() if p > 0]
+    # Un diccionario de estados por día: (repeticiones, easiness, intervalo) -> peso
+    pending: List[Dict[Tuple[int, float, int], float]] = [defaultdict(float) for _ in range(days)]
+    for (day, repetitions, easiness, interval), weight in states.items():
+        if day < days:
+            pending[day][(repetitions, easiness, interval)] += weight
+    expected = [0.0] * days
+
+    for day in range(days):
+        # Las reviews de hoy solo programan días posteriores (intervalo >= 1)
+        for (repetitions, easiness, interval), weight in pending[day].items():
+            expected[day] += weight
+            for quality, p in outcomes:
+                result = calculate_sm2(quality, repetitions, easiness, interval)
+                next_day = day + max(1, result["interval"])
+                if next_day < days:
+                    pending[next_day][(result["repetitions"], result["easiness"], result["interval"])] += weight * p
+
+    return expected
+
+
+def projected_histogram(db: Session, user_id: int, deck_id: Optional[int], today: date, days: int) -> List[float]:
+    """Proyección por simulación SM-2 sobre los estados agrupados de las tarjetas"""
+    day_column = _review_day_column(db)
+    rows = _due_query(
+        db, user_id, deck_id, today + timedelta(days=days),
+        day_column,
+        Flashcard.repetitions,
+        Flashcard.easiness_factor,
+        Flashcard.interval_days,
+        func.count(Flashcard.id)
+    ).group_by(
+        day_column, Flashcard.repetitions, Flashcard.easiness_factor, Flashcard.interval_days
+    ).all()
+
+    states: Dict[Tuple[int, int, float, int], float] = defaultdict(float)
+    for day, repetitions, easiness, interval, count in rows:
+        key = (_day_index(_as_date(day), today), repetitions or 0, easiness or 2.5, interval or 0)
+        states[key] += count
+
+    return project_reviews(states, grade_distribution(db, user_id), days)
+
+
+def _cache_version(db: Session, user_id: int, today: date) -> tuple:
+    """
+    Cambia cada día, con cada review (contador de la última sesión) y con
+    cualquier alta, baja o edición de tarjetas del usuario (número, id
+    máximo y última modificación de sus flashcards). Una sola consulta.
+    """
+    def latest_session(column):
+        return select(column).where(
+            StudySession.user_id == user_id
+        ).order_by(StudySession.started_at.desc()).limit(1).scalar_subquery()
+
+    row = db.query(
+        func.count(Flashcard.id),
+        func.max(Flashcard.id),
+        func.max(Flashcard.updated_at),
+        latest_session(StudySession.id),
+        latest_session(StudySession.cards_studied),
+    ).select_from(Flashcard).join(Deck).filter(Deck.user_id == user_id).one()
+    return (today, *row)
+
+
+def get_forecast(db: Session, user_id: int, deck_id: Optional[int], days: int, simulate: bool) -> dict:
+    today = datetime.now(timezone.utc).date()
+    version = _cache_version(db, user_id, today)
+    request_key = (deck_id, days, simulate)
+
+    with _cache_lock:
+        cached_version, entries = _cache.get(user_id, (None, {}))
+        if cached_version == version and request_key in entries:
+            _cache.move_to_end(user_id)
+            return entries[request_key]
+
+    scheduled = scheduled_histogram(db, user_id, deck_id, today, days)
+    projected = projected_histogram(db, user_id, deck_id, today, days) if simulate else None
+
+    result = {
+        "start": today,
+        "days": days,
+        "simulated": simulate,
+        "total_due": sum(scheduled),
+        "forecast": [
+            {
+                "date": today + timedelta(days=offset),
+                "due": scheduled[offset],
+                "projected": round(projected[offset], 1) if projected is not None else None
+            }
+            for offset in range(days)
+        ]
+    }
+
+    with _cache_lock:
+        cached_version, entries = _cache.get(user_id, (None, {}))
+        if cached_version != version:
+            entries = {}
+        entries[request_key] = result
+        _cache[user_id] = (version, entries)
+        _cache.move_to_end(user_id)
+        while len(_cache) > CACHE_MAX_USERS:
+            _cache.popitem(last=False)
+
+    return result
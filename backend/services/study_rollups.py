@@ -0,0 +1,144 @@
+"""
+Resúmenes diarios de estudio (study_daily_stats) para analíticas
+
+Cada review suma 1 a la fila (usuario, mazo, día UTC, tramo de intervalo)
+con un único INSERT ... ON CONFLICT DO UPDATE, así que el mapa de actividad,
+la retención por intervalo o el tiempo medio por tarjeta se calculan sobre
+unas pocas filas por día en lugar de sobre todo el historial de study_logs.
+
+rebuild_study_rollups() recalcula los resúmenes desde study_logs (relleno
+inicial o compactación si se han borrado/editado logs a mano).
+"""
+
+from bisect import bisect_right
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Flashcard, StudyDailyStat, StudyLog, StudyQuality, StudySession
+
+# Límites inferiores (días) de los tramos de intervalo antes de la review
+INTERVAL_BUCKETS = [0, 1, 2, 4, 8, 15, 31, 91]
+
+
+def interval_bucket(interval_days: Optional[int]) -> int:
+    """Tramo al que pertenece un intervalo (límite inferior en días)"""
+    if not interval_days or interval_days < 0:
+        return 0
+    return INTERVAL_BUCKETS[bisect_right(INTERVAL_BUCKETS, interval_days) - 1]
+
+
+def bucket_label(bucket: int) -> str:
+    index = INTERVAL_BUCKETS.index(bucket)
+    if index + 1 == len(INTERVAL_BUCKETS):
+        return f"{bucket}+ días"
+    upper = INTERVAL_BUCKETS[index + 1] - 1
+    if upper == bucket:
+        return "nueva" if bucket == 0 else f"{bucket} día{'s' if bucket != 1 else ''}"
+    return f"{bucket}-{upper} días"
+
+
+def review_day(reviewed_at: datetime) -> date:
+    """Día UTC de una review (las fechas sin zona horaria se toman como UTC)"""
+    if reviewed_at.tzinfo is None:
+        return reviewed_at.date()
+    return reviewed_at.astimezone(timezone.utc).date()
+
+
+def _upsert(db: Session, rows: List[dict]):
+    """INSERT ... ON CONFLICT DO UPDATE sumando contadores (PostgreSQL o SQLite)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Base de datos no soportada para study_daily_stats: {dialect}")
+
+    stmt = insert(StudyDailyStat).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "deck_id", "day", "interval_bucket"],
+        set_={
+            "reviews": StudyDailyStat.reviews + stmt.excluded.reviews,
+            "correct": StudyDailyStat.correct + stmt.excluded.correct,
+            "time_spent_seconds": StudyDailyStat.time_spent_seconds + stmt.excluded.time_spent_seconds,
+        },
+    )
+    db.execute(stmt)
+
+
+def record_review(
+    db: Session,
+    user_id: int,
+    deck_id: int,
+    reviewed_at: datetime,
+    interval_before: Optional[int],
+    correct: bool,
+    time_spent_seconds: Optional[int],
+):
+    """Sumar una review al resumen diario (en la transacción de la review)"""
+    _upsert(db, [{
+        "user_id": user_id,
+        "deck_id": deck_id,
+        "day": review_day(reviewed_at),
+        "interval_bucket": interval_bucket(interval_before),
+        "reviews": 1,
+        "correct": 1 if correct else 0,
+        "time_spent_seconds": time_spent_seconds or 0,
+    }])
+
+
+def rebuild_study_rollups(db: Session, user_id: Optional[int] = None, batch_size: int = 1000) -> int:
+    """
+    Recalcular los resúmenes desde study_logs (todos los usuarios o uno).
+
+    Recorre los logs en streaming y agrega en memoria por clave de resumen,
+    así que la memoria depende del número de filas resumen, no de logs.
+    Devuelve el número de filas resumen escritas.
+    """
+    query = db.query(
+        StudySession.user_id,
+        Flashcard.deck_id,
+        StudyLog.reviewed_at,
+        StudyLog.interval_before,
+        StudyLog.quality,
+        StudyLog.time_spent_seconds,
+    ).join(StudySession, StudyLog.session_id == StudySession.id).join(
+        Flashcard, StudyLog.flashcard_id == Flashcard.id
+    )
+
+    delete = db.query(StudyDailyStat)
+    if user_id is not None:
+        query = query.filter(StudySession.user_id == user_id)
+        delete = delete.filter(StudyDailyStat.user_id == user_id)
+
+    totals: Dict[Tuple[int, int, date, int], List[int]] = {}
+    for log_user, deck_id, reviewed_at, interval_before, quality, time_spent in query.yield_per(batch_size):
+        if reviewed_at is None:
+            continue
+        key = (log_user, deck_id, review_day(reviewed_at), interval_bucket(interval_before))
+        counters = totals.setdefault(key, [0, 0, 0])
+        counters[0] += 1
+        counters[1] += 0 if quality == StudyQuality.AGAIN else 1
+        counters[2] += time_spent or 0
+
+    delete.delete(synchronize_session=False)
+
+    rows = [
+        {
+            "user_id": key[0],
+            "deck_id": key[1],
+            "day": key[2],
+            "interval_bucket": key[3],
+            "reviews": reviews,
+            "correct": correct,
+            "time_spent_seconds": time_spent,
+        }
+        for key, (reviews, correct, time_spent) in totals.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        _upsert(db, rows[start:start + batch_size])
+
+    db.commit()
+    return len(rows)
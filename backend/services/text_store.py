@@ -0,0 +1,169 @@
+"""
+Almacenamiento de textos extraídos de normativa fuera de la base de datos
+
+Cada texto se guarda comprimido (gzip) en un fichero direccionado por su
+hash SHA-256. En la BD solo quedan el hash y el tamaño. Para leer, el texto
+se descomprime una única vez a un fichero de caché que se abre con mmap,
+de modo que las búsquedas y los extractos trabajan sobre el fichero mapeado
+sin cargar la ley completa en memoria.
+"""
+
+import gzip
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import ContextManager, Iterator, List, Optional
+
+from config import settings
+
+
+@dataclass
+class StoredText:
+    """Referencia a un texto almacenado"""
+    text_hash: str
+    size: int  # Tamaño en bytes (UTF-8, sin comprimir)
+
+
+class TextStore(ABC):
+    """Interfaz de almacenamiento de textos (implementaciones intercambiables)"""
+
+    @abstractmethod
+    def put(self, text: str) -> StoredText:
+        """Guardar un texto y devolver su referencia (idempotente por contenido)"""
+
+    @abstractmethod
+    def exists(self, text_hash: str) -> bool:
+        """¿Está el texto en el almacén?"""
+
+    @abstractmethod
+    def delete(self, text_hash: str) -> None:
+        """Borrar el texto (y su caché, si la hay)"""
+
+    @abstractmethod
+    def open_mapped(self, text_hash: str) -> ContextManager[mmap.mmap]:
+        """
+        Context manager con el texto (bytes UTF-8) mapeado en memoria.
+        Las implementaciones lo decoran con @contextmanager.
+        """
+
+
+class LocalTextStore(TextStore):
+    """Almacén en disco local: <root>/<hh>/<hash>.txt.gz + caché <hash>.txt"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _blob_path(self, text_hash: str) -> Path:
+        return self.root / text_hash[:2] / f"{text_hash}.txt.gz"
+
+    def _cache_path(self, text_hash: str) -> Path:
+        return self.root / text_hash[:2] / f"{text_hash}.txt"
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put(self, text: str) -> StoredText:
+        data = text.encode("utf-8")
+        text_hash = hashlib.sha256(data).hexdigest()
+
+        # Direccionado por contenido: si ya existe no se reescribe
+        if not self._blob_path(text_hash).exists():
+            self._atomic_write(self._blob_path(text_hash), gzip.compress(data))
+
+        return StoredText(text_hash=text_hash, size=len(data))
+
+    def exists(self, text_hash: str) -> bool:
+        return self._blob_path(text_hash).exists()
+
+    def delete(self, text_hash: str) -> None:
+        for path in (self._blob_path(text_hash), self._cache_path(text_hash)):
+            if path.exists():
+                path.unlink()
+
+    def _ensure_cache(self, text_hash: str) -> Path:
+        """Descomprimir el blob a la caché mapeable si aún no existe"""
+        cache_path = self._cache_path(text_hash)
+        if not cache_path.exists():
+            blob_path = self._blob_path(text_hash)
+            if not blob_path.exists():
+                raise FileNotFoundError(f"Texto no encontrado en el almacén: {text_hash}")
+            with gzip.open(blob_path, "rb") as f:
+                self._atomic_write(cache_path, f.read())
+        return cache_path
+
+    @contextmanager
+    def open_mapped(self, text_hash: str) -> Iterator[mmap.mmap]:
+        cache_path = self._ensure_cache(text_hash)
+        with open(cache_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # mmap no admite ficheros vacíos
+                yield b""
+                return
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+
+
+# ============================================================================
+# Búsqueda sobre el texto mapeado
+# ============================================================================
+
+def compile_term(term: str) -> re.Pattern:
+    """
+    Compila un término como patrón de bytes insensible a mayúsculas.
+
+    re.IGNORECASE sobre bytes solo cubre ASCII, así que cada letra se expande
+    a sus variantes en minúscula y mayúscula codificadas en UTF-8 (Á/á, Ñ/ñ...).
+    """
+    parts = []
+    for char in term:
+        variants = {char, char.lower(), char.upper()}
+        encoded = sorted(re.escape(v.encode("utf-8")) for v in variants if len(v) == 1)
+        if len(encoded) == 1:
+            parts.append(encoded[0])
+        else:
+            parts.append(b"(?:" + b"|".join(encoded) + b")")
+    return re.compile(b"".join(parts))
+
+
+def count_matches(mapped: mmap.mmap, pattern: re.Pattern, limit: int) -> int:
+    """Contar coincidencias hasta un máximo (evita recorrer todo el texto)"""
+    return sum(1 for _ in islice(pattern.finditer(mapped), limit))
+
+
+def find_first(mapped: mmap.mmap, patterns: List[re.Pattern]) -> Optional[re.Match]:
+    """Primera coincidencia del primer patrón que aparezca en el texto"""
+    for pattern in patterns:
+        match = pattern.search(mapped)
+        if match:
+            return match
+    return None
+
+
+_default_store: Optional[TextStore] = None
+
+
+def get_text_store() -> TextStore:
+    """Almacén configurado (por defecto, disco local en settings.TEXT_STORE_PATH)"""
+    global _default_store
+    if _default_store is None:
+        _default_store = LocalTextStore(settings.TEXT_STORE_PATH)
+    return _default_store
@@ -0,0 +1,91 @@
+"""
+Fixtures comunes de los tests del backend
+
+La base de datos, el almacén de textos y la caché de exports van a un
+directorio temporal. Se configuran aquí, antes de importar la app, porque
+database y config leen el entorno al importarse. DB_ASYNC se respeta, así
+que el mismo suite se puede pasar con los dos stacks:
+
+    cd backend && pytest
+    cd backend && DB_ASYNC=true pytest
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List
+
+import pytest
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="opositapp-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR / 'test.db'}"
+os.environ["TEXT_STORE_PATH"] = str(_TMP_DIR / "text_store")
+os.environ["RENDER_CACHE_PATH"] = str(_TMP_DIR / "render_cache")
+os.environ["DEBUG"] = "false"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient de la app (lifespan incluido: crea las tablas)"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    """Sesión síncrona contra la base de los tests"""
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def register_user(client, prefix: str = "user") -> dict:
+    """Registrar un usuario nuevo y devolver sus cabeceras de autenticación"""
+    username = f"{prefix}_{uuid.uuid4().hex[:8]}"
+    password = "test-password"
+    client.post("/api/auth/register", json={
+        "username": username, "email": f"{username}@tests.local", "password": password
+    })
+    token = client.post("/api/auth/token", data={"username": username, "password": password}).json()["access_token"]
+    return {"username": username, "headers": {"Authorization": f"Bearer {token}"}}
+
+
+@contextmanager
+def count_queries(*engines):
+    """Lista (que se va llenando) con las sentencias ejecutadas en el bloque"""
+    statements: List[str] = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Los engines async registran los eventos en su engine síncrono interno
+    targets = [getattr(engine, "sync_engine", engine) for engine in engines if engine is not None]
+    for target in targets:
+        event.listen(target, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", on_execute)
+
+
+@pytest.fixture
+def query_counter(client):
+    """count_queries sobre los engines de la app (sync y, si está activo, async)"""
+    from database import async_engine, engine
+
+    return lambda: count_queries(engine, async_engine)
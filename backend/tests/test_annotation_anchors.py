@@ -0,0 +1,100 @@
+"""
+Re-anclaje de anotaciones al editar un documento (reanchor_annotations)
+
+Cubre los tres destinos de una anotación: desplazada (fuera de la región
+editada), recolocada (su texto sigue cerca de la región) y huérfana (su
+texto ha desaparecido).
+"""
+
+import pytest
+
+from conftest import register_user
+
+CONTENT = (
+    "Título preliminar.\n"
+    "Artículo 1. España se constituye en un Estado social y democrático de Derecho.\n"
+    "Artículo 14. Los españoles son iguales ante la ley.\n"
+    "Artículo 15. Todos tienen derecho a la vida y a la integridad física y moral.\n"
+)
+
+
+@pytest.fixture
+def document(client, db):
+    """Documento con una anotación por artículo; devuelve (id, {texto: anotación})"""
+    from models import StudyAnnotation, StudyDocument, User
+
+    user = register_user(client, "anchors")
+    user_id = db.query(User.id).filter(User.username == user["username"]).scalar()
+    doc = StudyDocument(user_id=user_id, title="Constitución", content=CONTENT)
+    db.add(doc)
+    db.flush()
+    annotations = {}
+    for text in ("Estado social", "iguales ante la ley", "derecho a la vida"):
+        start = CONTENT.index(text)
+        annotations[text] = StudyAnnotation(
+            document_id=doc.id, start_pos=start, end_pos=start + len(text),
+            selected_text=text, linked_content="Nota"
+        )
+    db.add_all(annotations.values())
+    db.commit()
+    return doc.id, annotations
+
+
+def reanchor(db, document_id: int, new_content: str):
+    from services.annotation_anchors import reanchor_annotations
+
+    result = reanchor_annotations(db, document_id, CONTENT, new_content)
+    db.commit()
+    db.expire_all()
+    return result
+
+
+def assert_anchored(annotation, content: str):
+    assert not annotation.is_orphan
+    assert content[annotation.start_pos:annotation.end_pos] == annotation.selected_text
+
+
+def test_unchanged_content_is_noop(db, document):
+    document_id, annotations = document
+    result = reanchor(db, document_id, CONTENT)
+    assert (result.shifted, result.relocated, result.orphaned) == (0, 0, 0)
+
+
+def test_edit_before_annotations_shifts_them(db, document):
+    document_id, annotations = document
+    new_content = CONTENT.replace("Título preliminar.", "Título preliminar (texto consolidado).")
+
+    result = reanchor(db, document_id, new_content)
+    assert (result.shifted, result.relocated, result.orphaned) == (3, 0, 0)
+    for annotation in annotations.values():
+        assert_anchored(annotation, new_content)
+
+
+def test_edit_around_annotation_relocates_it(db, document):
+    document_id, annotations = document
+    new_content = CONTENT.replace(
+        "Los españoles son iguales ante la ley.", "Son iguales ante la ley todos los españoles."
+    )
+
+    result = reanchor(db, document_id, new_content)
+    # La región editada contiene la anotación: se recoloca; la siguiente solo se desplaza
+    assert (result.shifted, result.relocated, result.orphaned) == (1, 1, 0)
+    for annotation in annotations.values():
+        assert_anchored(annotation, new_content)
+    assert annotations["iguales ante la ley"].start_pos == new_content.index("iguales ante la ley")
+
+
+def test_deleted_text_orphans_annotation(db, document):
+    document_id, annotations = document
+    new_content = CONTENT.replace("Los españoles son iguales ante la ley.", "Derogado.")
+
+    result = reanchor(db, document_id, new_content)
+    assert (result.shifted, result.relocated, result.orphaned) == (1, 0, 1)
+    orphan = annotations["iguales ante la ley"]
+    assert orphan.is_orphan
+    # La huérfana conserva sus posiciones para que el usuario la revise
+    assert (orphan.start_pos, orphan.end_pos) == (
+        CONTENT.index("iguales ante la ley"), CONTENT.index("iguales ante la ley") + len("iguales ante la ley")
+    )
+    assert_anchored(annotations["Estado social"], new_content)
+    assert_anchored(annotations["derecho a la vida"], new_content)
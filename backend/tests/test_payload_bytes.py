@@ -0,0 +1,164 @@
+"""
+Bytes que mueven los endpoints de listado (columnas diferidas)
+
+Para cada endpoint se miden los bytes de la respuesta y los de las filas que
+materializa el ORM (eventos load/refresh de los mappers) con el mapeo actual
+y forzando la carga de todas las columnas diferidas (undefer("*") en cada
+SELECT del ORM), que es lo que hacían los listados antes de diferirlas.
+
+Falla si un listado carga una columna diferida que no tiene permitida: un
+undefer de más o un acceso al atributo en la respuesta vuelve a traer el
+cuerpo de los documentos.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Mapper, Session, undefer
+
+from conftest import register_user
+
+ROWS = 10
+BODY_BYTES = 16 * 1024
+
+# (ruta, columnas diferidas que el endpoint puede cargar). /api/notes/notes
+# devuelve el contenido de cada nota, así que es el único que lo tiene permitido.
+ENDPOINT_COLUMNS = [
+    ("/api/syllabi/normative-sources", set()),
+    ("/api/notes/collections/{collection_id}/tree", set()),
+    ("/api/notes/notes", {"Note.content"}),
+    ("/api/study-docs/documents", set()),
+    ("/api/syllabi/syllabi", set()),
+]
+
+
+def _value_bytes(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    return len(str(value).encode("utf-8"))
+
+
+class RowBytes:
+    """Bytes de columnas materializadas por el ORM, en total y por columna diferida"""
+
+    def __init__(self):
+        self.total = 0
+        self.deferred = Counter()  # "Modelo.columna" -> bytes
+
+    def add(self, state, keys) -> None:
+        mapper = state.mapper
+        for key in keys:
+            prop = mapper.attrs.get(key)
+            if prop is None or not hasattr(prop, "columns") or key not in state.dict:
+                continue
+            size = _value_bytes(state.dict[key])
+            self.total += size
+            if prop.deferred:
+                self.deferred[f"{mapper.class_.__name__}.{key}"] += size
+
+
+@contextmanager
+def measure_rows():
+    """RowBytes con lo que cargan los SELECT del ORM dentro del bloque"""
+    rows = RowBytes()
+
+    def on_load(target, context):
+        state = inspect(target)
+        rows.add(state, state.dict.keys())
+
+    def on_refresh(target, context, attrs):
+        # Carga perezosa de columnas diferidas (o refresh explícito)
+        state = inspect(target)
+        rows.add(state, attrs if attrs is not None else state.dict.keys())
+
+    event.listen(Mapper, "load", on_load)
+    event.listen(Mapper, "refresh", on_refresh)
+    try:
+        yield rows
+    finally:
+        event.remove(Mapper, "load", on_load)
+        event.remove(Mapper, "refresh", on_refresh)
+
+
+@contextmanager
+def undefer_everything():
+    """Cargar todas las columnas diferidas en cada SELECT (comportamiento sin diferir)"""
+
+    def on_execute(orm_execute_state):
+        if orm_execute_state.is_select and not orm_execute_state.is_column_load:
+            orm_execute_state.statement = orm_execute_state.statement.options(undefer("*"))
+
+    event.listen(Session, "do_orm_execute", on_execute)
+    try:
+        yield
+    finally:
+        event.remove(Session, "do_orm_execute", on_execute)
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    """Usuario con notas en una colección, documentos, un temario y fuentes normativas"""
+    from database import SessionLocal
+    from models import (
+        NormativeSource, Note, NoteCollection, NoteHierarchy, StructuredTopic,
+        StudyDocument, Syllabus, User,
+    )
+
+    user = register_user(client, "bytes")
+    body = ("Texto del artículo con su desarrollo completo. " * (BODY_BYTES // 48 + 1))[:BODY_BYTES]
+
+    db = SessionLocal()
+    try:
+        user_id = db.query(User.id).filter(User.username == user["username"]).scalar()
+        collection = NoteCollection(user_id=user_id, name="Colección")
+        syllabus = Syllabus(user_id=user_id, name="Temario")
+        db.add_all([collection, syllabus])
+        db.flush()
+        for i in range(ROWS):
+            note = Note(user_id=user_id, title=f"Nota {i}", content=body)
+            db.add(note)
+            db.flush()
+            db.add(NoteHierarchy(collection_id=collection.id, note_id=note.id, order_index=i))
+            db.add(StudyDocument(user_id=user_id, title=f"Documento {i}", content=body))
+            db.add(StructuredTopic(
+                user_id=user_id, syllabus_id=syllabus.id, order_index=i,
+                title=f"Tema {i}", content=body, source_excerpt=body
+            ))
+            # Filas anteriores al almacén de textos: el texto sigue en la columna legacy
+            db.add(NormativeSource(name=f"Norma {i}", full_text=body, is_indexed=True))
+        db.commit()
+        collection_id = collection.id
+    finally:
+        db.close()
+
+    return {"headers": user["headers"], "collection_id": collection_id}
+
+
+def request_bytes(client, url: str, headers: dict):
+    with measure_rows() as rows:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+    return response, rows
+
+
+@pytest.mark.parametrize("path,allowed", ENDPOINT_COLUMNS, ids=[path for path, _ in ENDPOINT_COLUMNS])
+def test_list_does_not_load_deferred_columns(client, seeded, path, allowed):
+    url = path.format(**seeded)
+    response, rows = request_bytes(client, url, seeded["headers"])
+    with undefer_everything():
+        full_response, full_rows = request_bytes(client, url, seeded["headers"])
+
+    unexpected = {column: size for column, size in rows.deferred.items() if column not in allowed}
+    assert not unexpected, f"Columnas diferidas cargadas: {unexpected}"
+
+    # Diferir no cambia la respuesta, solo lo que se lee de la BD
+    assert len(response.content) == len(full_response.content)
+    if set(full_rows.deferred) - allowed:
+        # Sin diferir este listado traería los cuerpos: con el mapeo actual, no
+        assert rows.total * 10 < full_rows.total, (
+            f"filas ORM {rows.total} B con diferido vs {full_rows.total} B sin diferir"
+        )
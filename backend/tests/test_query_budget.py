@@ -0,0 +1,60 @@
+"""
+Presupuesto de consultas SQL por endpoint
+
+Los presupuestos no dependen del tamaño de los datos, así que un N+1 (una
+consulta por fila) los rompe en cuanto hay más de una fila. La
+autenticación (cargar el usuario) ya cuenta como una consulta.
+"""
+
+import pytest
+
+from conftest import register_user
+
+DOCUMENTS = 5
+ANNOTATIONS = 10
+
+# (ruta, presupuesto). {document_id} y {deck_id} se rellenan con los datos sembrados.
+ENDPOINT_BUDGETS = [
+    ("/api/study-docs/documents", 2),
+    ("/api/study-docs/documents/{document_id}", 3),
+    ("/api/decks/", 2),
+    ("/api/decks/{deck_id}", 2),
+    ("/api/study/next", 2),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    """Usuario con documentos anotados y un mazo con tarjetas"""
+    user = register_user(client, "budget")
+    headers = user["headers"]
+
+    content = "".join(f"Artículo {i}. Texto del artículo {i}.\n" for i in range(ANNOTATIONS))
+    document_id = None
+    for d in range(DOCUMENTS):
+        document_id = client.post("/api/study-docs/documents", json={
+            "title": f"Documento {d}", "content": content
+        }, headers=headers).json()["id"]
+        creates = []
+        for i in range(ANNOTATIONS):
+            text = f"Texto del artículo {i}."
+            start = content.find(text)
+            creates.append({"start_pos": start, "end_pos": start + len(text), "selected_text": text, "linked_content": f"Nota {i}"})
+        response = client.post(f"/api/study-docs/documents/{document_id}/annotations/bulk", json={"create": creates}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    deck_id = client.post("/api/decks/", json={"name": "Mazo"}, headers=headers).json()["id"]
+    for i in range(ANNOTATIONS):
+        client.post("/api/flashcards/", json={"deck_id": deck_id, "front": f"P{i}", "back": f"R{i}"}, headers=headers)
+
+    return {"headers": headers, "document_id": document_id, "deck_id": deck_id}
+
+
+@pytest.mark.parametrize("path,budget", ENDPOINT_BUDGETS, ids=[path for path, _ in ENDPOINT_BUDGETS])
+def test_query_budget(client, query_counter, seeded, path, budget):
+    with query_counter() as statements:
+        response = client.get(path.format(**seeded), headers=seeded["headers"])
+
+    assert response.status_code == 200, response.text
+    listing = "\n".join(f"  {i + 1}. {statement.splitlines()[0][:120]}" for i, statement in enumerate(statements))
+    assert len(statements) <= budget, f"{len(statements)} consultas (presupuesto {budget}):\n{listing}"
@@ -0,0 +1,149 @@
+"""
+Propiedades del planificador SM-2 y corpus dorado de secuencias de reviews
+
+Las propiedades se comprueban con calculate_sm2 sobre una rejilla exhaustiva
+de estados pequeños y entradas aleatorias con semilla. El corpus dorado
+(tests/data/sm2_golden.json, regenerable con benchmarks/sm2_scheduler.py
+golden) se reproduce contra cada implementación de BATCH_IMPLEMENTATIONS,
+review a review y en un único lote.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.sm2_scheduler import BATCH_IMPLEMENTATIONS, EF_FLOOR, INITIAL_STATE, random_reviews
+from sm2 import calculate_sm2
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "data" / "sm2_golden.json"
+RANDOM_REVIEWS = 50_000
+
+
+def reachable(repetitions: int, interval: int) -> bool:
+    """¿Puede una tarjeta estar en este estado? (nueva/fallada, 1 día, 6+ días)"""
+    if repetitions == 0:
+        return interval in (0, 1)
+    if repetitions == 1:
+        return interval == 1
+    return interval >= 6
+
+
+GRID = [
+    (q, repetitions, round(EF_FLOOR + step * 0.05, 2), interval)
+    for q in range(6)
+    for repetitions in range(5)
+    for step in range(35)
+    for interval in (0, 1, 6, 8, 15, 100)
+    if reachable(repetitions, interval)
+]
+
+
+def review_errors(quality: int, repetitions: int, easiness: float, interval: int, result: dict) -> list:
+    """Incumplimientos de las propiedades de SM-2 para una review"""
+    errors = []
+    if result["easiness"] < EF_FLOOR:
+        errors.append(f"easiness {result['easiness']} por debajo de {EF_FLOOR}")
+    if result["easiness"] != round(result["easiness"], 2):
+        errors.append(f"easiness {result['easiness']} sin redondear a 2 decimales")
+
+    expected_easiness = max(EF_FLOOR, easiness + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+    if result["easiness"] != round(expected_easiness, 2):
+        errors.append(f"easiness {result['easiness']} != {round(expected_easiness, 2)}")
+
+    if quality < 3:
+        if result["repetitions"] != 0 or result["interval"] != 1:
+            errors.append(f"calidad {quality} no resetea: {result}")
+    else:
+        if result["repetitions"] != repetitions + 1:
+            errors.append(f"repeticiones {result['repetitions']} != {repetitions + 1}")
+        expected_interval = 1 if repetitions == 0 else 6 if repetitions == 1 else round(interval * easiness)
+        if result["interval"] != expected_interval:
+            errors.append(f"intervalo {result['interval']} != {expected_interval}")
+        # Con easiness >= 1.3 una respuesta correcta nunca acorta el intervalo (desde la 3ª)
+        if repetitions >= 2 and result["interval"] < interval:
+            errors.append(f"intervalo decrece con respuesta correcta: {interval} -> {result['interval']}")
+    if result["interval"] < 1:
+        errors.append(f"intervalo {result['interval']} < 1")
+    return errors
+
+
+def assert_no_errors(errors: list) -> None:
+    assert not errors, f"{len(errors)} incumplimientos:\n" + "\n".join(errors[:20])
+
+
+@pytest.mark.parametrize("source", ["grid", "random"])
+def test_review_properties(source):
+    reviews = GRID if source == "grid" else random_reviews(RANDOM_REVIEWS, seed=42)
+    errors = []
+    for review in reviews:
+        errors.extend(f"{review}: {error}" for error in review_errors(*review, calculate_sm2(*review)))
+    assert_no_errors(errors)
+
+
+def test_better_quality_never_lowers_easiness():
+    """Con el mismo estado, mejor calidad => easiness no menor; aprobar => mismo intervalo"""
+    errors = []
+    for repetitions, easiness, interval in {(r, ef, i) for _, r, ef, i in GRID}:
+        results = [calculate_sm2(q, repetitions, easiness, interval) for q in range(6)]
+        state = (repetitions, easiness, interval)
+        for q in range(5):
+            if results[q + 1]["easiness"] < results[q]["easiness"]:
+                errors.append(f"easiness baja al subir la calidad {q} -> {q + 1} en {state}")
+        if len({results[q]["interval"] for q in range(3, 6)}) != 1:
+            errors.append(f"el intervalo depende de la calidad aprobada en {state}")
+    assert_no_errors(errors)
+
+
+@pytest.mark.parametrize("quality", [3, 4, 5])
+def test_passing_streak_intervals_never_decrease(quality):
+    repetitions, easiness, interval = INITIAL_STATE
+    previous = 0
+    for _ in range(15):
+        result = calculate_sm2(quality, repetitions, easiness, interval)
+        repetitions, easiness, interval = result["repetitions"], result["easiness"], result["interval"]
+        assert interval >= previous, f"intervalo {previous} -> {interval}"
+        previous = interval
+
+
+# ============================================================================
+# Corpus dorado
+# ============================================================================
+
+@pytest.fixture(scope="module")
+def golden():
+    return json.loads(GOLDEN_PATH.read_text())
+
+
+@pytest.mark.parametrize("name", sorted(BATCH_IMPLEMENTATIONS))
+def test_golden_sequences(golden, name):
+    """Cada secuencia review a review (cada una depende del estado anterior)"""
+    implementation = BATCH_IMPLEMENTATIONS[name]
+    errors = []
+    for index, entry in enumerate(golden["sequences"]):
+        repetitions, easiness, interval = golden["initial_state"]
+        for step, (quality, expected) in enumerate(zip(entry["qualities"], entry["states"])):
+            result = implementation([(quality, repetitions, easiness, interval)])[0]
+            repetitions, easiness, interval = result["repetitions"], result["easiness"], result["interval"]
+            if [repetitions, easiness, interval] != expected:
+                errors.append(f"secuencia {index}, review {step}: {[repetitions, easiness, interval]} != {expected}")
+                break
+    assert_no_errors(errors)
+
+
+@pytest.mark.parametrize("name", sorted(BATCH_IMPLEMENTATIONS))
+def test_golden_single_batch(golden, name):
+    """Todas las reviews del corpus en un único lote"""
+    batch = []
+    expected = []
+    for entry in golden["sequences"]:
+        state = tuple(golden["initial_state"])
+        for quality, after in zip(entry["qualities"], entry["states"]):
+            batch.append((quality, *state))
+            expected.append(after)
+            state = tuple(after)
+
+    got = [[r["repetitions"], r["easiness"], r["interval"]] for r in BATCH_IMPLEMENTATIONS[name](batch)]
+    assert len(got) == len(expected)
+    mismatches = [i for i, (a, b) in enumerate(zip(got, expected)) if a != b]
+    assert not mismatches, f"{len(mismatches)} reviews distintas (primera: {mismatches[0]}: {got[mismatches[0]]} != {expected[mismatches[0]]})"
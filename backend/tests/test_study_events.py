@@ -0,0 +1,64 @@
+"""
+Reconexión del listener de eventos de estudio: cada pubsub se cierra antes de reintentar
+"""
+
+import asyncio
+
+import pytest
+
+import services.study_events as study_events_module
+from services.study_events import CHANNEL, StudyEventBroker
+
+
+class FlakyPubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.closed = False
+
+    async def subscribe(self, channel):
+        assert channel == CHANNEL
+        self.redis.attempts += 1
+        if self.redis.attempts <= self.redis.failures:
+            raise ConnectionError("Redis caído")
+
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FlakyRedis:
+    """Redis cuyo SUBSCRIBE falla las primeras `failures` veces"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+        self.pubsubs = []
+
+    def pubsub(self):
+        pubsub = FlakyPubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+
+@pytest.mark.asyncio
+async def test_listener_closes_pubsub_on_reconnect_and_cancel(monkeypatch):
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(study_events_module.asyncio, "sleep", lambda _: real_sleep(0))
+    broker = StudyEventBroker()
+    broker._redis = FlakyRedis(failures=3)
+
+    listener = asyncio.create_task(broker._listen())
+    while broker._redis.attempts <= 3:
+        await real_sleep(0)
+    await real_sleep(0)
+    pubsubs = broker._redis.pubsubs
+    assert len(pubsubs) == 4
+    assert [p.closed for p in pubsubs] == [True, True, True, False]
+
+    listener.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await listener
+    assert pubsubs[-1].closed
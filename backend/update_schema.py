@@ -1,5 +1,8 @@
-from database import engine
+from database import engine, SessionLocal
 from sqlalchemy import text
+from services.pdf_indexer import PDFIndexerService
+from services.study_rollups import rebuild_study_rollups
+from models import StudyDailyStat
 
 def update_schema():
     print("🔄 Updating schema...")
@@ -10,12 +13,61 @@ def update_schema():
             
             # Add original_deck_id column
             conn.execute(text("ALTER TABLE decks ADD COLUMN IF NOT EXISTS original_deck_id INTEGER REFERENCES decks(id)"))
+
+            # Texto de normativa en almacén externo (hash + tamaño)
+            conn.execute(text("ALTER TABLE normative_sources ADD COLUMN IF NOT EXISTS text_hash VARCHAR(64)"))
+            conn.execute(text("ALTER TABLE normative_sources ADD COLUMN IF NOT EXISTS text_size INTEGER"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_normative_sources_text_hash ON normative_sources (text_hash)"))
+
+            # Contadores de sesión de estudio (+ relleno desde study_logs) e índice por fecha
+            conn.execute(text("ALTER TABLE study_sessions ADD COLUMN IF NOT EXISTS time_spent_seconds INTEGER DEFAULT 0"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_study_sessions_user_started_at ON study_sessions (user_id, started_at)"))
+            conn.execute(text("""
+                UPDATE study_sessions s SET
+                    cards_studied = l.studied,
+                    cards_correct = l.studied - l.incorrect,
+                    cards_incorrect = l.incorrect,
+                    time_spent_seconds = l.time_spent
+                FROM (
+                    SELECT session_id,
+                           COUNT(*) AS studied,
+                           COUNT(*) FILTER (WHERE quality = 'AGAIN') AS incorrect,
+                           COALESCE(SUM(time_spent_seconds), 0) AS time_spent
+                    FROM study_logs
+                    GROUP BY session_id
+                ) l
+                WHERE l.session_id = s.id AND COALESCE(s.cards_studied, 0) = 0
+            """))
+
+            # Anotaciones que no se pudieron re-anclar al editar el documento
+            conn.execute(text("ALTER TABLE study_annotations ADD COLUMN IF NOT EXISTS is_orphan BOOLEAN DEFAULT FALSE"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_study_annotations_document_id ON study_annotations (document_id)"))
+
+            # Vinculación de Telegram con código de un solo uso
+            conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS telegram_link_code VARCHAR(64)"))
+            conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS telegram_link_expires_at TIMESTAMP WITH TIME ZONE"))
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_telegram_link_code ON users (telegram_link_code)"))
             
             conn.commit()
             print("✅ Schema updated successfully")
         except Exception as e:
             print(f"❌ Error updating schema: {e}")
             conn.rollback()
+            return
+
+    # Mover textos legacy de normative_sources.full_text al almacén
+    db = SessionLocal()
+    try:
+        migrated = PDFIndexerService(db).migrate_full_text_to_store()
+        print(f"✅ {migrated} textos de normativa movidos al almacén")
+
+        # Relleno inicial de resúmenes diarios
+        StudyDailyStat.__table__.create(bind=engine, checkfirst=True)
+        if db.query(StudyDailyStat.id).first() is None:
+            rows = rebuild_study_rollups(db)
+            print(f"✅ {rows} resúmenes diarios de estudio generados desde study_logs")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
     update_schema()
@@ -23,7 +23,7 @@ interface StudyStats {
 }
 
 export default function Home() {
-  const { user, loading: authLoading, logout, fetchWithAuth } = useAuth();
+  const { user, token, loading: authLoading, logout, fetchWithAuth } = useAuth();
   const router = useRouter();
   const [decks, setDecks] = useState<Deck[]>([]);
   const [stats, setStats] = useState<StudyStats | null>(null);
@@ -37,10 +37,61 @@ export default function Home() {
 
     if (user) {
       fetchDecks();
-      fetchStats();
     }
   }, [user, authLoading]);
 
+  // Estadísticas en vivo: el stream SSE envía el estado al conectar y tras cada review
+  useEffect(() => {
+    if (!user || !token) return;
+
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let cancelled = false;
+
+    // EventSource no envía cabeceras: cada conexión usa un token de stream de
+    // corta duración (el JWT no viaja en la URL)
+    const connect = async () => {
+      let streamToken: string | null = null;
+      try {
+        const response = await fetchWithAuth(`${API_URL}/api/study/stream/token`, { method: "POST" });
+        if (response.ok) {
+          streamToken = (await response.json()).stream_token;
+        }
+      } catch (error) {
+        console.error("Error fetching stream token:", error);
+      }
+      if (cancelled) return;
+      if (!streamToken) {
+        // Sin stream: pedir las estadísticas una vez
+        fetchStats();
+        return;
+      }
+
+      source = new EventSource(
+        `${API_URL}/api/study/stream?stream_token=${encodeURIComponent(streamToken)}`
+      );
+      source.addEventListener("stats", (event) => {
+        setStats(JSON.parse((event as MessageEvent).data));
+      });
+      source.onerror = () => {
+        // Si EventSource no puede reconectar solo (token ya caducado), pedir
+        // otro token y volver a conectar
+        if (source?.readyState === EventSource.CLOSED && !cancelled) {
+          source?.close();
+          retry = setTimeout(connect, 5000);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      cancelled = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }, [user, token]);
+
   const fetchDecks = async () => {
     try {
       const response = await fetchWithAuth(`${API_URL}/api/decks/`);
@@ -32,6 +32,12 @@ export default function ProfilePage() {
   const [passwordSuccess, setPasswordSuccess] = useState("");
   const [passwordSubmitting, setPasswordSubmitting] = useState(false);
 
+  // Vinculación con Telegram
+  const [telegramLinked, setTelegramLinked] = useState(false);
+  const [linkCode, setLinkCode] = useState<{ code: string; command: string; expires_at: string } | null>(null);
+  const [telegramError, setTelegramError] = useState("");
+  const [telegramSubmitting, setTelegramSubmitting] = useState(false);
+
   useEffect(() => {
     if (!token) {
       router.push("/login");
@@ -40,6 +46,10 @@ export default function ProfilePage() {
     }
   }, [token, router]);
 
+  useEffect(() => {
+    setTelegramLinked(!!user?.telegram_id);
+  }, [user]);
+
   const handleEmailSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setEmailSubmitting(true);
@@ -106,6 +116,53 @@ export default function ProfilePage() {
     }
   };
 
+  const handleGenerateLinkCode = async () => {
+    setTelegramSubmitting(true);
+    setTelegramError("");
+
+    try {
+      const response = await fetch(`${API_URL}/api/auth/telegram/link-code`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (response.ok) {
+        setLinkCode(await response.json());
+      } else {
+        const data = await response.json();
+        setTelegramError(data.detail || "Error al generar el código");
+      }
+    } catch (err) {
+      setTelegramError("Error de conexión con el servidor");
+    } finally {
+      setTelegramSubmitting(false);
+    }
+  };
+
+  const handleUnlinkTelegram = async () => {
+    setTelegramSubmitting(true);
+    setTelegramError("");
+
+    try {
+      const response = await fetch(`${API_URL}/api/auth/telegram/link`, {
+        method: "DELETE",
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (response.ok) {
+        setTelegramLinked(false);
+        setLinkCode(null);
+      } else {
+        const data = await response.json();
+        setTelegramError(data.detail || "Error al desvincular Telegram");
+      }
+    } catch (err) {
+      setTelegramError("Error de conexión con el servidor");
+    } finally {
+      setTelegramSubmitting(false);
+    }
+  };
+
   if (loading) {
     return <div className="flex items-center justify-center min-h-screen">Cargando...</div>;
   }
@@ -186,6 +243,56 @@ export default function ProfilePage() {
           </form>
         </div>
 
+        {/* Telegram */}
+        <div className="bg-white rounded-lg shadow-lg p-6 mb-6">
+          <h2 className="text-xl font-semibold text-gray-900 mb-4">🤖 Bot de Telegram</h2>
+
+          {telegramError && (
+            <div className="p-3 mb-4 text-sm text-red-700 bg-red-100 rounded-lg">
+              {telegramError}
+            </div>
+          )}
+
+          {telegramLinked ? (
+            <>
+              <p className="text-gray-600 mb-4">
+                Tu cuenta está vinculada con Telegram. Puedes estudiar desde el bot sin iniciar sesión.
+              </p>
+              <button
+                type="button"
+                onClick={handleUnlinkTelegram}
+                disabled={telegramSubmitting}
+                className="w-full bg-red-600 hover:bg-red-700 disabled:bg-gray-400 text-white font-semibold py-3 px-6 rounded-lg transition-colors"
+              >
+                {telegramSubmitting ? "Desvinculando..." : "Desvincular Telegram"}
+              </button>
+            </>
+          ) : (
+            <>
+              <p className="text-gray-600 mb-4">
+                Genera un código y envíalo al bot para vincular tu cuenta sin escribir tu contraseña en Telegram.
+              </p>
+
+              {linkCode && (
+                <div className="p-3 mb-4 text-sm text-green-700 bg-green-100 rounded-lg">
+                  Envía al bot: <code className="font-mono font-bold">{linkCode.command}</code>
+                  <br />
+                  Caduca a las {new Date(linkCode.expires_at).toLocaleTimeString()}
+                </div>
+              )}
+
+              <button
+                type="button"
+                onClick={handleGenerateLinkCode}
+                disabled={telegramSubmitting}
+                className="w-full bg-blue-600 hover:bg-blue-700 disabled:bg-gray-400 text-white font-semibold py-3 px-6 rounded-lg transition-colors"
+              >
+                {telegramSubmitting ? "Generando..." : linkCode ? "Generar otro código" : "Generar código de vinculación"}
+              </button>
+            </>
+          )}
+        </div>
+
         {/* Cambiar Contraseña */}
         <div className="bg-white rounded-lg shadow-lg p-6">
           <h2 className="text-xl font-semibold text-gray-900 mb-4">🔒 Cambiar Contraseña</h2>
@@ -13,6 +13,7 @@ interface Annotation {
   start_pos: number;
   end_pos: number;
   selected_text: string;
+  is_orphan?: boolean;
   annotation_title: string | null;
   linked_content: string;
   legal_reference: string | null;
@@ -90,6 +91,9 @@ export default function StudyDocViewerPage() {
     legal_reference: '',
   });
 
+  // Export PDF en curso (trabajo en segundo plano)
+  const [exportingPDF, setExportingPDF] = useState(false);
+
   const contentRef = useRef<HTMLDivElement>(null);
 
   // Load preferences from localStorage
@@ -281,7 +285,10 @@ export default function StudyDocViewerPage() {
     if (!document) return null;
 
     const { content, annotations } = document;
-    const sortedAnnotations = [...annotations].sort((a, b) => a.start_pos - b.start_pos);
+    // Las huérfanas (su texto desapareció al editar) no se resaltan
+    const sortedAnnotations = annotations
+      .filter((ann) => !ann.is_orphan)
+      .sort((a, b) => a.start_pos - b.start_pos);
 
     const elements: React.ReactNode[] = [];
     let lastIndex = 0;
@@ -331,11 +338,48 @@ export default function StudyDocViewerPage() {
     );
   };
 
-  const handleExportPDF = () => {
-    window.open(
-      `http://localhost:7999/api/study-docs/documents/${documentId}/export/pdf`,
-      '_blank'
-    );
+  // El PDF se genera en segundo plano: encolar, consultar estado y descargar
+  const handleExportPDF = async () => {
+    if (exportingPDF) return;
+    setExportingPDF(true);
+    try {
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = await fetch(
+        `http://localhost:7999/api/study-docs/documents/${documentId}/export/pdf/jobs`,
+        { method: 'POST', headers }
+      );
+      if (!response.ok) {
+        const data = await response.json().catch(() => null);
+        throw new Error(data?.detail || 'Error al exportar PDF');
+      }
+
+      let job = await response.json();
+      while (job.status === 'pending') {
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+        const poll = await fetch(
+          `http://localhost:7999/api/study-docs/export/pdf/jobs/${job.id}`,
+          { headers }
+        );
+        if (!poll.ok) throw new Error('Error al consultar la exportación');
+        job = await poll.json();
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'La exportación PDF falló');
+      }
+
+      const download = await fetch(`http://localhost:7999${job.download_url}`, { headers });
+      if (!download.ok) throw new Error('Error al descargar el PDF');
+      const url = URL.createObjectURL(await download.blob());
+      const link = window.document.createElement('a');
+      link.href = url;
+      link.download = `${document?.title || 'documento'}.pdf`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      alert(err instanceof Error ? err.message : 'Error al exportar PDF');
+    } finally {
+      setExportingPDF(false);
+    }
   };
 
   // Toggle fullscreen for immersive mode
@@ -503,8 +547,9 @@ export default function StudyDocViewerPage() {
               </button>
               <button
                 onClick={handleExportPDF}
-                className="p-2 hover:bg-gray-100 dark:hover:bg-gray-700 rounded-lg text-red-600"
-                title="Exportar PDF"
+                disabled={exportingPDF}
+                className={`p-2 hover:bg-gray-100 dark:hover:bg-gray-700 rounded-lg text-red-600 ${exportingPDF ? 'animate-pulse opacity-60' : ''}`}
+                title={exportingPDF ? 'Generando PDF...' : 'Exportar PDF'}
               >
                 <svg className="w-5 h-5" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                   <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M7 21h10a2 2 0 002-2V9.414a1 1 0 00-.293-.707l-5.414-5.414A1 1 0 0012.586 3H7a2 2 0 00-2 2v14a2 2 0 002 2z" />
@@ -791,6 +836,11 @@ export default function StudyDocViewerPage() {
                                     {ann.article_number}
                                   </span>
                                 )}
+                                {ann.is_orphan && (
+                                  <span className="block text-xs text-amber-600 dark:text-amber-400">
+                                    Texto no encontrado tras la edición
+                                  </span>
+                                )}
                               </button>
                             </li>
                           ))}
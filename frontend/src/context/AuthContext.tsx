@@ -7,6 +7,7 @@ interface User {
   id: number;
   username: string;
   email: string;
+  telegram_id?: string | null;
 }
 
 interface AuthContextType {
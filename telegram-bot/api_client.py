@@ -0,0 +1,113 @@
+"""
+Cliente HTTP async compartido para hablar con el backend de OpositApp
+
+Un único httpx.AsyncClient por proceso: reutiliza conexiones (keep-alive),
+aplica timeouts y reintenta errores de conexión y respuestas 502/503/504
+en peticiones idempotentes, sin bloquear el event loop del bot.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Autenticación del bot como servicio: el backend resuelve el usuario por telegram_id
+SERVICE_TOKEN_HEADER = "X-Bot-Service-Token"
+TELEGRAM_ID_HEADER = "X-Telegram-User-Id"
+
+
+class ApiClient:
+    """Cliente del API con pool de conexiones, timeouts y reintentos"""
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 10.0,
+        retries: int = 2,
+        max_connections: int = 100,
+        backoff: float = 0.3,
+        service_token: str = "",
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.service_token = service_token
+        self.timeout = timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.backoff = backoff
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Crear el cliente (llamar una vez al arrancar el bot)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                # Reintentos de conexión a nivel de transporte
+                transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            )
+
+    async def close(self):
+        """Cerrar conexiones (llamar al parar el bot)"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        token: Optional[str] = None,
+        telegram_id: Optional[int] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Petición al API. Se autentica con el JWT si lo hay o, si no, como
+        servicio en nombre de telegram_id (cuenta vinculada). Reintenta con
+        backoff las respuestas 502/503/504 y los timeouts solo si el método
+        es idempotente.
+        """
+        await self.start()
+
+        headers = kwargs.pop("headers", {}) or {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        elif self.service_token:
+            headers[SERVICE_TOKEN_HEADER] = self.service_token
+            if telegram_id is not None:
+                headers[TELEGRAM_ID_HEADER] = str(telegram_id)
+
+        method = method.upper()
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+
+        for attempt in range(attempts):
+            try:
+                response = await self._client.request(method, path, headers=headers, **kwargs)
+            except httpx.TimeoutException:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning(f"Timeout en {method} {path}, reintentando ({attempt + 1}/{attempts - 1})")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                    return response
+                logger.warning(f"{response.status_code} en {method} {path}, reintentando ({attempt + 1}/{attempts - 1})")
+
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def get(self, path: str, token: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, token=token, **kwargs)
+
+    async def post(self, path: str, token: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, token=token, **kwargs)
+
+    async def delete(self, path: str, token: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, token=token, **kwargs)
@@ -5,9 +5,10 @@ Con soporte de autenticación JWT multi-usuario
 """
 
 import os
+import time
 import logging
-import requests
 from datetime import datetime
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -17,12 +18,35 @@ from telegram.ext import (
     ContextTypes,
 )
 
+from api_client import ApiClient
+from study_buffer import StudyBuffer, ApiAuthError, ApiUnavailableError
+from session_store import create_session_store
+
 # Cargar variables de entorno
 load_dotenv()
 
 # Configuración
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 API_URL = os.getenv("API_URL", "http://localhost:7999/api")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "100"))
+# Secreto compartido con el backend para autenticar por telegram_id (/link)
+BOT_SERVICE_TOKEN = os.getenv("BOT_SERVICE_TOKEN", "")
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+STUDY_BUFFER_SIZE = int(os.getenv("STUDY_BUFFER_SIZE", "5"))
+STUDY_REVIEW_CONCURRENCY = int(os.getenv("STUDY_REVIEW_CONCURRENCY", "8"))
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "")
+SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", str(7 * 24 * 3600)))
+SESSION_STUDY_TTL = int(os.getenv("SESSION_STUDY_TTL", "3600"))
+
+# Webhook (si TELEGRAM_WEBHOOK_URL está vacío se usa long polling)
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_DEDUP_TTL = int(os.getenv("WEBHOOK_DEDUP_TTL", "3600"))
 
 # Logging
 logging.basicConfig(
@@ -31,22 +55,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Almacenamiento temporal de flashcards y tokens JWT (por usuario de Telegram)
-user_sessions = {}  # flashcards en sesión
-user_tokens = {}    # tokens JWT por telegram_user_id
+# Cliente HTTP compartido (pool de conexiones keep-alive)
+api = ApiClient(
+    API_URL,
+    timeout=API_TIMEOUT,
+    retries=API_RETRIES,
+    max_connections=API_MAX_CONNECTIONS,
+    service_token=BOT_SERVICE_TOKEN,
+)
 
+# Tarjetas precargadas por usuario + envío de reviews en segundo plano
+study_buffer = StudyBuffer(api, size=STUDY_BUFFER_SIZE, max_concurrent_reviews=STUDY_REVIEW_CONCURRENCY)
 
-def get_auth_headers(telegram_user_id):
-    """Obtener headers de autenticación para un usuario"""
-    token = user_tokens.get(telegram_user_id)
-    if not token:
-        return None
-    return {"Authorization": f"Bearer {token}"}
+# Tokens JWT y flashcard en sesión por usuario de Telegram
+# (en memoria por defecto; en Redis para varias réplicas o webhooks)
+sessions = create_session_store(
+    SESSION_STORE,
+    redis_url=REDIS_URL,
+    token_ttl=SESSION_TOKEN_TTL,
+    study_ttl=SESSION_STUDY_TTL,
+)
 
 
-def is_authenticated(telegram_user_id):
-    """Verificar si el usuario está autenticado"""
-    return telegram_user_id in user_tokens
+async def is_authenticated(telegram_user_id):
+    """
+    Verificar si el usuario está autenticado: con token JWT (/login sin
+    BOT_SERVICE_TOKEN) o con la cuenta vinculada por telegram_id en el backend
+    """
+    if await sessions.get_token(telegram_user_id) is not None:
+        return True
+    if not BOT_SERVICE_TOKEN:
+        return False
+    if await sessions.is_linked(telegram_user_id):
+        return True
+
+    try:
+        response = await api.get("/auth/me", telegram_id=telegram_user_id)
+    except Exception as e:
+        logger.error(f"Error comprobando vinculación de {telegram_user_id}: {e}")
+        return False
+    if response.status_code == 200:
+        await sessions.set_linked(telegram_user_id)
+        return True
+    return False
+
+
+async def link_account(telegram_id, code):
+    """Canjear un código de vinculación; devuelve el usuario o None si no es válido"""
+    response = await api.post(
+        "/auth/telegram/link",
+        json={"code": code, "telegram_id": str(telegram_id)}
+    )
+    if response.status_code != 200:
+        return None
+    await sessions.set_linked(telegram_id)
+    return response.json()
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -54,7 +117,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     telegram_id = user.id
 
-    if is_authenticated(telegram_id):
+    if await is_authenticated(telegram_id):
         welcome_message = f"""
 🧠 <b>¡Bienvenido de nuevo, {user.first_name}!</b>
 
@@ -76,9 +139,11 @@ Usa /study para comenzar tu sesión de estudio 📚
 Sistema inteligente de flashcards con repetición espaciada para oposiciones.
 
 <b>⚠️ Primero necesitas autenticarte:</b>
+<code>/link CODIGO</code> (código generado en tu perfil de la web)
 <code>/login username password</code>
 
 <b>Comandos disponibles:</b>
+/link - Vincular tu cuenta con un código
 /login - Iniciar sesión con tu cuenta
 /help - Ver ayuda completa
 
@@ -94,8 +159,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📖 <b>AYUDA - OpositApp Bot</b>
 
 <b>Comandos de Autenticación:</b>
-/login username password - Vincular tu cuenta de OpositApp
-/logout - Cerrar sesión
+/link CODIGO - Vincular tu cuenta con el código de tu perfil web
+/login username password - Iniciar sesión con tu contraseña
+/logout - Cerrar sesión (desvincula la cuenta)
 
 <b>Comandos de Estudio:</b>
 /study - Comenzar sesión de estudio
@@ -130,7 +196,7 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     telegram_id = update.effective_user.id
 
     # Verificar si ya está autenticado
-    if is_authenticated(telegram_id):
+    if await is_authenticated(telegram_id):
         await update.message.reply_text(
             "✅ Ya estás autenticado.\n"
             "Usa /logout si quieres cambiar de cuenta."
@@ -162,8 +228,8 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         # Autenticar con el backend
         logger.info(f"Intentando login para usuario: {username}")
-        response = requests.post(
-            f"{API_URL}/auth/token",
+        response = await api.post(
+            "/auth/token",
             data={
                 "username": username,
                 "password": password
@@ -174,15 +240,19 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             data = response.json()
             token = data.get('access_token')
 
-            # Guardar token
-            user_tokens[telegram_id] = token
+            # Con BOT_SERVICE_TOKEN se vincula la cuenta en el backend y no se
+            # guarda el token; sin él, se guarda el token en el almacén de sesiones
+            linked = False
+            if BOT_SERVICE_TOKEN:
+                code_response = await api.post("/auth/telegram/link-code", token=token)
+                if code_response.status_code == 200:
+                    linked = await link_account(telegram_id, code_response.json()['code']) is not None
+            if not linked:
+                await sessions.set_token(telegram_id, token)
             logger.info(f"Login exitoso para usuario: {username} (telegram_id: {telegram_id})")
 
             # Obtener info del usuario
-            user_response = requests.get(
-                f"{API_URL}/auth/me",
-                headers={"Authorization": f"Bearer {token}"}
-            )
+            user_response = await api.get("/auth/me", token=token)
 
             if user_response.status_code == 200:
                 user_info = user_response.json()
@@ -217,12 +287,70 @@ async def login_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+async def link_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /link CODIGO - Vincular cuenta con el código generado en la web"""
+    telegram_id = update.effective_user.id
+
+    if not BOT_SERVICE_TOKEN:
+        await update.message.reply_text(
+            "⚠️ La vinculación con código no está disponible.\n"
+            "Usa /login username password."
+        )
+        return
+
+    if len(context.args) != 1:
+        await update.message.reply_text(
+            "🔗 <b>Vincular cuenta</b>\n\n"
+            "1. Entra en tu perfil de OpositApp\n"
+            "2. Pulsa \"Generar código de vinculación\"\n"
+            "3. Envía aquí <code>/link CODIGO</code>",
+            parse_mode='HTML'
+        )
+        return
+
+    try:
+        user_info = await link_account(telegram_id, context.args[0])
+    except Exception as e:
+        logger.error(f"Error en link: {e}")
+        await update.message.reply_text(
+            "❌ Error de conexión con el servidor.\n"
+            "Verifica que el backend esté corriendo."
+        )
+        return
+
+    if user_info is None:
+        await update.message.reply_text(
+            "❌ Código no válido o caducado.\n"
+            "Genera uno nuevo en tu perfil de la web."
+        )
+        return
+
+    # El token de un /login anterior ya no hace falta
+    await sessions.logout(telegram_id)
+    await sessions.set_linked(telegram_id)
+    study_buffer.clear(telegram_id)
+    logger.info(f"Cuenta vinculada: {user_info['username']} (telegram_id: {telegram_id})")
+    await update.message.reply_text(
+        f"✅ <b>Cuenta vinculada</b>\n\n"
+        f"👤 Usuario: {user_info['username']}\n\n"
+        f"Ya puedes usar /study para comenzar a estudiar.",
+        parse_mode='HTML'
+    )
+
+
 async def logout_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /logout - Cerrar sesión"""
     telegram_id = update.effective_user.id
 
-    if telegram_id in user_tokens:
-        del user_tokens[telegram_id]
+    if await is_authenticated(telegram_id):
+        if await sessions.is_linked(telegram_id):
+            # Desvincular en el backend para que ninguna réplica siga autenticándolo
+            try:
+                await api.delete("/auth/telegram/link", telegram_id=telegram_id)
+            except Exception as e:
+                logger.error(f"Error desvinculando {telegram_id}: {e}")
+        await sessions.logout(telegram_id)
+        study_buffer.clear(telegram_id)
         await update.message.reply_text(
             "👋 Sesión cerrada correctamente.\n"
             "Usa /login para autenticarte de nuevo."
@@ -237,16 +365,16 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /stats - Mostrar estadísticas"""
     telegram_id = update.effective_user.id
 
-    if not is_authenticated(telegram_id):
+    if not await is_authenticated(telegram_id):
         await update.message.reply_text(
             "🔐 Necesitas autenticarte primero.\n"
-            "Usa /login para vincular tu cuenta."
+            "Usa /link o /login para vincular tu cuenta."
         )
         return
 
     try:
-        headers = get_auth_headers(telegram_id)
-        response = requests.get(f"{API_URL}/study/stats", headers=headers)
+        token = await sessions.get_token(telegram_id)
+        response = await api.get("/study/stats", token=token, telegram_id=telegram_id)
 
         if response.status_code == 200:
             stats = response.json()
@@ -263,7 +391,8 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 """
             await update.message.reply_text(stats_message, parse_mode='HTML')
         elif response.status_code == 401:
-            del user_tokens[telegram_id]
+            await sessions.logout(telegram_id)
+            study_buffer.clear(telegram_id)
             await update.message.reply_text(
                 "🔐 Tu sesión ha expirado.\n"
                 "Usa /login para autenticarte de nuevo."
@@ -279,67 +408,76 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-async def study_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Comando /study - Obtener siguiente flashcard"""
-    telegram_id = update.effective_user.id
+def format_question(flashcard):
+    """Texto de la pregunta de una flashcard"""
+    metadata = ""
+    if flashcard.get('law_name'):
+        metadata = f"📜 {flashcard.get('article_number', '')} - {flashcard['law_name']}\n\n"
 
-    if not is_authenticated(telegram_id):
-        await update.message.reply_text(
-            "🔐 Necesitas autenticarte primero.\n"
-            "Usa /login para vincular tu cuenta."
+    message = f"{metadata}<b>❓ PREGUNTA:</b>\n{flashcard['front']}\n\n"
+    message += f"<i>Repeticiones: {flashcard['repetitions']} | Intervalo: {flashcard['interval_days']} días</i>"
+    return message
+
+
+async def send_next_card(telegram_id, chat_id, context: ContextTypes.DEFAULT_TYPE):
+    """Mostrar la siguiente flashcard desde el buffer precargado"""
+    token = await sessions.get_token(telegram_id)
+    try:
+        flashcard = await study_buffer.next_card(telegram_id, token)
+    except ApiAuthError:
+        await sessions.logout(telegram_id)
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text="🔐 Tu sesión ha expirado.\n"
+                 "Usa /login para autenticarte de nuevo."
         )
         return
+    except ApiUnavailableError:
+        await context.bot.send_message(chat_id=chat_id, text="❌ Error al obtener flashcard.")
+        return
 
-    try:
-        headers = get_auth_headers(telegram_id)
-        response = requests.get(f"{API_URL}/study/next", headers=headers)
+    if flashcard is None:
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text="🎉 ¡Excelente trabajo!\n\n"
+                 "No hay tarjetas pendientes de revisión en este momento.\n"
+                 "Vuelve más tarde para continuar estudiando.\n\n"
+                 "Usa /stats para ver tu progreso."
+        )
+        return
 
-        if response.status_code == 200:
-            flashcard = response.json()
-
-            if flashcard is None:
-                await update.message.reply_text(
-                    "🎉 ¡Excelente trabajo!\n\n"
-                    "No hay tarjetas pendientes de revisión en este momento.\n"
-                    "Vuelve más tarde para continuar estudiando.\n\n"
-                    "Usa /stats para ver tu progreso."
-                )
-                return
+    # Guardar flashcard en sesión del usuario
+    await sessions.set_study(telegram_id, {
+        'flashcard': flashcard,
+        'show_answer': False,
+        'start_time': time.time()
+    })
 
-            # Guardar flashcard en sesión del usuario
-            user_sessions[telegram_id] = {
-                'flashcard': flashcard,
-                'show_answer': False,
-                'start_time': datetime.now()
-            }
+    # Botón para mostrar respuesta
+    keyboard = [[InlineKeyboardButton("👁️ Ver Respuesta", callback_data="show_answer")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
 
-            # Construir mensaje
-            metadata = ""
-            if flashcard.get('law_name'):
-                metadata = f"📜 {flashcard.get('article_number', '')} - {flashcard['law_name']}\n\n"
+    await context.bot.send_message(
+        chat_id=chat_id,
+        text=format_question(flashcard),
+        parse_mode='HTML',
+        reply_markup=reply_markup
+    )
 
-            message = f"{metadata}<b>❓ PREGUNTA:</b>\n{flashcard['front']}\n\n"
-            message += f"<i>Repeticiones: {flashcard['repetitions']} | Intervalo: {flashcard['interval_days']} días</i>"
 
-            # Botón para mostrar respuesta
-            keyboard = [[InlineKeyboardButton("👁️ Ver Respuesta", callback_data="show_answer")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+async def study_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Comando /study - Obtener siguiente flashcard"""
+    telegram_id = update.effective_user.id
 
-            await update.message.reply_text(
-                message,
-                parse_mode='HTML',
-                reply_markup=reply_markup
-            )
-        elif response.status_code == 401:
-            del user_tokens[telegram_id]
-            await update.message.reply_text(
-                "🔐 Tu sesión ha expirado.\n"
-                "Usa /login para autenticarte de nuevo."
-            )
-        else:
-            await update.message.reply_text(
-                "❌ Error al obtener flashcard."
-            )
+    if not await is_authenticated(telegram_id):
+        await update.message.reply_text(
+            "🔐 Necesitas autenticarte primero.\n"
+            "Usa /link o /login para vincular tu cuenta."
+        )
+        return
+
+    try:
+        await send_next_card(telegram_id, update.effective_chat.id, context)
     except Exception as e:
         logger.error(f"Error en study: {e}")
         await update.message.reply_text(
@@ -357,7 +495,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     action = query.data
 
     # Verificar autenticación
-    if not is_authenticated(telegram_id):
+    if not await is_authenticated(telegram_id):
         await query.edit_message_text(
             "🔐 Tu sesión ha expirado.\n"
             "Usa /login para autenticarte de nuevo."
@@ -365,11 +503,12 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Verificar si el usuario tiene una sesión activa
-    if telegram_id not in user_sessions:
+    token = await sessions.get_token(telegram_id)
+    session = await sessions.get_study(telegram_id)
+    if session is None:
         await query.edit_message_text("⚠️ Sesión expirada. Usa /study para obtener una nueva tarjeta.")
         return
 
-    session = user_sessions[telegram_id]
     flashcard = session['flashcard']
 
     if action == "show_answer":
@@ -406,95 +545,133 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         quality = action.replace("quality_", "")
 
         # Calcular tiempo de estudio
-        time_spent = int((datetime.now() - session['start_time']).total_seconds())
+        time_spent = int(time.time() - session['start_time'])
 
-        # Enviar review al backend
+        # Enviar review al backend en segundo plano (sin esperar respuesta)
         review_data = {
             "flashcard_id": flashcard['id'],
             "quality": quality,
             "time_spent_seconds": time_spent
         }
+        study_buffer.submit_review(telegram_id, token, review_data)
 
-        try:
-            headers = get_auth_headers(telegram_id)
-            response = requests.post(
-                f"{API_URL}/study/review",
-                json=review_data,
-                headers=headers
-            )
+        # Limpiar sesión
+        await sessions.delete_study(telegram_id)
 
-            if response.status_code == 200:
-                result = response.json()
-
-                # Emojis según calidad
-                quality_emoji = {
-                    "again": "❌",
-                    "hard": "😰",
-                    "good": "✅",
-                    "easy": "😊"
-                }
-
-                quality_text = {
-                    "again": "Otra vez",
-                    "hard": "Difícil",
-                    "good": "Bien",
-                    "easy": "Fácil"
-                }
-
-                success_message = f"{quality_emoji[quality]} <b>Evaluación: {quality_text[quality]}</b>\n\n"
-                success_message += f"📅 Próxima revisión: en {result['interval_days']} día(s)\n"
-                success_message += f"🔄 Repeticiones: {result['repetitions']}\n"
-                success_message += f"📈 Factor facilidad: {result['easiness_factor']}\n\n"
-                success_message += "Usa /study para continuar estudiando."
-
-                await query.edit_message_text(success_message, parse_mode='HTML')
-
-                # Limpiar sesión
-                del user_sessions[telegram_id]
-            elif response.status_code == 401:
-                del user_tokens[telegram_id]
-                await query.edit_message_text(
-                    "🔐 Tu sesión ha expirado.\n"
-                    "Usa /login para autenticarte de nuevo."
-                )
-            else:
-                await query.edit_message_text(
-                    "❌ Error al procesar la evaluación. Intenta de nuevo con /study"
-                )
+        # Emojis según calidad
+        quality_emoji = {
+            "again": "❌",
+            "hard": "😰",
+            "good": "✅",
+            "easy": "😊"
+        }
+
+        quality_text = {
+            "again": "Otra vez",
+            "hard": "Difícil",
+            "good": "Bien",
+            "easy": "Fácil"
+        }
+
+        await query.edit_message_text(
+            f"{format_question(flashcard)}\n\n"
+            f"{quality_emoji[quality]} <b>Evaluación: {quality_text[quality]}</b>",
+            parse_mode='HTML'
+        )
+
+        # Siguiente tarjeta directamente desde el buffer
+        try:
+            await send_next_card(telegram_id, update.effective_chat.id, context)
         except Exception as e:
-            logger.error(f"Error al procesar evaluación: {e}")
-            await query.edit_message_text(
-                "❌ Error de conexión con el servidor."
+            logger.error(f"Error al obtener la siguiente tarjeta: {e}")
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="❌ Error de conexión con el servidor. Usa /study para continuar."
             )
 
 
-def main():
-    """Iniciar el bot"""
-    if not TELEGRAM_BOT_TOKEN:
-        logger.error("❌ TELEGRAM_BOT_TOKEN no configurado en .env")
-        return
+async def on_startup(application: Application):
+    """Abrir el cliente HTTP compartido y el worker de reviews"""
+    await api.start()
+    await study_buffer.start()
 
-    logger.info("🤖 Iniciando OpositApp Bot con autenticación JWT...")
 
-    # Crear aplicación
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+async def on_shutdown(application: Application):
+    """Enviar reviews pendientes y cerrar conexiones del cliente HTTP"""
+    await study_buffer.stop()
+    await api.close()
+    await sessions.close()
+
+
+def build_application() -> Application:
+    """Crear la aplicación del bot con sus handlers (común a polling y webhook)"""
+    # concurrent_updates: atender a varios usuarios a la vez en lugar de en serie
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
 
     # Registrar handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("login", login_command))
+    application.add_handler(CommandHandler("link", link_command))
     application.add_handler(CommandHandler("logout", logout_command))
     application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(CommandHandler("study", study_command))
     application.add_handler(CallbackQueryHandler(button_callback))
 
+    return application
+
+
+def build_webhook(application: Application = None):
+    """Receptor ASGI de updates (servir con uvicorn o montar en otra app)"""
+    from webhook import TelegramWebhook
+
+    return TelegramWebhook(
+        application or build_application(),
+        sessions,
+        path=urlparse(TELEGRAM_WEBHOOK_URL).path or "/webhook",
+        url=TELEGRAM_WEBHOOK_URL,
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        max_concurrency=CONCURRENT_UPDATES,
+        dedup_ttl=WEBHOOK_DEDUP_TTL,
+    )
+
+
+def main():
+    """Iniciar el bot"""
+    if not TELEGRAM_BOT_TOKEN:
+        logger.error("❌ TELEGRAM_BOT_TOKEN no configurado en .env")
+        return
+
+    if TELEGRAM_WEBHOOK_URL and not TELEGRAM_WEBHOOK_SECRET:
+        # Sin secreto cualquiera podría enviar updates falsos en nombre de un usuario vinculado
+        raise ValueError("TELEGRAM_WEBHOOK_URL requiere TELEGRAM_WEBHOOK_SECRET")
+
+    logger.info("🤖 Iniciando OpositApp Bot con autenticación JWT...")
+
+    # Crear aplicación
+    application = build_application()
+
     # Iniciar bot
     logger.info("✅ Bot iniciado correctamente")
     logger.info(f"📡 Conectado a API: {API_URL}")
     logger.info("🔐 Sistema de autenticación JWT activo")
-    logger.info("⏳ Esperando mensajes...")
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if TELEGRAM_WEBHOOK_URL:
+        import uvicorn
+
+        webhook = build_webhook(application)
+        logger.info(f"🔗 Modo webhook en {WEBHOOK_HOST}:{WEBHOOK_PORT}{webhook.path}")
+        uvicorn.run(webhook.app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, log_level="warning")
+    else:
+        logger.info("⏳ Esperando mensajes (long polling)...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+"""
+Reenviar updates grabados al webhook del bot (pruebas locales)
+
+Lee un fichero JSON (lista de updates) o JSONL (un update por línea) y los
+envía con POST al webhook, como haría Telegram. Con --repeat cada update se
+envía varias veces para comprobar la deduplicación; con --concurrency se
+envían en paralelo para comprobar el límite de updates simultáneos.
+
+Uso:
+    python replay_updates.py samples/updates.json --url http://localhost:8443/webhook
+    python replay_updates.py updates.jsonl --repeat 3 --concurrency 20 --secret mi_secreto
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+from webhook import SECRET_HEADER
+
+
+def load_updates(path: Path) -> list:
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+async def replay(args) -> None:
+    updates = load_updates(Path(args.file))
+    payloads = [update for update in updates for _ in range(args.repeat)]
+    headers = {SECRET_HEADER: args.secret} if args.secret else {}
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses = {}
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def post(payload):
+            async with semaphore:
+                response = await client.post(args.url, json=payload, headers=headers)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[post(payload) for payload in payloads])
+        elapsed = time.perf_counter() - started
+
+        print(f"📨 {len(payloads)} updates enviados en {elapsed:.2f}s | respuestas: {statuses}")
+
+        stats = await client.get(f"{args.url.rstrip('/')}/stats", headers=headers)
+        if stats.status_code == 200:
+            print(f"📊 Webhook: {stats.json()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file")
+    parser.add_argument("--url", default="http://localhost:8443/webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    asyncio.run(replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
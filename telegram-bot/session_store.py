@@ -0,0 +1,197 @@
+"""
+Almacén de sesiones del bot (tokens JWT y tarjeta en curso)
+
+Por defecto las sesiones viven en memoria del proceso. Con SESSION_STORE=redis
+se guardan en Redis con caducidad (TTL), de modo que sobreviven a reinicios y
+varias réplicas del bot (por ejemplo detrás de un webhook con balanceador)
+comparten el mismo estado.
+"""
+
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "token"
+LINKED_PREFIX = "linked"
+STUDY_PREFIX = "study"
+UPDATE_PREFIX = "update"
+
+
+class SessionStore(ABC):
+    """Interfaz del almacén de sesiones (implementaciones intercambiables)"""
+
+    def __init__(self, token_ttl: int = 7 * 24 * 3600, study_ttl: int = 3600):
+        self.token_ttl = token_ttl
+        self.study_ttl = study_ttl
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[str]:
+        """Valor de la clave, o None si no existe o ha caducado"""
+
+    @abstractmethod
+    async def _set(self, key: str, value: str, ttl: int) -> None:
+        """Guardar la clave con caducidad en segundos"""
+
+    @abstractmethod
+    async def _set_if_absent(self, key: str, value: str, ttl: int) -> bool:
+        """Guardar solo si la clave no existe; True si se ha guardado"""
+
+    @abstractmethod
+    async def _delete(self, *keys: str) -> None:
+        """Borrar las claves (las que no existan se ignoran)"""
+
+    async def close(self) -> None:
+        """Liberar conexiones (llamar al parar el bot)"""
+
+    # ------------------------------------------------------------------
+    # Tokens JWT por telegram_user_id
+    # ------------------------------------------------------------------
+
+    async def get_token(self, telegram_id: int) -> Optional[str]:
+        return await self._get(f"{TOKEN_PREFIX}:{telegram_id}")
+
+    async def set_token(self, telegram_id: int, token: str) -> None:
+        await self._set(f"{TOKEN_PREFIX}:{telegram_id}", token, self.token_ttl)
+
+    async def logout(self, telegram_id: int) -> None:
+        """Borrar token, marca de cuenta vinculada y tarjeta en curso del usuario"""
+        await self._delete(
+            f"{TOKEN_PREFIX}:{telegram_id}",
+            f"{LINKED_PREFIX}:{telegram_id}",
+            f"{STUDY_PREFIX}:{telegram_id}",
+        )
+
+    # ------------------------------------------------------------------
+    # Cuentas vinculadas por telegram_id (sin token: auth de servicio)
+    # ------------------------------------------------------------------
+
+    async def is_linked(self, telegram_id: int) -> bool:
+        """Caché de "el backend conoce este telegram_id" para no preguntarlo en cada mensaje"""
+        return await self._get(f"{LINKED_PREFIX}:{telegram_id}") is not None
+
+    async def set_linked(self, telegram_id: int) -> None:
+        await self._set(f"{LINKED_PREFIX}:{telegram_id}", "1", self.token_ttl)
+
+    # ------------------------------------------------------------------
+    # Tarjeta en curso (flashcard mostrada, aún sin evaluar)
+    # ------------------------------------------------------------------
+
+    async def get_study(self, telegram_id: int) -> Optional[dict]:
+        value = await self._get(f"{STUDY_PREFIX}:{telegram_id}")
+        return json.loads(value) if value is not None else None
+
+    async def set_study(self, telegram_id: int, session: dict) -> None:
+        await self._set(f"{STUDY_PREFIX}:{telegram_id}", json.dumps(session), self.study_ttl)
+
+    async def delete_study(self, telegram_id: int) -> None:
+        await self._delete(f"{STUDY_PREFIX}:{telegram_id}")
+
+    # ------------------------------------------------------------------
+    # Deduplicación de updates del webhook
+    # ------------------------------------------------------------------
+
+    async def claim_update(self, update_id: int, ttl: int = 3600) -> bool:
+        """
+        Reservar un update_id. Devuelve False si ya lo reservó antes este
+        proceso u otra réplica (reintento de Telegram): no hay que procesarlo.
+        """
+        return await self._set_if_absent(f"{UPDATE_PREFIX}:{update_id}", "1", ttl)
+
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso (una sola réplica, se pierden al reiniciar)"""
+
+    PURGE_EVERY = 1000  # Escrituras entre barridos de claves caducadas
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._data: Dict[str, Tuple[str, float]] = {}
+        self._writes = 0
+
+    async def _get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    async def _set(self, key: str, value: str, ttl: int) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge_expired()
+
+    async def _set_if_absent(self, key: str, value: str, ttl: int) -> bool:
+        if await self._get(key) is not None:
+            return False
+        await self._set(key, value, ttl)
+        return True
+
+    async def _delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    def _purge_expired(self) -> None:
+        """Las claves caducadas que nadie vuelve a leer (p. ej. update_id) se borran aquí"""
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+
+
+class RedisSessionStore(SessionStore):
+    """Sesiones en Redis con TTL, compartidas entre réplicas del bot"""
+
+    def __init__(self, url: str = "", prefix: str = "opositapp:bot", client=None, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = prefix
+        if client is None:
+            # Import perezoso: redis solo es necesario con SESSION_STORE=redis
+            import redis.asyncio as redis
+
+            client = redis.Redis.from_url(url, decode_responses=True)
+        # client: redis.asyncio.Redis con decode_responses=True (o un doble en pruebas)
+        self._redis = client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def _get(self, key: str) -> Optional[str]:
+        return await self._redis.get(self._key(key))
+
+    async def _set(self, key: str, value: str, ttl: int) -> None:
+        await self._redis.set(self._key(key), value, ex=ttl)
+
+    async def _set_if_absent(self, key: str, value: str, ttl: int) -> bool:
+        # SET NX es atómico: solo una réplica gana el update_id
+        return bool(await self._redis.set(self._key(key), value, ex=ttl, nx=True))
+
+    async def _delete(self, *keys: str) -> None:
+        await self._redis.delete(*(self._key(key) for key in keys))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_session_store(
+    backend: str = "memory",
+    redis_url: str = "",
+    token_ttl: int = 7 * 24 * 3600,
+    study_ttl: int = 3600,
+) -> SessionStore:
+    """Crear el almacén configurado (memory | redis)"""
+    backend = backend.lower()
+    if backend == "redis":
+        if not redis_url:
+            raise ValueError("SESSION_STORE=redis requiere REDIS_URL")
+        logger.info("🗄️  Sesiones del bot en Redis")
+        return RedisSessionStore(redis_url, token_ttl=token_ttl, study_ttl=study_ttl)
+    if backend != "memory":
+        raise ValueError(f"SESSION_STORE desconocido: {backend}")
+    return MemorySessionStore(token_ttl=token_ttl, study_ttl=study_ttl)
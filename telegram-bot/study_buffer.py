@@ -0,0 +1,243 @@
+"""
+Buffer de estudio con precarga para el bot
+
+Mantiene por usuario una pequeña cola de tarjetas pendientes obtenidas con
+GET /study/due, de modo que la siguiente tarjeta se muestra sin esperar al
+API. Las evaluaciones se envían en segundo plano (fire-and-forget), una
+tarea por review limitadas por un semáforo, con reintentos; así el usuario no
+espera a POST /study/review y una llamada lenta no retrasa las de los demás.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Set
+
+from api_client import ApiClient
+
+logger = logging.getLogger(__name__)
+
+
+class ApiAuthError(Exception):
+    """El token del usuario ya no es válido (401)"""
+
+
+class ApiUnavailableError(Exception):
+    """El API respondió con un error inesperado"""
+
+
+@dataclass
+class PendingReview:
+    """Evaluación pendiente de enviar al API"""
+    telegram_id: int
+    token: Optional[str]  # None si la cuenta está vinculada (auth de servicio)
+    payload: dict
+    attempts: int = 0
+
+
+@dataclass
+class UserBuffer:
+    """Estado de precarga de un usuario"""
+    cards: Deque[dict] = field(default_factory=deque)
+    current: Optional[int] = None  # Tarjeta mostrada, aún sin evaluar
+    # Tarjetas evaluadas cuya review aún no ha confirmado el API
+    in_flight: Set[int] = field(default_factory=set)
+    refill_task: Optional[asyncio.Task] = None
+    exhausted: bool = False  # El último refill no devolvió tarjetas nuevas
+
+
+class StudyBuffer:
+    """Cola de tarjetas precargadas por usuario + envío asíncrono de reviews"""
+
+    def __init__(
+        self,
+        api: ApiClient,
+        size: int = 5,
+        low_watermark: int = 2,
+        max_review_attempts: int = 5,
+        retry_delay: float = 1.0,
+        max_concurrent_reviews: int = 8,
+    ):
+        self.api = api
+        self.size = size
+        self.low_watermark = low_watermark
+        self.max_review_attempts = max_review_attempts
+        self.retry_delay = retry_delay
+        self._buffers: Dict[int, UserBuffer] = {}
+        self._review_slots = asyncio.Semaphore(max_concurrent_reviews)
+        self._review_tasks: Set[asyncio.Task] = set()
+        self._running = False
+        self._pending = 0  # Reviews aún no confirmadas ni descartadas
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    async def start(self):
+        """Aceptar reviews"""
+        self._running = True
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Intentar enviar las reviews pendientes y cancelar los envíos que queden"""
+        if not self._running:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while self.pending_reviews() and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self.pending_reviews():
+            logger.warning(f"Quedan {self.pending_reviews()} reviews sin enviar al parar el bot")
+        self._running = False
+        for task in list(self._review_tasks):
+            task.cancel()
+
+    def clear(self, telegram_id: int):
+        """Olvidar la cola de un usuario (logout o token caducado)"""
+        buffer = self._buffers.pop(telegram_id, None)
+        if buffer and buffer.refill_task:
+            buffer.refill_task.cancel()
+
+    # ------------------------------------------------------------------
+    # Tarjetas
+    # ------------------------------------------------------------------
+
+    async def next_card(self, telegram_id: int, token: Optional[str]) -> Optional[dict]:
+        """
+        Siguiente tarjeta del buffer. Solo espera al API si el buffer está
+        vacío; si queda poco, lanza un refill en segundo plano.
+        """
+        buffer = self._buffers.setdefault(telegram_id, UserBuffer())
+
+        if not buffer.cards:
+            if buffer.refill_task and not buffer.refill_task.done():
+                await buffer.refill_task
+            else:
+                await self._refill(telegram_id, token)
+
+        if not buffer.cards:
+            return None
+
+        card = buffer.cards.popleft()
+        buffer.current = card["id"]
+
+        if len(buffer.cards) <= self.low_watermark and not buffer.exhausted:
+            self._schedule_refill(telegram_id, token)
+
+        return card
+
+    def _schedule_refill(self, telegram_id: int, token: Optional[str]):
+        buffer = self._buffers[telegram_id]
+        if buffer.refill_task is None or buffer.refill_task.done():
+            buffer.refill_task = asyncio.create_task(self._refill_quietly(telegram_id, token))
+
+    async def _refill_quietly(self, telegram_id: int, token: Optional[str]):
+        try:
+            await self._refill(telegram_id, token)
+        except Exception as e:
+            # En segundo plano: el siguiente next_card reintentará
+            logger.warning(f"Error precargando tarjetas para {telegram_id}: {e}")
+
+    async def _refill(self, telegram_id: int, token: Optional[str]):
+        buffer = self._buffers.setdefault(telegram_id, UserBuffer())
+        queued = {card["id"] for card in buffer.cards}
+        skip = queued | buffer.in_flight | {buffer.current}
+
+        # Pedir de más para compensar las que ya están en cola o en vuelo
+        response = await self.api.get(
+            "/study/due",
+            token=token,
+            telegram_id=telegram_id,
+            params={"limit": min(50, self.size + len(skip))},
+        )
+        if response.status_code == 401:
+            self.clear(telegram_id)
+            raise ApiAuthError()
+        if response.status_code != 200:
+            raise ApiUnavailableError(f"GET /study/due -> {response.status_code}")
+
+        added = 0
+        for card in response.json():
+            if card["id"] in skip or len(buffer.cards) >= self.size:
+                continue
+            buffer.cards.append(card)
+            added += 1
+        buffer.exhausted = added == 0
+
+    # ------------------------------------------------------------------
+    # Reviews
+    # ------------------------------------------------------------------
+
+    def submit_review(self, telegram_id: int, token: Optional[str], payload: dict):
+        """Encolar una review para enviarla en segundo plano"""
+        buffer = self._buffers.setdefault(telegram_id, UserBuffer())
+        buffer.in_flight.add(payload["flashcard_id"])
+        if buffer.current == payload["flashcard_id"]:
+            buffer.current = None
+        self._pending += 1
+        self._enqueue_review(PendingReview(telegram_id, token, payload))
+
+    def pending_reviews(self) -> int:
+        """Reviews aún no confirmadas (esperando turno, enviándose o esperando reintento)"""
+        return self._pending
+
+    def _enqueue_review(self, review: PendingReview):
+        """Una tarea por review: una llamada lenta solo ocupa su hueco del semáforo"""
+        if not self._running:
+            # Reintento programado que vence con el bot ya parado
+            logger.warning(f"Review descartada al parar el bot: {review.payload}")
+            self._done(review)
+            return
+        task = asyncio.create_task(self._run_review(review))
+        self._review_tasks.add(task)
+        task.add_done_callback(self._review_tasks.discard)
+
+    async def _run_review(self, review: PendingReview):
+        try:
+            async with self._review_slots:
+                await self._send_review(review)
+        except asyncio.CancelledError:
+            self._done(review)
+            raise
+        except Exception as e:
+            logger.error(f"Error inesperado enviando review: {e}")
+            self._done(review)
+
+    async def _send_review(self, review: PendingReview):
+        review.attempts += 1
+        try:
+            response = await self.api.post(
+                "/study/review",
+                token=review.token,
+                telegram_id=review.telegram_id,
+                json=review.payload,
+            )
+            status = response.status_code
+        except Exception as e:
+            logger.warning(f"Error de conexión enviando review: {e}")
+            status = None
+
+        if status == 200:
+            self._done(review)
+            return
+
+        if status is not None and 400 <= status < 500:
+            # Error definitivo (token caducado, tarjeta borrada...): no reintentar
+            logger.error(f"Review descartada ({status}) para tarjeta {review.payload['flashcard_id']}")
+            self._done(review)
+            return
+
+        if review.attempts >= self.max_review_attempts:
+            logger.error(f"Review descartada tras {review.attempts} intentos: {review.payload}")
+            self._done(review)
+            return
+
+        # Reintento con backoff: la espera no ocupa hueco del semáforo
+        delay = self.retry_delay * (2 ** (review.attempts - 1))
+        asyncio.get_running_loop().call_later(delay, self._enqueue_review, review)
+
+    def _done(self, review: PendingReview):
+        self._pending -= 1
+        buffer = self._buffers.get(review.telegram_id)
+        if buffer:
+            buffer.in_flight.discard(review.payload["flashcard_id"])
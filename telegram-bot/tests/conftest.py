@@ -0,0 +1,66 @@
+"""
+Fixtures de los tests del bot
+
+FakeRedis es un doble de redis.asyncio.Redis (decode_responses=True) con lo
+que usa RedisSessionStore: GET, SET con EX/NX, DELETE y caducidad. Usa el
+mismo reloj falso que MemorySessionStore, así que los TTL se prueban sin
+esperar. Con REDIS_TEST_URL los tests de almacenes se pasan además contra
+un Redis real (usar una base de datos vacía).
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeClock:
+    """Sustituto de time.monotonic que solo avanza a mano"""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FakeRedis:
+    """Doble de redis.asyncio.Redis (decode_responses=True)"""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self.closed = False
+
+    def _alive(self, key: str) -> bool:
+        item = self.data.get(key)
+        if item is None:
+            return False
+        if item[1] is not None and item[1] <= self.clock.monotonic():
+            del self.data[key]
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.data[key][0] if self._alive(key) else None
+
+    async def set(self, key: str, value: str, ex: Optional[int] = None, nx: bool = False):
+        if nx and self._alive(key):
+            return None
+        self.data[key] = (str(value), self.clock.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                del self.data[key]
+                deleted += 1
+        return deleted
+
+    async def aclose(self) -> None:
+        self.closed = True
@@ -0,0 +1,156 @@
+"""
+Contrato de los almacenes de sesiones: memoria y Redis se comportan igual
+
+Los mismos tests se pasan contra MemorySessionStore, RedisSessionStore con
+FakeRedis y, si REDIS_TEST_URL está definido, RedisSessionStore contra un
+Redis real.
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+import session_store
+from conftest import FakeClock, FakeRedis
+from session_store import MemorySessionStore, RedisSessionStore, SessionStore, create_session_store
+
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", "")
+TELEGRAM_ID = 424242
+SESSION = {"flashcard_id": 7, "start_time": 1700000000.5, "deck": "Constitución"}
+
+
+@pytest.fixture(params=["memory", "redis-fake", "redis-real"])
+def backend(request, monkeypatch):
+    """(crear almacén, avanzar el tiempo) para cada implementación"""
+    if request.param == "redis-real":
+        if not REDIS_TEST_URL:
+            pytest.skip("REDIS_TEST_URL no definido")
+        prefix = f"test:{time.time_ns()}"
+        return (
+            lambda **ttl: RedisSessionStore(REDIS_TEST_URL, prefix=prefix, **ttl),
+            lambda seconds: asyncio.sleep(seconds + 0.2),
+        )
+
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", clock)
+
+    async def advance(seconds):
+        clock.advance(seconds)
+
+    if request.param == "memory":
+        return MemorySessionStore, advance
+    return lambda **ttl: RedisSessionStore(client=FakeRedis(clock), **ttl), advance
+
+
+@pytest.mark.asyncio
+async def test_token_and_linked_roundtrip(backend):
+    make_store, _ = backend
+    store: SessionStore = make_store(token_ttl=3600, study_ttl=3600)
+
+    assert await store.get_token(TELEGRAM_ID) is None
+    await store.set_token(TELEGRAM_ID, "jwt-1")
+    assert await store.get_token(TELEGRAM_ID) == "jwt-1"
+    await store.set_token(TELEGRAM_ID, "jwt-2")
+    assert await store.get_token(TELEGRAM_ID) == "jwt-2"
+
+    assert await store.is_linked(TELEGRAM_ID) is False
+    await store.set_linked(TELEGRAM_ID)
+    assert await store.is_linked(TELEGRAM_ID) is True
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_study_session_json_roundtrip(backend):
+    make_store, _ = backend
+    store = make_store(token_ttl=3600, study_ttl=3600)
+
+    assert await store.get_study(TELEGRAM_ID) is None
+    await store.set_study(TELEGRAM_ID, SESSION)
+    assert await store.get_study(TELEGRAM_ID) == SESSION
+    await store.delete_study(TELEGRAM_ID)
+    assert await store.get_study(TELEGRAM_ID) is None
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_logout_clears_everything(backend):
+    make_store, _ = backend
+    store = make_store(token_ttl=3600, study_ttl=3600)
+    await store.set_token(TELEGRAM_ID, "jwt")
+    await store.set_linked(TELEGRAM_ID)
+    await store.set_study(TELEGRAM_ID, SESSION)
+
+    await store.logout(TELEGRAM_ID)
+    assert await store.get_token(TELEGRAM_ID) is None
+    assert await store.is_linked(TELEGRAM_ID) is False
+    assert await store.get_study(TELEGRAM_ID) is None
+    await store.logout(TELEGRAM_ID)  # Sin claves: no debe fallar
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_claim_update_dedup(backend):
+    make_store, _ = backend
+    store = make_store()
+    assert await store.claim_update(1001) is True
+    assert await store.claim_update(1001) is False
+    assert await store.claim_update(1002) is True
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(backend):
+    make_store, advance = backend
+    store = make_store(token_ttl=1, study_ttl=1)
+    await store.set_token(TELEGRAM_ID, "jwt")
+    await store.set_linked(TELEGRAM_ID)
+    await store.set_study(TELEGRAM_ID, SESSION)
+    assert await store.claim_update(2001, ttl=1) is True
+    assert await store.get_token(TELEGRAM_ID) == "jwt"
+
+    await advance(1)
+    assert await store.get_token(TELEGRAM_ID) is None
+    assert await store.is_linked(TELEGRAM_ID) is False
+    assert await store.get_study(TELEGRAM_ID) is None
+    # Caducado el update_id, se puede volver a reservar
+    assert await store.claim_update(2001, ttl=1) is True
+    await store.close()
+
+
+@pytest.mark.asyncio
+async def test_redis_keys_are_prefixed_with_per_key_ttl():
+    clock = FakeClock()
+    client = FakeRedis(clock)
+    store = RedisSessionStore(prefix="test:bot", client=client, token_ttl=600, study_ttl=60)
+    await store.set_token(1, "jwt")
+    await store.set_study(1, {"flashcard_id": 3})
+    await store.claim_update(5, ttl=30)
+
+    ttls = {key: expires_at - clock.now for key, (_, expires_at) in client.data.items()}
+    assert ttls == {"test:bot:token:1": 600, "test:bot:study:1": 60, "test:bot:update:5": 30}
+    await store.close()
+    assert client.closed
+
+
+def test_factory_defaults_to_memory():
+    assert isinstance(create_session_store(), MemorySessionStore)
+    assert isinstance(create_session_store("MEMORY"), MemorySessionStore)
+    store = create_session_store("memory", token_ttl=10, study_ttl=5)
+    assert (store.token_ttl, store.study_ttl) == (10, 5)
+
+
+@pytest.mark.parametrize("backend_name,redis_url", [("redis", ""), ("memcached", "")])
+def test_factory_rejects_bad_configuration(backend_name, redis_url):
+    with pytest.raises(ValueError):
+        create_session_store(backend_name, redis_url)
+
+
+def test_incomplete_store_fails_on_construction():
+    class IncompleteStore(SessionStore):
+        async def _get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
@@ -0,0 +1,174 @@
+"""
+Modo webhook del bot como aplicación ASGI
+
+Telegram envía cada update con un POST al webhook en lugar de que el bot
+haga long polling. La aplicación:
+
+- Verifica la cabecera X-Telegram-Bot-Api-Secret-Token (también en /stats).
+  El secreto es obligatorio: sin él cualquiera podría enviar updates
+  falsos y actuar como un usuario vinculado por telegram_id.
+- Descarta updates repetidos (Telegram reintenta si no recibe 200 a tiempo)
+  reservando el update_id en el almacén de sesiones, compartido entre réplicas
+  si se usa Redis.
+- Procesa los updates en segundo plano con un máximo de updates simultáneos;
+  cuando se alcanza, la petición espera (backpressure hacia Telegram).
+
+Se puede servir sola con uvicorn o montarla en otra aplicación ASGI:
+
+    webhook = TelegramWebhook(build_application(), sessions, ...)
+    app.mount("/telegram", webhook.app)
+    # y en el lifespan de la app: await webhook.startup() / await webhook.shutdown()
+"""
+
+import asyncio
+import hmac
+import logging
+from contextlib import asynccontextmanager
+from typing import Set
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class TelegramWebhook:
+    """Receptor de updates de Telegram montable como ruta ASGI"""
+
+    def __init__(
+        self,
+        application: Application,
+        sessions: SessionStore,
+        path: str = "/webhook",
+        url: str = "",
+        secret_token: str = "",
+        max_concurrency: int = 64,
+        dedup_ttl: int = 3600,
+        drain_timeout: float = 10.0,
+    ):
+        if not secret_token:
+            raise ValueError("El modo webhook requiere TELEGRAM_WEBHOOK_SECRET")
+        self.application = application
+        self.sessions = sessions
+        self.path = path
+        self.url = url
+        self.secret_token = secret_token
+        self.max_concurrency = max_concurrency
+        self.dedup_ttl = dedup_ttl
+        self.drain_timeout = drain_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self.received = 0
+        self.duplicates = 0
+        self.app = Starlette(
+            routes=[
+                Route(path, self.handle, methods=["POST"]),
+                Route(f"{path.rstrip('/')}/stats", self.stats, methods=["GET"]),
+            ],
+            lifespan=self._lifespan,
+        )
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida (mismo orden que run_polling)
+    # ------------------------------------------------------------------
+
+    async def startup(self):
+        """Inicializar el bot y registrar el webhook en Telegram"""
+        await self.application.initialize()
+        if self.application.post_init:
+            await self.application.post_init(self.application)
+        await self.application.start()
+
+        if self.url:
+            await self.application.bot.set_webhook(
+                url=self.url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=self.max_concurrency,
+            )
+            logger.info(f"🔗 Webhook registrado en {self.url}")
+
+    async def shutdown(self):
+        """Esperar a los updates en curso y parar el bot"""
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=self.drain_timeout)
+            if pending:
+                logger.warning(f"Quedan {len(pending)} updates en curso al parar el webhook")
+        # El webhook no se borra: otras réplicas pueden seguir atendiéndolo
+        await self.application.stop()
+        if self.application.post_stop:
+            await self.application.post_stop(self.application)
+        await self.application.shutdown()
+        if self.application.post_shutdown:
+            await self.application.post_shutdown(self.application)
+
+    @asynccontextmanager
+    async def _lifespan(self, app: Starlette):
+        await self.startup()
+        yield
+        await self.shutdown()
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    def _authorized(self, request: Request) -> bool:
+        """Cabecera secreta de Telegram (en bytes: compare_digest no admite str no ASCII)"""
+        return hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, "").encode(), self.secret_token.encode()
+        )
+
+    async def handle(self, request: Request) -> Response:
+        """Recibir un update: validar, deduplicar y encolar su procesamiento"""
+        if not self._authorized(request):
+            return Response(status_code=403)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return Response(status_code=400)
+        update_id = data.get("update_id") if isinstance(data, dict) else None
+        if not isinstance(update_id, int):
+            return Response(status_code=400)
+
+        self.received += 1
+        if not await self.sessions.claim_update(update_id, ttl=self.dedup_ttl):
+            # Ya procesado (aquí o en otra réplica): responder 200 para que no se reintente
+            self.duplicates += 1
+            return Response(status_code=200)
+
+        update = Update.de_json(data, self.application.bot)
+
+        # Limitar updates simultáneos: si no hay hueco, Telegram espera la respuesta
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return Response(status_code=200)
+
+    async def _process(self, update: Update):
+        try:
+            await self.application.process_update(update)
+        except Exception as e:
+            logger.error(f"Error procesando update {update.update_id}: {e}")
+        finally:
+            self._semaphore.release()
+
+    async def stats(self, request: Request) -> Response:
+        """Contadores del webhook (para comprobar dedup y carga)"""
+        if not self._authorized(request):
+            return Response(status_code=403)
+        return JSONResponse({
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "in_progress": len(self._tasks),
+            "max_concurrency": self.max_concurrency,
+        })